@@ -0,0 +1,594 @@
+"""
+Banc de mesure du coeur de CodeViewer : scan, filtrage, index des chemins et du contenu, export, copie et extraction ENV.
+
+Genere un depot synthetique reproductible (graine fixe) : encodages mixtes, vendor/ et
+node_modules/, arborescence profonde, gros .gitignore. Chaque etape est ensuite
+chronometree dans un processus dedie pour isoler le pic de memoire (RSS), et le tout
+est ecrit en JSON pour comparer les versions entre elles.
+
+    python bench/bench_core.py --preset small --output bench_core.json
+    python bench/bench_core.py --files 250000 --git --tree /tmp/cv-tree
+    python bench/bench_core.py --preset small --compare bench_core_prev.json
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import queue
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / "main2.0.py"
+PRESETS = {"small": 10_000, "medium": 100_000, "large": 300_000, "huge": 1_000_000}
+TREE_MARKER = ".bench_tree.json"
+
+# Repartition des fichiers generes : (extension, poids)
+EXTENSIONS = [
+    (".php", 22), (".js", 12), (".ts", 10), (".py", 10), (".twig", 6), (".yaml", 6),
+    (".json", 5), (".md", 4), (".css", 4), (".sql", 2), (".xml", 2), (".sh", 2),
+    (".min.js", 2), (".map", 1), (".png", 4), (".lock", 1),
+]
+# Encodages : (codec, poids)
+ENCODINGS = [("utf-8", 80), ("cp1252", 8), ("utf-16", 5), ("latin-1", 4), ("utf-8-sig", 3)]
+ENV_SNIPPETS = [
+    "$dsn = getenv('DATABASE_URL');",
+    "const url = process.env.API_URL;",
+    "secret = os.environ['APP_SECRET']",
+    "mailer: '%env(MAILER_DSN)%'",
+    "key = import.meta.env.VITE_STRIPE_KEY",
+]
+WORDS = ["order", "user", "invoice", "controller", "repository", "service", "entity", "form", "event", "handler"]
+
+
+def _label() -> str:
+    try:
+        cp = subprocess.run(
+            ["git", "-C", str(ROOT), "describe", "--always", "--dirty"],
+            capture_output=True, text=True, check=True,
+        )
+        return cp.stdout.strip() or "dev"
+    except Exception:
+        return "dev"
+
+
+def _load_app():
+    spec = importlib.util.spec_from_file_location("codeviewer_bench", APP)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _peak_rss_kb() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil  # type: ignore[import-not-found]
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return int(getattr(info, "peak_wset", info.rss) // 1024)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak // 1024) if sys.platform == "darwin" else int(peak)
+
+
+# --- Generation du depot synthetique ---------------------------------------------------
+
+def _pick(rng: random.Random, table):
+    values, weights = zip(*table)
+    return rng.choices(values, weights=weights, k=1)[0]
+
+
+def _file_body(rng: random.Random, ext: str, size: int) -> str:
+    lines = []
+    total = 0
+    while total < size:
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < 0.03:
+            line = rng.choice(ENV_SNIPPETS)
+        elif roll < 0.10:
+            line = f"// commentaire {word} é à ü"
+        else:
+            line = f"function {word}_{rng.randrange(10_000)}($value) {{ return $value * {rng.randrange(100)}; }}"
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines) + "\n"
+
+
+def _top_dir(rng: random.Random) -> list[str]:
+    roll = rng.random()
+    if roll < 0.06:
+        return ["vendor", "symfony", rng.choice(["http-kernel", "console", "routing"])]
+    if roll < 0.12:
+        return ["vendor", rng.choice(["acme", "monolog", "doctrine"]), "lib"]
+    if roll < 0.16:
+        return ["node_modules", rng.choice(["react", "lodash", "vite"])]
+    if roll < 0.19:
+        return ["var", "cache"]
+    return [rng.choice(["src", "app", "tests", "config", "templates", "assets", "lib"])]
+
+
+def generate_tree(dest: Path, n_files: int, seed: int, max_depth: int, big_files: int, gitignore_rules: int) -> dict:
+    rng = random.Random(seed)
+    dest.mkdir(parents=True, exist_ok=True)
+    total_bytes = 0
+    dirs_cache: dict[tuple[str, ...], Path] = {}
+    for i in range(n_files):
+        parts = _top_dir(rng)
+        depth = min(max_depth, int(rng.expovariate(0.35)))
+        parts = parts + [f"{rng.choice(WORDS)}{rng.randrange(8)}" for _ in range(depth)]
+        key = tuple(parts)
+        d = dirs_cache.get(key)
+        if d is None:
+            d = dest.joinpath(*parts)
+            d.mkdir(parents=True, exist_ok=True)
+            dirs_cache[key] = d
+        ext = _pick(rng, EXTENSIONS)
+        name = f"{rng.choice(WORDS).capitalize()}{i}{ext}"
+        fp = d / name
+        if ext == ".png":
+            data = rng.randbytes(rng.randrange(256, 4096))
+            fp.write_bytes(data)
+            total_bytes += len(data)
+            continue
+        size = rng.randrange(1 << 20, 4 << 20) if i < big_files else int(rng.lognormvariate(7.5, 1.0))
+        enc = _pick(rng, ENCODINGS)
+        data = _file_body(rng, ext, size).encode(enc, errors="replace")
+        fp.write_bytes(data)
+        total_bytes += len(data)
+    rules = ["# regles generees", "*.log", "/var/", "node_modules/", "*.tmp"]
+    for j in range(gitignore_rules):
+        roll = j % 4
+        if roll == 0:
+            rules.append(f"src/generated_{j}/")
+        elif roll == 1:
+            rules.append(f"*.{rng.choice(WORDS)}{j}.cache")
+        elif roll == 2:
+            rules.append(f"/build-{j}/")
+        else:
+            rules.append(f"!keep_{j}.php")
+    (dest / ".gitignore").write_text("\n".join(rules) + "\n", encoding="utf-8")
+    info = {"files": n_files, "seed": seed, "max_depth": max_depth, "big_files": big_files,
+            "gitignore_rules": gitignore_rules, "bytes": total_bytes, "git": False}
+    (dest / TREE_MARKER).write_text(json.dumps(info), encoding="utf-8")
+    return info
+
+
+def init_git(dest: Path) -> bool:
+    git = shutil.which("git")
+    if not git:
+        return False
+    env = dict(os.environ, GIT_AUTHOR_NAME="bench", GIT_AUTHOR_EMAIL="bench@example.invalid",
+               GIT_COMMITTER_NAME="bench", GIT_COMMITTER_EMAIL="bench@example.invalid")
+    subprocess.run([git, "init", "-q", str(dest)], check=True, env=env)
+    subprocess.run([git, "-C", str(dest), "add", "-A"], check=True, env=env)
+    subprocess.run([git, "-C", str(dest), "commit", "-q", "-m", "bench"], check=True, env=env)
+    return True
+
+
+# --- Etapes chronometrees (executees dans un processus enfant) ---------------------------
+
+def _drain(q: "queue.Queue") -> list:
+    out = []
+    while True:
+        try:
+            out.append(q.get_nowait())
+        except queue.Empty:
+            return out
+
+
+def _stage_discover(app, root: Path, opts: dict):
+    meta: dict = {}
+    t = time.perf_counter()
+    cap = app._DirCap(*opts["dir_cap"]) if "dir_cap" in opts else None
+    files = app._discover(root, opts.get("vendor_mode", "none"), meta, cap)
+    elapsed = time.perf_counter() - t
+    return elapsed, len(files), sum(m.size for m in meta.values())
+
+
+def _stage_git_tracked(app, root: Path, opts: dict):
+    if not (root / ".git").exists():
+        return None
+    t = time.perf_counter()
+    tracked = app._git_tracked(root)
+    return time.perf_counter() - t, len(tracked), 0
+
+
+def _stage_filter(app, root: Path, opts: dict):
+    meta: dict = {}
+    files = app._discover(root, "none", meta)
+    rules = app._load_gitignore_rules(root)
+    attrs = app._load_gitattributes(root)
+    exts = set(app.ALLOWED_EXT)
+    passes = [(pattern, ai_mode) for pattern in ("", "controller") for ai_mode in (False, True)]
+    t = time.perf_counter()
+    kept = 0
+    for pattern, ai_mode in passes:
+        items, _reasons = app._filter_files(root, files, meta, pattern, exts, ai_mode, True, rules, attrs)
+        kept += len(items)
+    return time.perf_counter() - t, len(files) * len(passes), kept
+
+
+def _stage_path_index(app, root: Path, opts: dict):
+    files = app._discover(root, "none")
+    t = time.perf_counter()
+    index = app._PathIndex(root, files)
+    return time.perf_counter() - t, len(files), len(index)
+
+
+# Frappe simulee dans le filtre : sous-chaine tapee lettre par lettre, puis glob et recherche floue.
+KEYSTROKES = [WORDS[3][:n] for n in range(1, len(WORDS[3]) + 1)] + ["*.php", "src/**/*.ts", "~ctrl", "~ctrlord"]
+
+
+def _stage_path_query(app, root: Path, opts: dict):
+    files = app._discover(root, "none")
+    index = app._PathIndex(root, files)
+    t = time.perf_counter()
+    hits = 0
+    for query in KEYSTROKES:
+        hits += len(index.search(query))
+    return time.perf_counter() - t, len(KEYSTROKES), hits
+
+
+def _stage_content_index(app, root: Path, opts: dict):
+    meta: dict = {}
+    files = app._discover(root, "none", meta)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = app._ContentIndex(root, Path(tmp) / "content.sqlite")
+        t = time.perf_counter()
+        updated, _removed = index.update(files, meta)
+        return time.perf_counter() - t, len(files), updated
+
+
+def _stage_import_graph(app, root: Path, opts: dict):
+    meta: dict = {}
+    files = app._discover(root, "none", meta)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = app._FileCache(root, app.IMPORTS_CACHE_KIND, Path(tmp) / "files.sqlite")
+        t = time.perf_counter()
+        graph = app._build_import_graph(root, files, meta, cache=cache)
+        return time.perf_counter() - t, len(files), graph.edges
+
+
+def _stage_duplicates(app, root: Path, opts: dict):
+    meta: dict = {}
+    files = app._discover(root, "none", meta)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = app._FileCache(root, app.FINGERPRINT_CACHE_KIND, Path(tmp) / "files.sqlite")
+        t = time.perf_counter()
+        duplicates = app._duplicate_map(files, app._fingerprints(root, files, cache=cache))
+        return time.perf_counter() - t, len(files), len(duplicates)
+
+
+# Bandeaux "genere" (fichier ecarte) et fichiers ecrits a la main qui en parlent (gardes).
+SNIFF_CASES = {
+    "gen.pb.go": ("// Code generated by protoc-gen-go. DO NOT EDIT.\npackage api\n", "generated"),
+    "schema.py": ("#!/usr/bin/env python\n# -*- coding: utf-8 -*-\n# @generated by tools/codegen\nX = 1\n", "generated"),
+    "Entity.php": (
+        "<?php\nnamespace App\\Entity;\n\nclass User\n{\n    /** Primary key, auto-generated by the database. */\n    private int $id;\n}\n",
+        None,
+    ),
+    "ids.py": ('"""Identifiants."""\n\ndef new_id():\n    """Return an autogenerated identifier."""\n    return 1\n', None),
+    "README.md": ("# Outil\n\nThe client code is generated by `make api`; do not edit it by hand.\n", None),
+}
+
+
+def _check_ai_sniff(app) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (text, expected) in SNIFF_CASES.items():
+            path = Path(tmp) / name
+            path.write_text(text, encoding="utf-8")
+            _path, reason = app._ai_sniff_file(str(path))
+            if reason != expected:
+                raise RuntimeError(f"_ai_sniff_file({name}) = {reason!r}, attendu {expected!r}")
+
+
+def _stage_ai_sniff(app, root: Path, opts: dict):
+    _check_ai_sniff(app)
+    files = app._discover(root, "none")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = app._FileCache(root, app.AI_SNIFF_CACHE_KIND, Path(tmp) / "files.sqlite")
+        t = time.perf_counter()
+        sniffed = app._ai_sniff(root, files, cache=cache)
+        return time.perf_counter() - t, len(files), sum(1 for reason in sniffed.values() if reason)
+
+
+def _stage_loc_stats(app, root: Path, opts: dict):
+    meta: dict = {}
+    files = app._discover(root, "none", meta)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = app._FileCache(root, app.LOC_CACHE_KIND, Path(tmp) / "files.sqlite")
+        t = time.perf_counter()
+        app._loc_stats(root, files, cache=cache)
+        return time.perf_counter() - t, len(files), sum(m.size for m in meta.values())
+
+
+I18N_LOCALES = ["en", "fr", "de", "es", "it", "nl", "pt_BR", "pl"]
+
+
+def _stage_i18n(app, root: Path, opts: dict):
+    # Le depot synthetique n'a pas de traductions : 4 domaines x 8 langues generes a part.
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        (base / "translations").mkdir()
+        files = []
+        for domain in ("messages", "validators", "security", "admin"):
+            keys = [f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{i}" for i in range(3000)]
+            for loc in I18N_LOCALES:
+                lines = [f"{key}: '{loc} {key}'" for key in keys if loc == "en" or rng.random() > 0.05]
+                fp = base / "translations" / f"{domain}.{loc}.yaml"
+                fp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+                files.append(fp)
+        t = time.perf_counter()
+        diffs = app._i18n_diffs(base, files)
+        return time.perf_counter() - t, len(files), sum(len(d.missing) for d in diffs.values())
+
+
+GREP_QUERIES = [f"{WORDS[2]}_1234", WORDS[9], "getenv("]
+
+
+HOT_COMMITS = 100_000
+
+
+def _stage_git_hotness(app, root: Path, opts: dict):
+    # Historique synthetique (git fast-import) : HOT_COMMITS commits de 1 a 5 fichiers, loi de Pareto.
+    git = shutil.which("git")
+    if not git:
+        return None
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(tmp) / "repo"
+        subprocess.run([git, "init", "-q", str(repo)], check=True)
+        stream = []
+        for c in range(HOT_COMMITS):
+            stream.append(f"commit refs/heads/master\ncommitter bench <bench@example.invalid> {1_700_000_000 + c * 300} +0000\ndata 1\nm\n")
+            for _ in range(rng.choice((1, 2, 3, 5))):
+                f = int(rng.paretovariate(1.2)) % 5000
+                stream.append(f"M 100644 inline src/d{f % 50}/f{f}.py\ndata {len(str(c)) + 1}\n{c}\n\n")
+        subprocess.run([git, "-C", str(repo), "fast-import", "--quiet"], input="".join(stream), text=True, check=True)
+        subprocess.run([git, "-C", str(repo), "reset", "-q", "--hard", "master"], check=True)
+        files = app._discover(repo, "none")
+        t = time.perf_counter()
+        hotness = app._git_hotness(repo, cancel=None, path=Path(tmp) / "hotness.json")
+        top = hotness.top(files, 20)
+        return time.perf_counter() - t, len(hotness.commits), len(top)
+
+
+def _stage_grep(app, root: Path, opts: dict):
+    meta: dict = {}
+    files = app._discover(root, "none", meta)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = app._ContentIndex(root, Path(tmp) / "content.sqlite")
+        index.update(files, meta)
+        t = time.perf_counter()
+        hits = 0
+        for query in GREP_QUERIES:
+            found, _read = app._grep_files(root, files, meta, query, index=index)
+            hits += len(found)
+        return time.perf_counter() - t, len(GREP_QUERIES), hits
+
+
+def _selection(app, root: Path, limit: int):
+    files = app._discover(root, "none")
+    return files[:limit] if limit else files
+
+
+def _stage_export(app, root: Path, opts: dict, options=None):
+    files = _selection(app, root, opts["export_limit"])
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "export.txt"
+        q: "queue.Queue" = queue.Queue()
+        t = time.perf_counter()
+        app._export(root, files, out, q, options=options)
+        elapsed = time.perf_counter() - t
+        size = out.stat().st_size if out.exists() else 0
+    errors = [m for m in _drain(q) if m[0] == "error"]
+    if errors:
+        raise RuntimeError(errors[0][1])
+    return elapsed, len(files), size
+
+
+def _stage_export_split(app, root: Path, opts: dict):
+    files = _selection(app, root, opts["export_limit"])
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "modules"
+        q: "queue.Queue" = queue.Queue()
+        t = time.perf_counter()
+        app._export_split(root, files, out, q, max_bytes=1 << 20)
+        elapsed = time.perf_counter() - t
+        size = sum(fp.stat().st_size for fp in out.iterdir()) if out.exists() else 0
+    errors = [m for m in _drain(q) if m[0] == "error"]
+    if errors:
+        raise RuntimeError(errors[0][1])
+    return elapsed, len(files), size
+
+
+def _stage_copy_structured(app, root: Path, opts: dict):
+    files = _selection(app, root, opts["copy_limit"])
+    q: "queue.Queue" = queue.Queue()
+    t = time.perf_counter()
+    app._copy_structured(root, files, q)
+    elapsed = time.perf_counter() - t
+    size = 0
+    for msg in _drain(q):
+        if msg[0] in {"clip_ready", "too_large_for_clipboard"}:
+            size = len(msg[2].encode("utf-8", errors="ignore"))
+        elif msg[0] == "error":
+            raise RuntimeError(msg[1])
+    return elapsed, len(files), size
+
+
+def _stage_env(app, root: Path, opts: dict):
+    files = app._discover(root, "none")
+    t = time.perf_counter()
+    found = app._extract_env_variables(root, files)
+    elapsed = time.perf_counter() - t
+    return elapsed, len(files), len(found)
+
+
+STAGES = {
+    "discover": _stage_discover,
+    "discover_vendor_all": lambda app, root, opts: _stage_discover(app, root, {"vendor_mode": "all"}),
+    "discover_capped": lambda app, root, opts: _stage_discover(app, root, {"dir_cap": (20, 0, 5, "stratified")}),
+    "git_tracked": _stage_git_tracked,
+    "filter": _stage_filter,
+    "path_index": _stage_path_index,
+    "path_query": _stage_path_query,
+    "content_index": _stage_content_index,
+    "grep": _stage_grep,
+    "import_graph": _stage_import_graph,
+    "duplicates": _stage_duplicates,
+    "ai_sniff": _stage_ai_sniff,
+    "loc_stats": _stage_loc_stats,
+    "i18n": _stage_i18n,
+    "git_hotness": _stage_git_hotness,
+    "export": _stage_export,
+    "export_excerpt": lambda app, root, opts: _stage_export(app, root, opts, app._ExportOptions("excerpt", f"{WORDS[2]}_12", context=3)),
+    "export_skeleton": lambda app, root, opts: _stage_export(app, root, opts, app._ExportOptions("skeleton")),
+    "export_lean": lambda app, root, opts: _stage_export(
+        app, root, opts, app._ExportOptions(strip_comments=True, strip_docstrings=True, collapse_blank=True, normalize_indent=True)
+    ),
+    "export_truncate": lambda app, root, opts: _stage_export(app, root, opts, app._ExportOptions(truncate_bytes=16 << 10)),
+    "export_blobs": lambda app, root, opts: _stage_export(app, root, opts, app._ExportOptions(strip_blobs=True)),
+    "export_split": _stage_export_split,
+    "copy_structured": _stage_copy_structured,
+    "env_extract": _stage_env,
+}
+# Etapes dont le troisieme resultat est un volume en octets (debit en Mo/s)
+BYTE_STAGES = {"discover", "discover_vendor_all", "discover_capped", "export", "export_excerpt", "export_skeleton", "export_lean", "export_truncate", "export_blobs", "export_split", "copy_structured", "loc_stats"}
+
+
+def _run_stage_child(name: str, root: Path, opts: dict) -> dict:
+    app = _load_app()
+    rss_before = _peak_rss_kb()
+    res = STAGES[name](app, root, opts)
+    if res is None:
+        return {"skipped": True}
+    elapsed, items, volume = res
+    out = {
+        "seconds": round(elapsed, 4),
+        "items": items,
+        "items_per_s": round(items / elapsed, 1) if elapsed else None,
+        "peak_rss_kb": _peak_rss_kb(),
+        "rss_baseline_kb": rss_before,
+    }
+    if name in BYTE_STAGES:
+        out["bytes"] = volume
+        out["mb_per_s"] = round(volume / (1 << 20) / elapsed, 2) if elapsed else None
+    else:
+        out["result"] = volume
+    return out
+
+
+def _run_stage(name: str, root: Path, opts: dict) -> dict:
+    cp = subprocess.run(
+        [sys.executable, __file__, "--child-stage", name, "--tree", str(root), "--child-opts", json.dumps(opts)],
+        capture_output=True, text=True,
+    )
+    if cp.returncode != 0:
+        return {"error": cp.stderr.strip().splitlines()[-1] if cp.stderr.strip() else f"code {cp.returncode}"}
+    return json.loads(cp.stdout.strip().splitlines()[-1])
+
+
+def _compare(current: dict, previous: dict) -> None:
+    print(f"{'etape':<22}{'avant':>10}{'apres':>10}{'delta':>9}")
+    for name, res in current["stages"].items():
+        old = previous.get("stages", {}).get(name, {})
+        if "seconds" not in res or "seconds" not in old:
+            continue
+        delta = (res["seconds"] - old["seconds"]) / old["seconds"] * 100 if old["seconds"] else 0.0
+        print(f"{name:<22}{old['seconds']:>9.3f}s{res['seconds']:>9.3f}s{delta:>+8.1f}%")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--files", type=int, help="nombre de fichiers (prioritaire sur --preset)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--max-depth", type=int, default=14)
+    parser.add_argument("--big-files", type=int, default=3, help="nombre de fichiers de 1 a 4 Mo")
+    parser.add_argument("--gitignore-rules", type=int, default=2000)
+    parser.add_argument("--git", action="store_true", help="initialiser un depot git (etape git_tracked)")
+    parser.add_argument("--tree", help="repertoire du depot synthetique (reutilise s'il correspond)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="etapes a executer, separees par des virgules")
+    parser.add_argument("--export-limit", type=int, default=20_000)
+    parser.add_argument("--copy-limit", type=int, default=2_000)
+    parser.add_argument("--label", default=None)
+    parser.add_argument("--output", default="bench_core.json")
+    parser.add_argument("--compare", help="JSON d'une execution precedente a comparer")
+    parser.add_argument("--child-stage", help=argparse.SUPPRESS)
+    parser.add_argument("--child-opts", default="{}", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child_stage:
+        print(json.dumps(_run_stage_child(args.child_stage, Path(args.tree), json.loads(args.child_opts))))
+        return 0
+
+    n_files = args.files or PRESETS[args.preset]
+    tmp_ctx = None
+    if args.tree:
+        tree = Path(args.tree)
+    else:
+        tmp_ctx = tempfile.TemporaryDirectory(prefix="cv-bench-")
+        tree = Path(tmp_ctx.name) / "repo"
+    wanted = {"files": n_files, "seed": args.seed, "max_depth": args.max_depth,
+              "big_files": args.big_files, "gitignore_rules": args.gitignore_rules}
+    try:
+        marker = tree / TREE_MARKER
+        info = json.loads(marker.read_text(encoding="utf-8")) if marker.exists() else {}
+        if any(info.get(k) != v for k, v in wanted.items()):
+            if tree.exists():
+                shutil.rmtree(tree)
+            print(f"generation de {n_files} fichiers dans {tree}...")
+            t = time.perf_counter()
+            info = generate_tree(tree, n_files, args.seed, args.max_depth, args.big_files, args.gitignore_rules)
+            print(f"  {time.perf_counter() - t:.1f}s, {info['bytes'] / (1 << 20):.1f} Mo")
+        if args.git and not (tree / ".git").exists():
+            info["git"] = init_git(tree)
+            marker.write_text(json.dumps(info), encoding="utf-8")
+
+        opts = {"export_limit": args.export_limit, "copy_limit": args.copy_limit}
+        stages: dict[str, dict] = {}
+        for name in [s.strip() for s in args.stages.split(",") if s.strip()]:
+            if name not in STAGES:
+                print(f"etape inconnue : {name}", file=sys.stderr)
+                return 2
+            res = _run_stage(name, tree, opts)
+            stages[name] = res
+            if "seconds" in res:
+                rate = f", {res['mb_per_s']} Mo/s" if res.get("mb_per_s") is not None else ""
+                print(f"{name:<22}{res['seconds']:>9.3f}s  {res['items']} elements{rate}  pic RSS {res['peak_rss_kb']} Ko")
+            else:
+                print(f"{name:<22}{'ignoree' if res.get('skipped') else res.get('error')}")
+
+        report = {
+            "label": args.label or _label(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "tree": info,
+            "stages": stages,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        if args.compare:
+            _compare(report, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+        return 0
+    finally:
+        if tmp_ctx is not None:
+            tmp_ctx.cleanup()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Mesure du temps de demarrage de CodeViewer (a suivre a chaque release).
+
+Lance l'application N fois avec la sonde CODEVIEWER_STARTUP_PROBE : l'application
+note ses jalons (fin des imports, fenetre affichee, interface prete) puis se ferme.
+Le resultat (medianes + detail des essais) est ecrit en JSON.
+
+    python bench/startup.py --runs 5 --output bench_startup.json
+    python bench/startup.py --exe dist/Extractor2.0.exe --label 2.0.0
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / "main2.0.py"
+PHASES = ("import_done", "init_done", "window_shown", "ready")
+
+
+def _label() -> str:
+    try:
+        cp = subprocess.run(
+            ["git", "-C", str(ROOT), "describe", "--always", "--dirty"],
+            capture_output=True, text=True, check=True,
+        )
+        return cp.stdout.strip() or "dev"
+    except Exception:
+        return "dev"
+
+
+def _run_once(cmd: list[str], timeout: float) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        probe = Path(tmp) / "probe.json"
+        env = dict(os.environ)
+        env["CODEVIEWER_STARTUP_PROBE"] = str(probe)
+        t0 = time.time()
+        subprocess.run(cmd, env=env, timeout=timeout, check=False)
+        t_exit = time.time()
+        if not probe.exists():
+            raise RuntimeError("la sonde n'a rien ecrit (affichage indisponible ?)")
+        marks = json.loads(probe.read_text(encoding="utf-8"))
+    result = {phase: round(marks[phase] - t0, 4) for phase in PHASES if phase in marks}
+    result["exit"] = round(t_exit - t0, 4)
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--exe", help="executable PyInstaller a mesurer (par defaut : main2.0.py)")
+    parser.add_argument("--label", default=None, help="version/etiquette enregistree dans le JSON")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", default="bench_startup.json")
+    args = parser.parse_args(argv)
+
+    cmd = [args.exe] if args.exe else [sys.executable, str(APP)]
+    runs: list[dict[str, float]] = []
+    for i in range(args.runs):
+        try:
+            res = _run_once(cmd, args.timeout)
+        except Exception as exc:
+            print(f"essai {i + 1}: echec ({exc})", file=sys.stderr)
+            return 1
+        runs.append(res)
+        print(f"essai {i + 1}: " + ", ".join(f"{k}={v:.3f}s" for k, v in res.items()))
+
+    median = {key: round(statistics.median(r[key] for r in runs), 4) for key in runs[0]}
+    report = {
+        "label": args.label or _label(),
+        "target": "exe" if args.exe else "script",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "median": median,
+        "runs": runs,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print("median: " + ", ".join(f"{k}={v:.3f}s" for k, v in median.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,13 @@
 ﻿from __future__ import annotations
-import fnmatch
+import bisect, fnmatch, functools, mmap, operator, time
 import json, logging, os, queue, re, shlex, subprocess, sys, threading, tkinter as tk
-from collections import Counter, defaultdict
+from array import array
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from typing import Iterable, Protocol, Sequence
-from tkinter import filedialog, messagebox, ttk
+from typing import Callable, Iterable, Iterator, Protocol, Sequence
+from tkinter import filedialog, messagebox, simpledialog, ttk
 from tkinter import font as tkfont
 from datetime import datetime
 import shutil
@@ -13,8 +16,18 @@ APP_NAME = "CodeViewer"
 DEFAULT_OUT = "symfony_project.txt"
 READ_CHUNK = 1 << 20
 PREVIEW_MAX = 4 << 20
+LARGE_VIEW_MIN = PREVIEW_MAX  # au-dela, l'apercu passe en visionneuse mmap
+LINE_INDEX_STEP = 1024
+LARGE_VIEW_COLS = 4096  # octets affiches par ligne dans la visionneuse gros fichiers
+SEARCH_WINDOW = 4 << 20  # recherche dans l'apercu par fenetres : le GIL est rendu entre deux fenetres
 MAX_RECENTS = 10
 CFG_PATH = Path.home() / ".concat_project.cfg"
+SNAPSHOT_PATH = Path.home() / ".concat_project_snapshot.json"
+SNAPSHOT_VERSION = 1
+CONTENT_CACHE_DIR = Path.home() / ".concat_project_cache"
+CONTENT_INDEX_VERSION = 2
+CONTENT_INDEX_MAX_BYTES = 8 << 20  # au-dela, le fichier est relu a chaque recherche
+PARALLEL_MIN_ITEMS = 64
 IGNORED_DIRS = {".git", ".idea", ".vscode", "var", "node_modules", "build", "dist", "coverage", ".cache", ".venv", "venv"}
 MIN_LEFT = 240
 MIN_RIGHT = 360
@@ -89,6 +102,13 @@ AI_MAX_BYTES = int(os.getenv("AI_MAX_BYTES", "1048576"))  # 1 MiB par défaut
 AI_MINIFIED_SUFFIXES = (".min.js", ".min.css", ".bundle.js", ".chunk.js")
 AI_MAP_SUFFIXES = (".map",)
 
+# Meme sans suffixe parlant (app.js, proxies Doctrine, sorties protobuf) : lecture du debut du fichier
+AI_SNIFF_BYTES = 4096
+AI_SNIFF_MIN_BYTES = 1024  # en dessous, longueur de ligne et entropie ne disent rien
+AI_MINIFIED_LINE_CHARS = 200  # longueur moyenne des lignes de l'echantillon...
+AI_MINIFIED_SPACE_RATIO = 0.08  # ... avec peu de blancs (un texte en prose a de longues lignes aussi)
+AI_ENCODED_ENTROPY = 5.6  # bits par octet : base64 ~6, code source 4 a 5
+
 # Répertoires supplémentaires "bruit" (builds front, caches divers) — effectifs pour la pertinence IA
 AI_IGNORE_DIRS |= {
     "public/build", "public/bundles", ".next", ".nuxt", ".output", ".parcel-cache",
@@ -103,12 +123,20 @@ IGNORED_DIRS |= {
 
 CLIPBOARD_MAX = int(os.getenv("CLIPBOARD_MAX", str(8 << 20)))  # 8 MiB par défaut
 
+# Boucle d'evenements : cadence des progressions et budget de traitement par tick Tk
+PROGRESS_MIN_INTERVAL = 0.05
+QUEUE_TICK_BUDGET = 0.012
+QUEUE_TICK_MAX = 500
+
 AI_REASON_LABELS = {
     "gitattributes": ".gitattributes",
     "size": "> AI_MAX_BYTES",
     "gitignore": ".gitignore",
     "sourcemap": "sourcemap",
     "minified": "minifie",
+    "minified_content": "minifie (contenu)",
+    "generated": "code genere",
+    "encoded": "donnees encodees",
     "lockfile": "lockfile",
     "markdown": "markdown secondaire",
     "noise": "fichier bruit",
@@ -132,52 +160,53 @@ SENSITIVE_SUFFIXES = (".pem", ".key", ".pfx", ".p12", ".crt")
 SENSITIVE_KEYWORDS = ("secret", "api_key", "apikey", "password", "credential", "token")
 
 # --- Extraction ENV : patterns multi-langages
-ENV_REGEXES = [
+# Sources brutes : compilees a la premiere extraction (voir _env_regexes)
+ENV_PATTERNS = [
     # Symfony YAML / PHP
-    re.compile(r'%env\((?P<name>[A-Z0-9_]{2,})\)%'),
-    re.compile(r'env\((?P<name>[A-Z0-9_]{2,})\)'),
+    (r'%env\((?P<name>[A-Z0-9_]{2,})\)%', 0),
+    (r'env\((?P<name>[A-Z0-9_]{2,})\)', 0),
 
     # PHP
-    re.compile(r'getenv\(\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\)'),
-    re.compile(r'\$_ENV\[\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\]'),
-    re.compile(r'\$_SERVER\[\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\]'),
+    (r'getenv\(\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\)', 0),
+    (r'\$_ENV\[\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\]', 0),
+    (r'\$_SERVER\[\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\]', 0),
 
     # JavaScript / Node / Vite
-    re.compile(r'process\.env\.(?P<name>[A-Za-z_][A-Za-z0-9_]*)'),
-    re.compile(r'process\.env\[\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\]'),
-    re.compile(r'import\.meta\.env\.(?P<name>[A-Za-z_][A-Za-z0-9_]*)'),
+    (r'process\.env\.(?P<name>[A-Za-z_][A-Za-z0-9_]*)', 0),
+    (r'process\.env\[\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\]', 0),
+    (r'import\.meta\.env\.(?P<name>[A-Za-z_][A-Za-z0-9_]*)', 0),
 
     # Python
-    re.compile(r'os\.getenv\(\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\)'),
-    re.compile(r'os\.environ\[\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\]'),
+    (r'os\.getenv\(\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\)', 0),
+    (r'os\.environ\[\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\]', 0),
 
     # Ruby
-    re.compile(r'ENV\[\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\]'),
+    (r'ENV\[\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\]', 0),
 
     # Java
-    re.compile(r'System\.getenv\(\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\)'),
+    (r'System\.getenv\(\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\)', 0),
 
     # Go
-    re.compile(r'os\.Getenv\(\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\)'),
+    (r'os\.Getenv\(\s*[\'"](?P<name>[A-Za-z_][A-Za-z0-9_]*)[\'"]\s*\)', 0),
 
     # .env / shell lines / docker list items
-    re.compile(r'^\s*(?:export\s+)?(?P<name>[A-Za-z_][A-Za-z0-9_]*)\s*=', re.MULTILINE),
-    re.compile(r'^\s*-\s*(?P<name>[A-Za-z_][A-Za-z0-9_]*)\s*[:=]', re.MULTILINE),
+    (r'^\s*(?:export\s+)?(?P<name>[A-Za-z_][A-Za-z0-9_]*)\s*=', re.MULTILINE),
+    (r'^\s*-\s*(?P<name>[A-Za-z_][A-Za-z0-9_]*)\s*[:=]', re.MULTILINE),
 
     # ${VAR} expansions (docker-compose, yaml, etc.)
-    re.compile(r'\$\{\s*(?P<name>[A-Za-z_][A-Za-z0-9_]*)'),
+    (r'\$\{\s*(?P<name>[A-Za-z_][A-Za-z0-9_]*)', 0),
 ]
 
 ENV_CATEGORY_RULES = [
-    ("database",   re.compile(r'^(DATABASE_URL|DB_|MYSQL_|POSTGRES_|PG_|REDIS_)')),
-    ("mail",       re.compile(r'^(MAILER_DSN|MAIL_|SMTP_|SENDGRID_|POSTMARK_)')),
-    ("mercure",    re.compile(r'^MERCURE_')),
-    ("stripe",     re.compile(r'^STRIPE_')),
-    ("runtime",    re.compile(r'^(APP_ENV|APP_SECRET|APP_DEBUG|APP_URL|APP_NAME|TRUSTED_)')),
-    ("cache",      re.compile(r'^(CACHE_|REDIS_)')),
-    ("queue",      re.compile(r'^(RABBITMQ_|KAFKA_|SQS_|QUEUE_)')),
-    ("storage",    re.compile(r'^(AWS_|S3_|GCS_|AZURE_)')),
-    ("monitoring", re.compile(r'^(SENTRY_|NEW_RELIC|DATADOG)')),
+    ("database",   r'^(DATABASE_URL|DB_|MYSQL_|POSTGRES_|PG_|REDIS_)'),
+    ("mail",       r'^(MAILER_DSN|MAIL_|SMTP_|SENDGRID_|POSTMARK_)'),
+    ("mercure",    r'^MERCURE_'),
+    ("stripe",     r'^STRIPE_'),
+    ("runtime",    r'^(APP_ENV|APP_SECRET|APP_DEBUG|APP_URL|APP_NAME|TRUSTED_)'),
+    ("cache",      r'^(CACHE_|REDIS_)'),
+    ("queue",      r'^(RABBITMQ_|KAFKA_|SQS_|QUEUE_)'),
+    ("storage",    r'^(AWS_|S3_|GCS_|AZURE_)'),
+    ("monitoring", r'^(SENTRY_|NEW_RELIC|DATADOG)'),
 ]
 
 ENV_HINTS = {
@@ -282,7 +311,8 @@ CODEX_CMD = os.getenv("CODEX_CMD", "codex")
 
 LOGGER = logging.getLogger("concat_app")
 if not LOGGER.handlers:
-    handler = logging.FileHandler(Path.home() / ".concat_project.log", encoding="utf-8")
+    # delay=True : le fichier de log n'est ouvert qu'au premier message, pas au lancement.
+    handler = logging.FileHandler(Path.home() / ".concat_project.log", encoding="utf-8", delay=True)
     formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
     handler.setFormatter(formatter)
     LOGGER.addHandler(handler)
@@ -443,18 +473,229 @@ def _read_preview(p: Path, limit: int = PREVIEW_MAX) -> str:
             break
     return "".join(acc)
 
+# Index de lignes clairseme (un offset toutes les LINE_INDEX_STEP lignes) : memoire bornee quelle que soit la taille.
+class _MappedFile:
+    def __init__(self, path: Path):
+        self.path = path
+        self._fh = path.open("rb")
+        try:
+            self.size = os.fstat(self._fh.fileno()).st_size
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        except Exception:
+            self._fh.close()
+            raise
+        self._checkpoints = array("Q", [0])
+        self._indexed_lines = 0
+        self._indexed_offset = 0
+        self.index_done = self.size == 0
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                try:
+                    self._mm.close()
+                except Exception:
+                    pass
+                self._mm = None
+            try:
+                self._fh.close()
+            except Exception:
+                pass
+
+    @property
+    def closed(self) -> bool:
+        return self._mm is None and self.size > 0
+
+    @property
+    def line_count(self) -> int:
+        # Tant que l'index n'est pas termine, c'est une borne basse.
+        return max(1, self._indexed_lines)
+
+    @contextmanager
+    def _reader(self):
+        """Carte dediee aux parcours longs (index, recherche) : la vue et close() ne les attendent jamais."""
+        if self.closed or not self.size:
+            yield None
+            return
+        try:
+            fh = self.path.open("rb")
+        except OSError:
+            yield None
+            return
+        with fh:
+            try:
+                mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                yield None
+                return
+            with mm:
+                yield mm
+
+    def build_index(self, cancel: threading.Event | None = None, progress=None) -> None:
+        with self._reader() as mm:
+            if mm is None:
+                self.index_done = True
+                return
+            size = min(self.size, len(mm))
+            pos = 0
+            lines = 0
+            last_report = time.monotonic()
+            while pos < size:
+                if (cancel and cancel.is_set()) or self.closed:
+                    return
+                end = min(size, pos + READ_CHUNK)
+                chunk = mm[pos:end]
+                count = chunk.count(b"\n")
+                # Là je ne cherche les sauts de ligne un par un que jusqu'aux points de controle du bloc.
+                need = LINE_INDEX_STEP - lines % LINE_INDEX_STEP
+                at = 0
+                while need <= count:
+                    for _ in range(need):
+                        at = chunk.find(b"\n", at) + 1
+                    count -= need
+                    lines += need
+                    self._checkpoints.append(pos + at)
+                    self._indexed_lines = lines
+                    self._indexed_offset = pos + at
+                    need = LINE_INDEX_STEP
+                lines += count
+                pos = end
+                now = time.monotonic()
+                if progress and now - last_report >= 0.25:
+                    last_report = now
+                    progress(lines, False)
+            if size and mm[size - 1] != 0x0A:
+                lines += 1
+        self._indexed_lines = lines
+        self._indexed_offset = pos
+        self.index_done = True
+        if progress:
+            progress(lines, True)
+
+    def _offset_of_line(self, line_no: int) -> int:
+        # Là je pars du point de controle le plus proche puis j'avance ligne a ligne.
+        mm = self._mm
+        if mm is None:
+            return 0
+        ck = min(line_no // LINE_INDEX_STEP, len(self._checkpoints) - 1)
+        pos = self._checkpoints[ck]
+        current = ck * LINE_INDEX_STEP
+        while current < line_no and pos < self.size:
+            nl = mm.find(b"\n", pos)
+            if nl < 0:
+                return self.size
+            pos = nl + 1
+            current += 1
+        return pos
+
+    def lines(self, start: int, count: int, max_cols: int = LARGE_VIEW_COLS, left: int = 0) -> list[str]:
+        # left : decalage horizontal en octets, pour montrer une occurrence loin dans une longue ligne.
+        out: list[str] = []
+        with self._lock:
+            mm = self._mm
+            if mm is None:
+                return out
+            pos = self._offset_of_line(max(0, start))
+            while len(out) < count and pos < self.size:
+                nl = mm.find(b"\n", pos)
+                end = self.size if nl < 0 else nl
+                lo = min(end, pos + left)
+                raw = mm[lo:min(end, lo + max_cols)]
+                text = raw.decode("utf-8", errors="replace").rstrip("\r")
+                if lo > pos:
+                    text = "… " + text
+                if end - lo > max_cols:
+                    text += " …"
+                out.append(text)
+                pos = end + 1
+        return out
+
+    def columns(self, line_no: int, left: int, lo: int, hi: int, max_cols: int = LARGE_VIEW_COLS) -> tuple[int, int]:
+        """Colonnes (caracteres) des octets lo..hi d'une ligne telle que lines() l'affiche avec ce decalage left."""
+        with self._lock:
+            mm = self._mm
+            if mm is None:
+                return 0, 0
+            pos = self._offset_of_line(line_no)
+            nl = mm.find(b"\n", pos)
+            end = self.size if nl < 0 else nl
+            start = min(end, pos + left)
+            stop = min(end, start + max_cols)
+            shift = 2 if start > pos else 0
+            c0 = len(mm[start : max(start, min(stop, pos + lo))].decode("utf-8", errors="replace"))
+            c1 = len(mm[start : max(start, min(stop, pos + hi))].decode("utf-8", errors="replace"))
+        return shift + c0, shift + c1
+
+    def _count_lines(self, mm: mmap.mmap, offset: int) -> int:
+        ck = bisect.bisect_right(self._checkpoints, offset) - 1
+        pos = self._checkpoints[ck]
+        line = ck * LINE_INDEX_STEP
+        # Comptage par fenetres pour ne jamais copier un gros morceau du fichier.
+        while pos < offset:
+            end = min(offset, pos + READ_CHUNK)
+            line += mm[pos:end].count(b"\n")
+            pos = end
+        return line
+
+    def line_of_offset(self, offset: int) -> int:
+        with self._lock:
+            mm = self._mm
+            if mm is None:
+                return 0
+            return self._count_lines(mm, offset)
+
+    def search(
+        self, needle: str, start_line: int = 0, start_col: int = 0, regex: bool = False, ignore_case: bool = True
+    ) -> tuple[int, int, int] | None:
+        """(ligne, octet dans la ligne, longueur en octets) de la prochaine occurrence, en rebouclant au debut."""
+        if not needle:
+            return None
+        pattern = needle.encode("utf-8") if regex else re.escape(needle.encode("utf-8"))
+        rx = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        with self._lock:
+            if self._mm is None:
+                return None
+            begin = min(self.size, self._offset_of_line(start_line) + max(0, start_col))
+        with self._reader() as mm:
+            if mm is None:
+                return None
+            size = min(self.size, len(mm))
+            # Fenetres coupees en fin de ligne : une correspondance qui couvre plusieurs lignes peut
+            # tomber a cheval sur deux fenetres et n'est alors pas trouvee.
+            for lo, hi in ((begin, size), (0, begin)):
+                pos = lo
+                while pos < hi:
+                    if self.closed:
+                        return None
+                    end = min(hi, pos + SEARCH_WINDOW)
+                    if end < hi:
+                        end = (mm.rfind(b"\n", pos, end) + 1) or end
+                    m = rx.search(mm, pos, end)
+                    if m:
+                        # Colonne en octets : decoder le debut de la ligne couterait autant que la ligne.
+                        offset = m.start()
+                        line_start = mm.rfind(b"\n", 0, offset) + 1
+                        return self._count_lines(mm, offset), offset - line_start, m.end() - offset
+                    pos = end
+        return None
+
 def _is_allowed_file(p: Path) -> bool:
     if _is_env_like(p):
         return ".env" in ALLOWED_EXT
     return p.suffix.lower() in ALLOWED_EXT
 
+# "api" : vendor/ et node_modules/ restent hors de la liste, seule la surface publique des
+# dependances importees est ajoutee aux exports (_dependency_apis).
+VENDOR_MODES = ("none", "symfony", "all", "api")
+
 def _normalize_vendor_mode(mode: str | None) -> str:
-    return mode if mode in {"none", "symfony", "all"} else "none"
+    return mode if mode in VENDOR_MODES else "none"
 
 def _vendor_allows_file(rel_parts: Sequence[str], mode: str) -> bool:
     if not rel_parts or rel_parts[0] != "vendor":
         return True
-    if mode == "none":
+    if mode in ("none", "api"):
         return False
     if mode == "symfony":
         return len(rel_parts) > 1 and rel_parts[1] == "symfony"
@@ -491,8 +732,16 @@ def _should_scan_for_env(fp: Path) -> bool:
         return False
     return True
 
+@functools.lru_cache(maxsize=None)
+def _env_regexes() -> tuple[re.Pattern, ...]:
+    return tuple(re.compile(src, flags) for src, flags in ENV_PATTERNS)
+
+@functools.lru_cache(maxsize=None)
+def _env_category_rules() -> tuple[tuple[str, re.Pattern], ...]:
+    return tuple((cat, re.compile(src)) for cat, src in ENV_CATEGORY_RULES)
+
 def _categorize_env(name: str) -> str:
-    for cat, rx in ENV_CATEGORY_RULES:
+    for cat, rx in _env_category_rules():
         if rx.search(name):
             return cat
     return "other"
@@ -503,6 +752,7 @@ def _extract_env_variables(root: Path, files: Sequence[Path]) -> dict[str, set[s
     Ne remonte que des NOMS de variables (aucune valeur).
     """
     found: dict[str, set[str]] = defaultdict(set)
+    regexes = _env_regexes()
     for fp in files:
         try:
             if not fp.exists() or not fp.is_file() or not _should_scan_for_env(fp):
@@ -512,7 +762,7 @@ def _extract_env_variables(root: Path, files: Sequence[Path]) -> dict[str, set[s
             rel = str(fp)
         try:
             for chunk in _chunks(fp):
-                for rx in ENV_REGEXES:
+                for rx in regexes:
                     for match in rx.finditer(chunk):
                         name = match.groupdict().get("name")
                         if not name or len(name) < 2:
@@ -630,6 +880,152 @@ def _load_gitattributes(root: Path) -> list[tuple[str, set[str]]]:
         pass
     return rules
 
+def _load_gitignore_rules(root: Path) -> list[tuple[str, bool]]:
+    rules: list[tuple[str, bool]] = []
+    gitignore = root / ".gitignore"
+    if not gitignore.exists():
+        return rules
+    try:
+        raw_lines = gitignore.read_text(encoding="utf-8", errors="ignore").splitlines()
+    except Exception:
+        return rules
+    for raw in raw_lines:
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:].strip()
+        if not line:
+            continue
+        rules.append((line, negate))
+    return rules
+
+def _gitignore_matches(pattern: str, rel_path: str, is_dir: bool) -> bool:
+    dir_only = pattern.endswith("/")
+    if dir_only:
+        pattern = pattern.rstrip("/")
+    anchored = pattern.startswith("/")
+    if anchored:
+        pattern_cmp = pattern.lstrip("/")
+    else:
+        pattern_cmp = pattern
+    candidates = [rel_path]
+    if not anchored and "/" in rel_path:
+        parts = rel_path.split("/")
+        candidates.extend("/".join(parts[i:]) for i in range(1, len(parts)))
+    if dir_only:
+        if any(c == pattern_cmp or c.startswith(pattern_cmp + "/") for c in candidates):
+            return True
+        return False
+    for c in candidates:
+        if fnmatch.fnmatch(c, pattern_cmp):
+            return True
+    if not anchored:
+        name = rel_path.rsplit("/", 1)[-1]
+        if fnmatch.fnmatch(name, pattern_cmp):
+            return True
+    return False
+
+# Meme semantique que _gitignore_matches : litteraux par dictionnaires, "*.ext" par endswith groupe, le reste en regex.
+class _GitignoreMatcher:
+    def __init__(self, rules: Sequence[tuple[str, bool]]):
+        self.negate = [negate for _pattern, negate in rules]
+        # fnmatch applique os.path.normcase : insensible a la casse sous Windows.
+        self._fold = os.name == "nt"
+        self._dir_anchored: dict[str, int] = {}
+        self._dir_float: dict[str, int] = {}
+        self._lit_anchored: dict[str, int] = {}
+        self._lit_float: dict[str, int] = {}
+        suffixes: list[tuple[int, str]] = []
+        globs: list[tuple[int, re.Pattern, bool]] = []
+        for idx, (pattern, _negate) in enumerate(rules):
+            dir_only = pattern.endswith("/")
+            if dir_only:
+                pattern = pattern.rstrip("/")
+            anchored = pattern.startswith("/")
+            pattern_cmp = pattern.lstrip("/") if anchored else pattern
+            if dir_only:
+                (self._dir_anchored if anchored else self._dir_float)[pattern_cmp] = idx
+                continue
+            if self._fold:
+                pattern_cmp = pattern_cmp.lower()
+            if not any(ch in pattern_cmp for ch in "*?["):
+                (self._lit_anchored if anchored else self._lit_float)[pattern_cmp] = idx
+            elif pattern_cmp.startswith("*") and not any(ch in pattern_cmp[1:] for ch in "*?["):
+                suffixes.append((idx, pattern_cmp[1:]))
+            else:
+                globs.append((idx, re.compile(fnmatch.translate(pattern_cmp)), anchored))
+        self._suffixes = sorted(suffixes, reverse=True)
+        self._suffix_tuple = tuple(sfx for _idx, sfx in suffixes)
+        self._globs = sorted(globs, key=lambda g: g[0], reverse=True)
+        self._depths = {
+            "dir_anchored": sorted({p.count("/") + 1 for p in self._dir_anchored}),
+            "dir_float": sorted({p.count("/") + 1 for p in self._dir_float}),
+            "lit_float": sorted({p.count("/") + 1 for p in self._lit_float}),
+        }
+
+    def ignored(self, rel_path: str) -> bool:
+        best = -1
+        parts = rel_path.split("/")
+        n = len(parts)
+        if self._dir_anchored:
+            for k in self._depths["dir_anchored"]:
+                if k > n:
+                    break
+                best = max(best, self._dir_anchored.get("/".join(parts[:k]), -1))
+        if self._dir_float:
+            for k in self._depths["dir_float"]:
+                if k > n:
+                    break
+                for i in range(n - k + 1):
+                    best = max(best, self._dir_float.get("/".join(parts[i:i + k]), -1))
+        if self._fold:
+            rel_path = rel_path.lower()
+            parts = rel_path.split("/")
+        if self._lit_anchored:
+            best = max(best, self._lit_anchored.get(rel_path, -1))
+        if self._lit_float:
+            for k in self._depths["lit_float"]:
+                if k > n:
+                    break
+                best = max(best, self._lit_float.get("/".join(parts[n - k:]), -1))
+        if self._suffix_tuple and rel_path.endswith(self._suffix_tuple):
+            for idx, sfx in self._suffixes:
+                if idx <= best:
+                    break
+                if rel_path.endswith(sfx):
+                    best = idx
+                    break
+        for idx, rx, anchored in self._globs:
+            if idx <= best:
+                break
+            if rx.match(rel_path) or (not anchored and any(rx.match(rel_path, pos + 1) for pos in _slash_positions(rel_path))):
+                best = idx
+                break
+        return best >= 0 and not self.negate[best]
+
+def _slash_positions(s: str) -> Iterator[int]:
+    pos = s.find("/")
+    while pos != -1:
+        yield pos
+        pos = s.find("/", pos + 1)
+
+@functools.lru_cache(maxsize=8)
+def _gitignore_matcher(rules: tuple[tuple[str, bool], ...]) -> _GitignoreMatcher:
+    return _GitignoreMatcher(rules)
+
+def _is_gitignored_rel(rules: Sequence[tuple[str, bool]], rel_path: str, is_dir: bool = False) -> bool:
+    return _gitignore_matcher(tuple(rules)).ignored(rel_path)
+
+def _gitattributes_excluded(rules: Sequence[tuple[str, set[str]]], rel_path: str) -> bool:
+    # Exclut si marqué généré/vendored/documentation/export-ignore
+    for pat, flags in rules:
+        if _gitignore_matches(pat, rel_path, False):
+            if any(f in flags for f in ("linguist-generated", "linguist-vendored", "linguist-documentation", "export-ignore")):
+                return True
+    return False
+
 def _ai_filter_reason(fp: Path, root: Path | None) -> str | None:
     lower = fp.name.lower()
     suffix = fp.suffix.lower()
@@ -682,14 +1078,172 @@ def _ai_filter_reason(fp: Path, root: Path | None) -> str | None:
 def _ai_is_relevant(fp: Path, root: Path | None) -> bool:
     return _ai_filter_reason(fp, root) is None
 
-def _discover(root: Path, vendor_mode: str) -> list[Path]:
+AI_SNIFF_CACHE_KIND = "sniff:2"
+AI_BANNER_LINES = 12  # lignes de commentaire lues en tete de fichier pour un bandeau "genere"
+_AI_GENERATED_RE = re.compile(
+    rb"(?i:@generated\b|\bgenerated (?:by|from|with|using)\b"
+    rb"|\bthis (?:file|class|code) (?:is|was|has been) (?:auto-?|automatically )?generated\b)"
+    rb"|\bDO NOT EDIT\b"
+)
+_AI_BANNER_SKIP = (b"#!", b"<?php", b"<?xml", b"<!doctype", b"# -*-", b"'use strict'", b'"use strict"')
+_AI_COMMENT_MARKS = (b"#", b"//", b"/*", b"*", b"--", b"<!--", b";", b"{{!", b"{#")
+
+def _ai_banner(head: bytes, markdown: bool) -> bytes:
+    """Bloc de commentaires de tete (au plus AI_BANNER_LINES lignes), seul endroit ou un bandeau "genere" compte."""
+    marks = (b"<!--",) if markdown else _AI_COMMENT_MARKS
+    out: list[bytes] = []
+    in_block = False
+    for raw in head.removeprefix(b"\xef\xbb\xbf").splitlines()[: AI_BANNER_LINES * 2]:
+        line = raw.strip()
+        if in_block:
+            out.append(line)
+            in_block = b"*/" not in line and b"-->" not in line
+        elif not line or (not out and line.lower().startswith(_AI_BANNER_SKIP)):
+            if out:
+                break
+            continue
+        elif line.startswith(marks):
+            out.append(line)
+            in_block = (line.startswith(b"/*") and b"*/" not in line[2:]) or (line.startswith(b"<!--") and b"-->" not in line)
+        else:
+            break
+        if len(out) >= AI_BANNER_LINES:
+            break
+    return b"\n".join(out)
+
+def _ai_sniff_file(path: str) -> tuple[str, str | None]:
+    """(chemin, motif IA d'apres les AI_SNIFF_BYTES premiers octets : "generated", "minified_content", "encoded" ou None)."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(AI_SNIFF_BYTES)
+    except OSError:
+        return path, None
+    if _AI_GENERATED_RE.search(_ai_banner(head, path.lower().endswith((".md", ".markdown")))):
+        return path, "generated"
+    n = len(head)
+    if n < AI_SNIFF_MIN_BYTES:
+        return path, None
+    blanks = head.count(b" ") + head.count(b"\t") + head.count(b"\n") + head.count(b"\r")
+    if n / (head.count(b"\n") + 1) >= AI_MINIFIED_LINE_CHARS and blanks < AI_MINIFIED_SPACE_RATIO * n:
+        return path, "minified_content"
+    import math
+
+    entropy = -sum(c / n * math.log2(c / n) for c in Counter(head).values())
+    return path, "encoded" if entropy >= AI_ENCODED_ENTROPY else None
+
+def _ai_sniff(
+    root: Path, files: Sequence[Path], cancel: threading.Event | None = None, cache: "_FileCache | None" = None
+) -> dict[Path, str | None] | None:
+    """Motifs IA lus dans le contenu des fichiers que les regles de chemin gardent ; None si annule."""
+    wanted = [
+        fp for fp in files
+        if fp.name.lower() not in AI_IMPORTANT_FILENAMES and _ai_filter_reason(fp, root) is None
+    ]
+    return _cached_file_map(root, wanted, AI_SNIFF_CACHE_KIND, _ai_sniff_file, cancel, cache, chunksize=64)  # type: ignore[return-value]
+
+# Evite un stat() par fichier a chaque filtrage ; sniff n'est renseigne que par les scans en mode IA.
+class _FileMeta:
+    __slots__ = ("size", "mtime", "sniff")
+
+    def __init__(self, size: int = 0, mtime: float = 0.0, sniff: str | None = None):
+        self.size = size
+        self.mtime = mtime
+        self.sniff = sniff
+
+    @classmethod
+    def from_stat(cls, st: os.stat_result) -> "_FileMeta":
+        return cls(st.st_size, st.st_mtime)
+
+    def same_as(self, other: "_FileMeta | None") -> bool:
+        return other is not None and self.size == other.size and self.mtime == other.mtime and self.sniff == other.sniff
+
+def _stat_meta(p: Path) -> _FileMeta | None:
+    try:
+        return _FileMeta.from_stat(p.stat())
+    except Exception:
+        return None
+
+DIR_CAP_KEEP = 20
+CAPPED_IID_PREFIX = "capped:"  # ligne "N autres fichiers" d'un dossier plafonne dans la liste
+
+class _DirCap:
+    """Plafond par dossier : au-dela de max_files fichiers ou max_bytes octets, seul un echantillon de keep fichiers est garde."""
+
+    __slots__ = ("max_files", "max_bytes", "keep", "sample")
+
+    SAMPLES = ("newest", "largest", "stratified")
+
+    def __init__(self, max_files: int = 0, max_bytes: int = 0, keep: int = DIR_CAP_KEEP, sample: str = "newest"):
+        self.max_files = max(0, int(max_files))
+        self.max_bytes = max(0, int(max_bytes))
+        self.keep = max(1, int(keep))
+        self.sample = sample if sample in self.SAMPLES else "newest"
+
+    @property
+    def active(self) -> bool:
+        return bool(self.max_files or self.max_bytes)
+
+    def key(self) -> str:
+        """Signature des reglages (instantane de scan)."""
+        return f"{self.max_files}:{self.max_bytes}:{self.keep}:{self.sample}" if self.active else ""
+
+    def apply(self, entries: list[tuple[Path, "_FileMeta | None"]]) -> tuple[list[tuple[Path, "_FileMeta | None"]], int, int]:
+        """(entrees gardees, fichiers masques, octets masques) pour les fichiers d'un meme dossier."""
+        if not self.active or len(entries) <= self.keep:
+            return entries, 0, 0
+        total = sum(m.size for _fp, m in entries if m is not None)
+        if not (self.max_files and len(entries) > self.max_files) and not (self.max_bytes and total > self.max_bytes):
+            return entries, 0, 0
+        if self.sample == "stratified":
+            ordered = sorted(entries, key=lambda e: e[0].name.casefold())
+            step = (len(ordered) - 1) / max(1, self.keep - 1)
+            kept = [ordered[round(i * step)] for i in range(self.keep)]
+        else:
+            import heapq
+
+            field = "mtime" if self.sample == "newest" else "size"
+            kept = heapq.nlargest(self.keep, entries, key=lambda e: getattr(e[1], field) if e[1] is not None else 0)
+        kept_bytes = sum(m.size for _fp, m in kept if m is not None)
+        return kept, len(entries) - len(kept), total - kept_bytes
+
+def _apply_dir_cap(
+    files: Sequence[Path], meta: dict[Path, _FileMeta], cap: _DirCap, capped: dict[Path, tuple[int, int]] | None = None
+) -> list[Path]:
+    """_DirCap sur une liste deja constituee (fichiers suivis par git) ; l'ordre est conserve."""
+    if not cap.active:
+        return list(files)
+    by_dir: dict[Path, list[tuple[Path, _FileMeta | None]]] = defaultdict(list)
+    for fp in files:
+        by_dir[fp.parent].append((fp, meta.get(fp)))
+    dropped: set[Path] = set()
+    for d, entries in by_dir.items():
+        kept, hidden, hidden_bytes = cap.apply(entries)
+        if hidden:
+            dropped.update(fp for fp, _m in entries)
+            dropped.difference_update(fp for fp, _m in kept)
+            if capped is not None:
+                capped[d] = (hidden, hidden_bytes)
+    for fp in dropped:
+        meta.pop(fp, None)
+    return [fp for fp in files if fp not in dropped]
+
+def _discover(
+    root: Path,
+    vendor_mode: str,
+    meta: dict[Path, _FileMeta] | None = None,
+    cap: _DirCap | None = None,
+    capped: dict[Path, tuple[int, int]] | None = None,
+) -> list[Path]:
+    """Fichiers du projet tries par chemin relatif ; capped recoit (masques, octets masques) par dossier plafonne."""
     vendor_mode = _normalize_vendor_mode(vendor_mode)
     files: list[Path] = []
     root_resolved = root.resolve()
     stack = [root_resolved]
     seen = set()
+    capping = cap is not None and cap.active
     while stack:
         d = stack.pop()
+        dir_files: list[tuple[Path, _FileMeta | None]] = []
         try:
             with os.scandir(d) as it:
                 for entry in it:
@@ -706,7 +1260,7 @@ def _discover(root: Path, vendor_mode: str) -> list[Path]:
                             if name in IGNORED_DIRS:
                                 continue
                             if rel_parts and rel_parts[0] == "vendor":
-                                if vendor_mode == "none":
+                                if vendor_mode in ("none", "api"):
                                     continue
                                 if vendor_mode == "symfony":
                                     if len(rel_parts) == 1:
@@ -722,16 +1276,477 @@ def _discover(root: Path, vendor_mode: str) -> list[Path]:
                                 continue
                             if not _is_allowed_file(path_entry):
                                 continue
-                            rp = path_entry.resolve()
-                            if rp in seen:
-                                continue
-                            seen.add(rp)
-                            files.append(path_entry)
+                            m = None
+                            if meta is not None or capping:
+                                try:
+                                    m = _FileMeta.from_stat(entry.stat(follow_symlinks=False))
+                                except Exception:
+                                    pass
+                            dir_files.append((path_entry, m))
                     except Exception:
                         continue
         except Exception:
             continue
+        if capping:
+            # Seul l'echantillon est garde : la liste ne grossit plus avec le dossier.
+            dir_files, hidden, hidden_bytes = cap.apply(dir_files)  # type: ignore[union-attr]
+            if hidden and capped is not None:
+                capped[d] = (hidden, hidden_bytes)
+        for path_entry, m in dir_files:
+            try:
+                rp = path_entry.resolve()
+            except Exception:
+                continue
+            if rp in seen:
+                continue
+            seen.add(rp)
+            files.append(path_entry)
+            if meta is not None and m is not None:
+                meta[path_entry] = m
     return sorted(files, key=lambda q: q.relative_to(root).as_posix().casefold())
+
+@functools.lru_cache(maxsize=64)
+def _path_glob_regex(glob: str) -> re.Pattern:
+    """Glob de chemin -> regex : "*" et "?" restent dans un dossier, "**" traverse les dossiers."""
+    anchored = glob.startswith("/")
+    glob = glob.lstrip("/")
+    out: list[str] = []
+    i, n = 0, len(glob)
+    while i < n:
+        ch = glob[i]
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if ch == "*":
+            out.append("[^/]*")
+        elif ch == "?":
+            out.append("[^/]")
+        elif ch == "[" and glob.find("]", i + 2) != -1:
+            end = glob.find("]", i + 2)
+            body = glob[i + 1:end].replace("\\", "\\\\")
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append(f"[{body}]")
+            i = end + 1
+            continue
+        else:
+            out.append(re.escape(ch))
+        i += 1
+    body = "".join(out)
+    # Sans "/" final le motif doit couvrir la fin du chemin (nom de fichier), sinon c'est un dossier.
+    tail = "" if glob.endswith("/") else "$"
+    return re.compile(("^" if anchored else "(?:^|/)") + body + tail)
+
+def _fuzzy_positions(path: str, needle: str, start: int = 0) -> list[int] | None:
+    positions: list[int] = []
+    pos = start
+    for ch in needle:
+        pos = path.find(ch, pos)
+        if pos == -1:
+            return None
+        positions.append(pos)
+        pos += 1
+    return positions
+
+def _fuzzy_score(path: str, needle: str) -> int:
+    """Score facon fzf (debut de segment, caracteres consecutifs), sur la fenetre la plus courte ou le seul nom de fichier."""
+    first = _fuzzy_positions(path, needle)
+    if first is None:
+        return -(1 << 30)
+    # Recherche arriere depuis la fin du premier alignement : fenetre la plus courte.
+    end = first[-1]
+    pos = end
+    for ch in reversed(needle[:-1]):
+        pos = path.rfind(ch, 0, pos)
+    candidates = [_fuzzy_positions(path, needle, pos) or first]
+    base = path.rfind("/") + 1
+    if base:
+        in_name = _fuzzy_positions(path, needle, base)
+        if in_name is not None:
+            candidates.append(in_name)
+    best = -(1 << 30)
+    for positions in candidates:
+        score = 0
+        prev = -2
+        for p in positions:
+            score += 16
+            if p == 0 or path[p - 1] in "/_-. ":
+                score += 8
+            if p == prev + 1:
+                score += 6
+            elif prev >= 0:
+                score -= min(p - prev - 1, 12)
+            if p >= base:
+                score += 2
+            prev = p
+        best = max(best, score)
+    return best
+
+class _PathIndex:
+    """Index trigrammes des chemins relatifs : sous-chaine, glob ou recherche floue ("~usrctl")."""
+
+    FUZZY_RANK_LIMIT = 50_000
+
+    def __init__(self, root: Path, files: Sequence[Path], cancel: threading.Event | None = None):
+        rels: list[str] = []
+        for fp in files:
+            try:
+                rels.append(fp.relative_to(root).as_posix())
+            except Exception:
+                rels.append(str(fp))
+        self.rels = rels
+        self.lower = [rel.lower() for rel in rels]
+        self.exts = [_ext_key(fp) for fp in files]
+        # Resultats couteux par fichier (motif IA...) memorises pour la duree du scan.
+        self.memo: dict[tuple, dict[int, object]] = {}
+        # Texte concatene (un chemin par ligne) : requetes courtes et floues resolues par re, cote C.
+        self._blob = "\n".join(self.lower)
+        self._starts = array("Q")
+        offset = 0
+        for rel in self.lower:
+            self._starts.append(offset)
+            offset += len(rel) + 1
+        postings: dict[str, array] = {}
+        for i, rel in enumerate(self.lower):
+            if cancel is not None and not i % 4096 and cancel.is_set():
+                break
+            for tri in {rel[j:j + 3] for j in range(len(rel) - 2)}:
+                lst = postings.get(tri)
+                if lst is None:
+                    lst = postings[tri] = array("I")
+                lst.append(i)
+        self._postings = postings
+        self._last: tuple[str, str, list[int]] | None = None
+
+    def __len__(self) -> int:
+        return len(self.rels)
+
+    @staticmethod
+    def parse(query: str) -> tuple[str, str]:
+        query = query.strip().lower()
+        if query.startswith("~"):
+            return "fuzzy", query[1:].strip()
+        if any(ch in query for ch in "*?["):
+            return "glob", query
+        return "substr", query
+
+    def _smallest_posting(self, literals: Iterable[str]) -> array | None:
+        """Plus petite liste de postings parmi les trigrammes des litteraux (None : pas de trigramme)."""
+        best: array | None = None
+        for lit in literals:
+            for j in range(len(lit) - 2):
+                lst = self._postings.get(lit[j:j + 3])
+                if lst is None:
+                    return array("I")
+                if best is None or len(lst) < len(best):
+                    best = lst
+        return best
+
+    def _scan_blob(self, rx: re.Pattern) -> list[int]:
+        starts = self._starts
+        return [bisect.bisect_right(starts, m.start()) - 1 for m in rx.finditer(self._blob)]
+
+    def search(self, query: str) -> list[int]:
+        """Indices des chemins correspondant a la requete (ordre du scan, ou classement pour le flou)."""
+        kind, needle = self.parse(query)
+        if not needle:
+            return list(range(len(self.rels)))
+        last = self._last
+        base: Sequence[int] | None = None
+        if last is not None and kind != "glob" and last[0] == kind and last[1] in needle:
+            # La requete prolonge la precedente : ses resultats sont un sur-ensemble.
+            base = last[2] if kind == "substr" else sorted(last[2])
+        lower = self.lower
+        if kind == "substr":
+            posting = self._smallest_posting((needle,))
+            if posting is not None and (base is None or len(posting) < len(base)):
+                base = posting
+            if base is None:
+                result = self._scan_blob(re.compile(r"(?m)^[^\n]*?" + re.escape(needle)))
+            else:
+                result = [i for i in base if needle in lower[i]]
+        elif kind == "glob":
+            rx = _path_glob_regex(needle)
+            # "/" de bord : ancre ou "**/" (zero dossier possible), absents du chemin stocke.
+            literals = [lit for lit in (part.strip("/") for part in re.split(r"\*+|\?|\[[^\]]*\]", needle)) if len(lit) >= 3]
+            posting = self._smallest_posting(literals)
+            candidates = range(len(lower)) if posting is None else posting
+            result = [i for i in candidates if rx.search(lower[i])]
+        else:
+            if base is None:
+                # Classes niees : chaque caractere prend sa premiere occurrence, sans retour arriere.
+                body = "".join(f"[^\\n{re.escape(ch)}]*{re.escape(ch)}" for ch in needle)
+                result = self._scan_blob(re.compile(r"(?m)^" + body))
+            else:
+                result = [i for i in base if _fuzzy_positions(lower[i], needle) is not None]
+            if len(result) <= self.FUZZY_RANK_LIMIT:
+                scored = [(-_fuzzy_score(lower[i], needle), len(lower[i]), i) for i in result]
+                scored.sort()
+                result = [i for _score, _len, i in scored]
+        self._last = (kind, needle, result)
+        return result
+
+QUERY_KEYS = ("ext", "path", "name", "size", "modified", "reason", "tracked")
+QUERY_SIZE_UNITS = {"": 1, "b": 1, "o": 1, "k": 1 << 10, "kb": 1 << 10, "ko": 1 << 10, "m": 1 << 20, "mb": 1 << 20, "mo": 1 << 20, "g": 1 << 30, "gb": 1 << 30, "go": 1 << 30}
+QUERY_AGE_UNITS = {"s": 1, "min": 60, "h": 3600, "d": 86400, "j": 86400, "w": 7 * 86400, "mo": 30 * 86400, "y": 365 * 86400}
+# Cout relatif d'evaluation d'un predicat (la selectivite est mesuree sur un echantillon).
+QUERY_COSTS = {"ext": 1.0, "tracked": 1.0, "size": 1.5, "modified": 1.5, "path": 2.0, "name": 2.0, "reason": 8.0}
+_QUERY_TERM_RE = re.compile(r"^(-?)(" + "|".join(QUERY_KEYS) + r")(<=|>=|:|<|>|=)(.*)$")
+_QUERY_OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "=": operator.eq, ":": operator.eq}
+_QUERY_TRUE = {"yes", "oui", "true", "1", "o", "y"}
+_QUERY_FALSE = {"no", "non", "false", "0", "n"}
+
+def _query_path_matcher(value: str) -> Callable[[str], bool]:
+    kind, needle = _PathIndex.parse(value)
+    if kind == "glob":
+        return _path_glob_regex(needle).search
+    if kind == "fuzzy":
+        return lambda rel: _fuzzy_positions(rel, needle) is not None
+    return lambda rel: needle in rel
+
+def _parse_query_size(value: str) -> int:
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([a-z]*)", value)
+    if not m or m.group(2) not in QUERY_SIZE_UNITS:
+        raise ValueError(f"taille invalide : {value!r} (ex. 200k, 1.5m)")
+    return int(float(m.group(1)) * QUERY_SIZE_UNITS[m.group(2)])
+
+def _parse_query_time(value: str) -> tuple[str, float]:
+    """("age", secondes) pour une duree (7d, 12h), ("date", horodatage) pour une date ISO."""
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([a-z]+)", value)
+    if m and m.group(2) in QUERY_AGE_UNITS:
+        return "age", float(m.group(1)) * QUERY_AGE_UNITS[m.group(2)]
+    try:
+        return "date", datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"date ou duree invalide : {value!r} (ex. 7d, 12h, 2024-01-31)") from None
+
+class _FilterQuery:
+    """Requete du champ de filtre : mots resolus par l'index des chemins, termes evalues en predicats sur les metadonnees."""
+
+    def __init__(self, words: Sequence[str], terms: Sequence[tuple[str, str, object, bool]]):
+        # Les requetes floues d'abord : leur classement devient l'ordre du resultat.
+        self.words = tuple(sorted(words, key=lambda w: _PathIndex.parse(w)[0] != "fuzzy"))
+        self.terms = tuple(terms)
+        self.ranked = any(_PathIndex.parse(w)[0] == "fuzzy" for w in self.words)
+
+    def candidates(self, index: "_PathIndex") -> Sequence[int]:
+        result: list[int] | None = None
+        for word in self.words:
+            hits = index.search(word)
+            if result is None:
+                result = hits
+            else:
+                keep = set(hits)
+                result = [i for i in result if i in keep]
+        return range(len(index)) if result is None else result
+
+    def predicates(
+        self,
+        files: Sequence[Path],
+        lower: Sequence[str],
+        exts: Sequence[str],
+        meta: dict[Path, _FileMeta],
+        tracked: set[Path],
+        reason_of: Callable[[int], str | None],
+        now: float,
+    ) -> list[tuple[float, Callable[[int], bool]]]:
+        def _meta(i: int) -> _FileMeta:
+            m = meta.get(files[i])
+            return m if m is not None else (_stat_meta(files[i]) or _FileMeta())
+
+        preds: list[tuple[float, Callable[[int], bool]]] = []
+        for key, op, value, negate in self.terms:
+            if key == "ext":
+                fn = lambda i, wanted=value: exts[i] in wanted
+            elif key == "path":
+                fn = lambda i, match=_query_path_matcher(value): bool(match(lower[i]))
+            elif key == "name":
+                if any(ch in value for ch in "*?["):
+                    fn = lambda i, pat=value: fnmatch.fnmatchcase(lower[i].rsplit("/", 1)[-1], pat)
+                else:
+                    fn = lambda i, sub=value: sub in lower[i].rsplit("/", 1)[-1]
+            elif key == "size":
+                fn = lambda i, cmp=_QUERY_OPS[op], limit=value: cmp(_meta(i).size, limit)
+            elif key == "modified":
+                kind, amount = value
+                if kind == "age":
+                    # modified<7d : age < 7 jours, donc mtime > maintenant - 7 jours.
+                    age_op = {"<": operator.gt, "<=": operator.ge, ">": operator.lt, ">=": operator.le}.get(op, operator.ge)
+                    fn = lambda i, cmp=age_op, limit=now - amount: cmp(_meta(i).mtime, limit)
+                elif op in (":", "="):
+                    fn = lambda i, day=amount: day <= _meta(i).mtime < day + 86400
+                else:
+                    fn = lambda i, cmp=_QUERY_OPS[op], limit=amount: cmp(_meta(i).mtime, limit)
+            elif key == "reason":
+                fn = lambda i, reasons=value: reason_of(i) in reasons
+            else:
+                fn = lambda i, flag=value: (files[i] in tracked) == flag
+            if negate:
+                fn = lambda i, base=fn: not base(i)
+            preds.append((QUERY_COSTS[key], fn))
+        return preds
+
+@functools.lru_cache(maxsize=32)
+def _compile_query(text: str) -> _FilterQuery:
+    """Compile le texte du filtre ; ValueError (message affichable) si un terme est invalide."""
+    try:
+        tokens = shlex.split(text)
+    except ValueError:
+        tokens = text.split()
+    words: list[str] = []
+    terms: list[tuple[str, str, object, bool]] = []
+    for token in tokens:
+        m = _QUERY_TERM_RE.match(token)
+        if m is None:
+            if token.startswith("-") and len(token) > 1:
+                terms.append(("path", ":", token[1:], True))
+            else:
+                words.append(token)
+            continue
+        negate, key, op, value = bool(m.group(1)), m.group(2), m.group(3), m.group(4).strip()
+        if not value:
+            raise ValueError(f"valeur manquante pour {key}")
+        if op not in (":", "=") and key not in ("size", "modified"):
+            raise ValueError(f"{key} n'accepte que ':'")
+        if key in ("ext", "name", "reason", "tracked"):
+            # Compares aux chemins et extensions en minuscules.
+            value = value.lower()
+        if key == "path":
+            if negate:
+                terms.append((key, op, value, True))
+            else:
+                words.append(value)
+        elif key == "ext":
+            exts = {"." + part.strip().lstrip(".") for part in value.split(",") if part.strip()}
+            terms.append((key, op, frozenset(exts), negate))
+        elif key == "name":
+            terms.append((key, op, value, negate))
+        elif key == "size":
+            terms.append((key, op, _parse_query_size(value), negate))
+        elif key == "modified":
+            terms.append((key, op, _parse_query_time(value), negate))
+        elif key == "reason":
+            reasons = set()
+            for part in value.split(","):
+                part = part.strip()
+                if part in ("none", "aucun"):
+                    reasons.add(None)
+                elif part in AI_REASON_LABELS:
+                    reasons.add(part)
+                else:
+                    raise ValueError(f"motif inconnu : {part!r} (none, {', '.join(AI_REASON_LABELS)})")
+            terms.append((key, op, frozenset(reasons), negate))
+        else:
+            if value in _QUERY_TRUE:
+                terms.append((key, op, True, negate))
+            elif value in _QUERY_FALSE:
+                terms.append((key, op, False, negate))
+            else:
+                raise ValueError(f"tracked attend yes ou no, pas {value!r}")
+    return _FilterQuery(words, terms)
+
+def _order_by_selectivity(
+    preds: Sequence[tuple[float, Callable[[int], bool]]],
+    candidates: Sequence[int],
+    sample_size: int = 256,
+) -> list[Callable[[int], bool]]:
+    """Ordonne les predicats par cout / taux de rejet, mesure sur un echantillon regulier des candidats."""
+    if len(preds) < 2 or not candidates:
+        return [fn for _cost, fn in preds]
+    step = max(1, len(candidates) // sample_size)
+    sample = [candidates[j] for j in range(0, len(candidates), step)][:sample_size]
+    ranked = []
+    for pos, (cost, fn) in enumerate(preds):
+        rejected = sum(1 for i in sample if not fn(i)) / len(sample)
+        ranked.append((cost / max(rejected, 0.01), pos, fn))
+    ranked.sort(key=lambda r: (r[0], r[1]))
+    return [fn for _score, _pos, fn in ranked]
+
+def _ai_exclusion_reason(
+    root: Path,
+    fp: Path,
+    rel_posix: str,
+    size_bytes: int | None,
+    matcher: _GitignoreMatcher | None,
+    gitattributes_rules: Sequence[tuple[str, set[str]]] = (),
+    sniffed: str | None = None,
+) -> str | None:
+    """Motif d'exclusion IA (cle de AI_REASON_LABELS) ou None ; sniffed ne compte que si le chemin est garde."""
+    if matcher is not None and matcher.ignored(rel_posix):
+        return "gitignore"
+    if gitattributes_rules and _gitattributes_excluded(gitattributes_rules, rel_posix):
+        return "gitattributes"
+    if size_bytes is not None and size_bytes > AI_MAX_BYTES:
+        return "size"
+    reason = _ai_filter_reason(fp, root)
+    if reason is None and sniffed and fp.name.lower() not in AI_IMPORTANT_FILENAMES:
+        return sniffed
+    return reason
+
+def _filter_files(
+    root: Path,
+    files: Sequence[Path],
+    meta: dict[Path, _FileMeta],
+    pattern: str,
+    active_exts: set[str],
+    ai_mode: bool,
+    respect_gitignore: bool,
+    gitignore_rules: Sequence[tuple[str, bool]] = (),
+    gitattributes_rules: Sequence[tuple[str, set[str]]] = (),
+    path_index: _PathIndex | None = None,
+    tracked: set[Path] | None = None,
+) -> tuple[list[tuple[Path, Path | str, str, int]], Counter]:
+    """Entrees (chemin, relatif, relatif posix, taille) gardees et compteur des motifs IA ; ValueError si la requete est invalide."""
+    ai_reason_counts: Counter[str] = Counter()
+    items: list[tuple[Path, Path | str, str, int]] = []
+    if path_index is None or len(path_index) != len(files):
+        path_index = _PathIndex(root, files)
+    rels = path_index.rels
+    query = _compile_query(pattern) if pattern else None
+    order: Sequence[int] = query.candidates(path_index) if query is not None else range(len(files))
+    matcher = _gitignore_matcher(tuple(gitignore_rules)) if gitignore_rules else None
+    # Motif IA par fichier : calcule au plus une fois par scan et par jeu de regles (memo de l'index).
+    attrs_key = tuple((pat, frozenset(flags)) for pat, flags in gitattributes_rules)
+    reasons = path_index.memo.setdefault(("reason", tuple(gitignore_rules), attrs_key), {})
+
+    def reason_of(i: int) -> str | None:
+        if i not in reasons:
+            m = meta.get(files[i]) or _stat_meta(files[i])
+            reasons[i] = _ai_exclusion_reason(
+                root, files[i], rels[i], m.size if m else None, matcher, gitattributes_rules, m.sniff if m else None
+            )
+        return reasons[i]
+
+    exts = path_index.exts
+    preds: list[tuple[float, Callable[[int], bool]]] = [(QUERY_COSTS["ext"], lambda i: exts[i] in active_exts)]
+    if query is not None and query.terms:
+        preds += query.predicates(files, path_index.lower, exts, meta, tracked or set(), reason_of, time.time())
+    for pred in _order_by_selectivity(preds, order):
+        order = [i for i in order if pred(i)]
+
+    for i in order:
+        fp = files[i]
+        rel_posix = rels[i]
+        m = meta.get(fp)
+        if m is None:
+            m = _stat_meta(fp)
+        size_bytes = m.size if m is not None else None
+        if ai_mode:
+            reason = reason_of(i)
+            if reason is not None:
+                ai_reason_counts[reason] += 1
+                continue
+        elif respect_gitignore and matcher is not None and matcher.ignored(rel_posix):
+            continue
+        size_value = size_bytes if size_bytes is not None else 0
+        items.append((fp, rel_posix, rel_posix, size_value))
+    return items, ai_reason_counts
+
 def _human_bytes(size: int) -> str:
     units = ["B", "KB", "MB", "GB", "TB", "PB"]
     idx = 0
@@ -753,175 +1768,4366 @@ def _shorten(s: str, maxlen: int = 80) -> str:
     right = keep - left
     return s[:left] + "..." + s[-right:]
 
-class _Cfg:
-    def __init__(
-        self,
-        win="1100x720",
-        col=None,
-        recent=None,
-        ext_state=None,
-        theme="dark",
-        wrap=False,
-        font_size=12,
-        pane=520,
-        sort_col="name",
-        sort_rev=False,
-        filter_text="",
-        codex_cmd: str = "",
-        sort_by_dir: bool = False,
-        ai_filter: bool = False,
-        include_vendor: bool = False,
-        tracked_only: bool = False,
-        respect_gitignore: bool = False,
-        vendor_mode: str | None = None,
-        safe_export_exclude_sensitive: bool = False,
-    ):
-        self.win_geom = win
-        self.col_widths = col or {"name": 320, "size": 100, "rel": 600}
-        self.recent_dirs = recent or []
-        self.ext_enabled = ext_state or {}
-        self.theme = theme
-        self.preview_wrap = wrap
-        self.preview_font_size = font_size
-        self.pane_pos = pane
-        self.sort_col = sort_col
-        self.sort_rev = sort_rev
-        self.filter_text = filter_text
-        self.codex_cmd = codex_cmd
-        self.sort_by_dir = sort_by_dir
-        self.ai_filter = ai_filter
-        self.include_vendor = include_vendor  # legacy toggle
-        self.tracked_only = tracked_only
-        self.respect_gitignore = respect_gitignore
-        self.vendor_mode = vendor_mode or ("symfony" if include_vendor else "none")
-        if self.vendor_mode not in {"none", "symfony", "all"}:
-            self.vendor_mode = "none"
-        self.safe_export_exclude_sensitive = safe_export_exclude_sensitive
-
-    @classmethod
-    def load(cls):
-        try:
-            raw = json.loads(CFG_PATH.read_text(encoding="utf-8"))
-            win = raw.get("win_geom", "1100x720")
-            col = raw.get("col_widths", {"name": 320, "size": 100, "rel": 600})
-            recent = [p for p in raw.get("recent_dirs", []) if Path(p).exists()]
-            ext_state = raw.get("ext_enabled", {})
-            theme = raw.get("theme", "dark")
-            wrap = raw.get("preview_wrap", False)
-            font_size = int(raw.get("preview_font_size", 12))
-            pane = int(raw.get("pane_pos", 520))
-            sort_col = raw.get("sort_col", "name")
-            sort_rev = bool(raw.get("sort_rev", False))
-            filter_text = raw.get("filter_text", "")
-            codex_cmd = raw.get("codex_cmd", "")
-            sort_by_dir = bool(raw.get("sort_by_dir", False))
-            ai_filter = bool(raw.get("ai_filter", False))
-            include_vendor = bool(raw.get("include_vendor", False))
-            tracked_only = bool(raw.get("tracked_only", False))
-            respect_gitignore = bool(raw.get("respect_gitignore", False))
-            vendor_mode = raw.get("vendor_mode")
-            if not vendor_mode:
-                vendor_mode = "symfony" if include_vendor else "none"
-            safe_export_exclude_sensitive = bool(raw.get("safe_export_exclude_sensitive", False))
-            return cls(
-                win,
-                col,
-                recent,
-                ext_state,
-                theme,
-                wrap,
-                font_size,
-                pane,
-                sort_col,
-                sort_rev,
-                filter_text,
-                codex_cmd,
-                sort_by_dir,
-                ai_filter,
-                include_vendor,
-                tracked_only,
-                respect_gitignore,
-                vendor_mode,
-                safe_export_exclude_sensitive,
-            )
-        except Exception:
-            return cls()
-
-    def save(self):
+def _save_scan_snapshot(
+    root: Path,
+    vendor_mode: str,
+    ai_mode: bool,
+    tracked_only: bool,
+    files: Sequence[Path],
+    meta: dict[Path, _FileMeta],
+    tracked: Iterable[Path],
+    selection: Iterable[Path] = (),
+    capped: dict[Path, tuple[int, int]] | None = None,
+    dir_cap: str = "",
+    path: Path = SNAPSHOT_PATH,
+) -> None:
+    """Persiste le dernier scan (meta, motifs IA, dossiers plafonnes) pour un redemarrage instantane."""
+    def rel(p: Path) -> str | None:
         try:
-            CFG_PATH.write_text(
-                json.dumps(
-                    {
-                        "win_geom": self.win_geom,
-                        "col_widths": self.col_widths,
-                        "recent_dirs": self.recent_dirs,
-                        "ext_enabled": self.ext_enabled,
-                        "theme": self.theme,
-                        "preview_wrap": self.preview_wrap,
-                        "preview_font_size": self.preview_font_size,
-                        "pane_pos": self.pane_pos,
-                        "sort_col": self.sort_col,
-                        "sort_rev": self.sort_rev,
-                        "filter_text": self.filter_text,
-                        "codex_cmd": self.codex_cmd,
-                        "sort_by_dir": self.sort_by_dir,
-                        "ai_filter": self.ai_filter,
-                        "include_vendor": self.vendor_mode != "none",
-                        "tracked_only": self.tracked_only,
-                        "respect_gitignore": self.respect_gitignore,
-                        "vendor_mode": self.vendor_mode,
-                        "safe_export_exclude_sensitive": self.safe_export_exclude_sensitive,
-                    },
-                    indent=2,
-                ),
-                encoding="utf-8",
-            )
+            return p.relative_to(root).as_posix()
         except Exception:
-            pass
-
-class _Worker(Protocol):
-    def __call__(self, root: Path, files: Sequence[Path], *extra, q: "queue.Queue", cancel: threading.Event | None = None): ...
+            return None
 
-def _export(root: Path, files: Sequence[Path], out_: Path, q: "queue.Queue", cancel: threading.Event | None = None):
+    entries = []
+    for fp in files:
+        r = rel(fp)
+        if r is None:
+            continue
+        m = meta.get(fp)
+        entry = [r, m.size if m else 0, m.mtime if m else 0.0]
+        if m is not None and m.sniff:
+            entry.append(m.sniff)
+        entries.append(entry)
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "root": str(root),
+        "vendor_mode": vendor_mode,
+        "ai_mode": bool(ai_mode),
+        "tracked_only": bool(tracked_only),
+        "dir_cap": dir_cap,
+        "saved": time.time(),
+        "files": entries,
+        "tracked": [r for r in (rel(p) for p in tracked) if r is not None],
+        "selection": [r for r in (rel(p) for p in selection) if r is not None],
+        "capped": [[r, hidden, hidden_bytes] for d, (hidden, hidden_bytes) in (capped or {}).items() if (r := rel(d)) is not None],
+    }
+    tmp = path.with_name(path.name + ".tmp")
     try:
-        if not files:
-            q.put(("error", "Aucun fichier selectionne."))
-            return
-        out_.parent.mkdir(parents=True, exist_ok=True)
-        files_sorted = sorted(files, key=lambda p: p.relative_to(root).as_posix().casefold())
-        total = len(files_sorted)
-        intro = _compose_structured_intro(root, files_sorted)
-        with out_.open("w", encoding="utf-8", newline="\n") as out:
-            out.write(intro + "\n")
-            for i, fp in enumerate(files_sorted, 1):
-                if cancel and cancel.is_set():
-                    q.put(("cancelled", "export"))
-                    return
-                try:
-                    rel = fp.relative_to(root)
-                except Exception:
-                    rel = fp
-                lang = _lang_for(fp)
-                out.write(f"### {i}/{total} - {rel}\n{'-'*80}\n")
-                out.write(f"```{lang}\n")
-                for c in _chunks(fp):
-                    if cancel and cancel.is_set():
-                        q.put(("cancelled", "export"))
-                        return
-                    out.write(c)
-                out.write("\n```\n\n")
-                q.put(("progress", i, total))
-        q.put(("done_export", total, out_))
-    except Exception as e:
-        LOGGER.exception("Echec export", exc_info=e)
-        q.put(("error", str(e)))
+        tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        # Là je remplace d'un coup pour ne jamais laisser un instantane a moitie ecrit.
+        os.replace(tmp, path)
+    except Exception as exc:
+        LOGGER.exception("Echec ecriture instantane", exc_info=exc)
 
-def _copy(root: Path, files: Sequence[Path], q: "queue.Queue", cancel: threading.Event | None = None):
+def _load_scan_snapshot(
+    root: Path, vendor_mode: str, ai_mode: bool, tracked_only: bool, dir_cap: str = "", path: Path = SNAPSHOT_PATH
+):
+    """(files, meta, tracked, selection, capped) si l'instantane correspond au projet et aux options, sinon None."""
     try:
-        if not files:
-            q.put(("error", "Aucun fichier selectionne."))
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if (
+        data.get("version") != SNAPSHOT_VERSION
+        or data.get("root") != str(root)
+        or data.get("vendor_mode") != vendor_mode
+        or bool(data.get("ai_mode")) != bool(ai_mode)
+        or bool(data.get("tracked_only")) != bool(tracked_only)
+        or data.get("dir_cap", "") != dir_cap
+    ):
+        return None
+    files: list[Path] = []
+    meta: dict[Path, _FileMeta] = {}
+    for rel, size, mtime, *sniff in data.get("files", []):
+        fp = root / rel
+        files.append(fp)
+        meta[fp] = _FileMeta(int(size), float(mtime), sniff[0] if sniff else None)
+    tracked = {root / rel for rel in data.get("tracked", [])}
+    selection = [root / rel for rel in data.get("selection", [])]
+    capped = {root / rel: (int(hidden), int(hidden_bytes)) for rel, hidden, hidden_bytes in data.get("capped", [])}
+    return files, meta, tracked, selection, capped
+
+def _importable_in_child(func: Callable) -> bool:
+    """Un processus spawn ne retrouve func que si son module est le script principal ou un module importable."""
+    module = getattr(func, "__module__", None)
+    if module == "__main__":
+        return True
+    try:
+        import importlib.machinery
+
+        # PathFinder ignore sys.modules : un module charge depuis un chemin arbitraire n'est pas retrouve.
+        top = (module or "").split(".", 1)[0]
+        return bool(top) and importlib.machinery.PathFinder.find_spec(top) is not None
+    except Exception:
+        return False
+
+_POOL_LOCK = threading.Lock()
+_POOL = None  # ProcessPoolExecutor partage, voir _process_pool
+
+def _process_pool():
+    """Pool de processus (spawn) partage par tous les calculs, cree au premier besoin ; None si indisponible."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            try:
+                import atexit
+                import concurrent.futures
+                import multiprocessing
+                _POOL = concurrent.futures.ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(_POOL.shutdown, wait=False, cancel_futures=True)
+            except Exception as exc:
+                LOGGER.warning("Pool de processus indisponible : %s", exc)
+        return _POOL
+
+def _drop_process_pool(executor) -> None:
+    # Pool casse (processus tue...) : le prochain appel en recree un.
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is executor:
+            _POOL = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def _parallel_map(func: Callable, items: Iterable, chunksize: int = 16, min_items: int = PARALLEL_MIN_ITEMS) -> Iterator:
+    """map() ordonne sur le pool partage ; en serie pour les petits lots ou sans pool, sans recalculer les elements deja faits."""
+    items = list(items)
+    done = 0
+    if len(items) >= min_items and (os.cpu_count() or 1) > 1 and _importable_in_child(func):
+        executor = _process_pool()
+        if executor is not None:
+            # Arret anticipe (annulation) : le generateur de map annule les taches encore en attente.
+            results = None
+            try:
+                results = executor.map(func, items, chunksize=chunksize)
+                for result in results:
+                    yield result
+                    done += 1
+            except Exception as exc:
+                import concurrent.futures
+
+                LOGGER.warning("Pool de processus interrompu, repli en serie : %s", exc)
+                if isinstance(exc, concurrent.futures.BrokenExecutor):
+                    _drop_process_pool(executor)
+            finally:
+                if results is not None:
+                    results.close()
+    for item in items[done:]:
+        yield func(item)
+
+# Identifiants entiers, sans borne : un mot de la requete doit etre une sous-chaine d'un jeton indexe.
+_CONTENT_TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+def _read_text(p: Path) -> str:
+    """Contenu complet decode comme dans _chunks (UTF-8 strict, sinon UTF-8 avec remplacement)."""
+    data = p.read_bytes()
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("utf-8-sig", errors="replace")
+
+def _content_tokens(path: str) -> tuple[str, int, float, list[str] | None]:
+    """(chemin, taille, mtime, identifiants en minuscules) ; None si le fichier n'est pas indexable."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return path, -1, 0.0, None
+    if st.st_size > CONTENT_INDEX_MAX_BYTES:
+        return path, st.st_size, st.st_mtime, None
+    try:
+        text = _read_text(Path(path))
+    except Exception:
+        return path, st.st_size, st.st_mtime, None
+    return path, st.st_size, st.st_mtime, sorted({tok.lower() for tok in _CONTENT_TOKEN_RE.findall(text)})
+
+def _project_cache_dir(root: Path) -> Path:
+    import hashlib
+
+    digest = hashlib.sha1(str(root.resolve()).encode("utf-8", "surrogatepass")).hexdigest()[:16]
+    return CONTENT_CACHE_DIR / digest
+
+def _content_index_path(root: Path) -> Path:
+    return _project_cache_dir(root) / "content.sqlite"
+
+class _FileCache:
+    """Cache sqlite de valeurs JSON par fichier, invalidees par taille/mtime ; kind versionne l'extracteur ("imports:1")."""
+
+    def __init__(self, root: Path, kind: str, path: Path | None = None):
+        self.root = root
+        self.kind = kind
+        self.path = path or (_project_cache_dir(root) / "files.sqlite")
+
+    def _connect(self):
+        import sqlite3
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.path))
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS entries(kind TEXT, rel TEXT, size INTEGER, mtime REAL, value TEXT, "
+            "PRIMARY KEY(kind, rel)) WITHOUT ROWID"
+        )
+        return con
+
+    def get_many(self, wanted: dict[str, tuple[int, float]]) -> dict[str, object]:
+        """Valeurs a jour pour les chemins relatifs demandes (rel -> (taille, mtime))."""
+        if not wanted:
+            return {}
+        try:
+            con = self._connect()
+        except Exception as exc:
+            LOGGER.warning("Cache %s indisponible : %s", self.kind, exc)
+            return {}
+        try:
+            found: dict[str, object] = {}
+            for rel, size, mtime, value in con.execute("SELECT rel, size, mtime, value FROM entries WHERE kind = ?", (self.kind,)):
+                if wanted.get(rel) == (size, mtime):
+                    found[rel] = json.loads(value)
+            return found
+        finally:
+            con.close()
+
+    def put_many(self, rows: Iterable[tuple[str, int, float, object]]) -> None:
+        try:
+            con = self._connect()
+        except Exception as exc:
+            LOGGER.warning("Cache %s indisponible : %s", self.kind, exc)
+            return
+        try:
+            with con:
+                con.executemany(
+                    "INSERT OR REPLACE INTO entries(kind, rel, size, mtime, value) VALUES (?, ?, ?, ?, ?)",
+                    ((self.kind, rel, size, mtime, json.dumps(value)) for rel, size, mtime, value in rows),
+                )
+        except Exception as exc:
+            LOGGER.warning("Ecriture du cache %s impossible : %s", self.kind, exc)
+        finally:
+            con.close()
+
+def _cached_file_map(
+    root: Path,
+    files: Sequence[Path],
+    kind: str,
+    func: Callable[[str], tuple[str, object]],
+    cancel: threading.Event | None = None,
+    cache: _FileCache | None = None,
+    **map_options,
+) -> dict[Path, object] | None:
+    """func(chemin) -> (chemin, valeur JSON) sur le pool de processus, valeurs a jour relues dans le cache kind ; None si annule."""
+    stamps: dict[str, tuple[int, float]] = {}
+    by_rel: dict[str, Path] = {}
+    for fp in files:
+        try:
+            st = fp.stat()
+            rel = fp.relative_to(root).as_posix()
+        except Exception:
+            continue
+        stamps[rel] = (st.st_size, st.st_mtime)
+        by_rel[rel] = fp
+    cache = cache or _FileCache(root, kind)
+    found = cache.get_many(stamps)
+    result: dict[Path, object] = {by_rel[rel]: value for rel, value in found.items()}
+    fresh: list[tuple[str, int, float, object]] = []
+    todo = [str(by_rel[rel]) for rel in by_rel if rel not in found]
+    for path, value in _parallel_map(func, todo, **map_options):
+        if cancel is not None and cancel.is_set():
+            break
+        fp = Path(path)
+        result[fp] = value
+        rel = fp.relative_to(root).as_posix()
+        fresh.append((rel, *stamps[rel], value))
+    if fresh:
+        cache.put_many(fresh)
+    if cancel is not None and cancel.is_set():
+        return None
+    return result
+
+class _ContentIndex:
+    """Index inverse (sqlite) des identifiants par fichier : il n'ecarte que les fichiers qui ne peuvent pas correspondre."""
+
+    def __init__(self, root: Path, path: Path | None = None):
+        self.root = root
+        self.path = path or _content_index_path(root)
+        # rel -> (taille, mtime) des fichiers indexes ; charge a la demande.
+        self.state: dict[str, tuple[int, float]] | None = None
+
+    def _connect(self):
+        import sqlite3
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.path))
+        if con.execute("PRAGMA user_version").fetchone()[0] != CONTENT_INDEX_VERSION:
+            con.executescript(
+                """
+                DROP TABLE IF EXISTS postings;
+                DROP TABLE IF EXISTS vocab;
+                DROP TABLE IF EXISTS files;
+                CREATE TABLE files(id INTEGER PRIMARY KEY, rel TEXT UNIQUE NOT NULL, size INTEGER, mtime REAL, indexed INTEGER);
+                CREATE TABLE vocab(id INTEGER PRIMARY KEY, token TEXT UNIQUE NOT NULL);
+                CREATE TABLE postings(token_id INTEGER, file_id INTEGER, PRIMARY KEY(token_id, file_id)) WITHOUT ROWID;
+                CREATE INDEX postings_file ON postings(file_id);
+                """
+            )
+            con.execute(f"PRAGMA user_version = {CONTENT_INDEX_VERSION}")
+        con.execute("PRAGMA journal_mode = WAL")
+        con.execute("PRAGMA synchronous = NORMAL")
+        return con
+
+    def _load_state(self, con) -> dict[str, tuple[int, float]]:
+        return {rel: (size, mtime) for rel, size, mtime in con.execute("SELECT rel, size, mtime FROM files WHERE indexed = 1")}
+
+    def update(
+        self,
+        files: Sequence[Path],
+        meta: dict[Path, _FileMeta],
+        cancel: threading.Event | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        batch: int = 256,
+    ) -> tuple[int, int]:
+        """Reindexe les fichiers nouveaux ou modifies et oublie les disparus ; retourne (reindexes, supprimes)."""
+        con = self._connect()
+        try:
+            rows = {rel: (fid, size, mtime) for fid, rel, size, mtime in con.execute("SELECT id, rel, size, mtime FROM files")}
+            current: dict[str, Path] = {}
+            todo: list[Path] = []
+            for fp in files:
+                try:
+                    rel = fp.relative_to(self.root).as_posix()
+                except Exception:
+                    continue
+                current[rel] = fp
+                row = rows.get(rel)
+                m = meta.get(fp)
+                if row is None or m is None or (row[1], row[2]) != (m.size, m.mtime):
+                    todo.append(fp)
+            stale = [rows[rel][0] for rel in rows if rel not in current]
+            stale += [rows[rel][0] for rel in (fp.relative_to(self.root).as_posix() for fp in todo) if rel in rows]
+            with con:
+                for j in range(0, len(stale), 500):
+                    ids = stale[j:j + 500]
+                    marks = ",".join("?" * len(ids))
+                    con.execute(f"DELETE FROM postings WHERE file_id IN ({marks})", ids)
+                    con.execute(f"DELETE FROM files WHERE id IN ({marks})", ids)
+            removed = sum(1 for rel in rows if rel not in current)
+            done = 0
+            pending: list[tuple[str, int, float, list[str] | None]] = []
+            for result in _parallel_map(_content_tokens, [str(fp) for fp in todo]):
+                pending.append(result)
+                done += 1
+                if len(pending) >= batch or done == len(todo):
+                    self._write_batch(con, pending)
+                    pending = []
+                    if progress:
+                        progress(done, len(todo))
+                if cancel is not None and cancel.is_set():
+                    break
+            if pending:
+                self._write_batch(con, pending)
+            self.state = self._load_state(con)
+            return done, removed
+        finally:
+            con.close()
+
+    def _write_batch(self, con, results: Sequence[tuple[str, int, float, list[str] | None]]) -> None:
+        with con:
+            tokens = sorted({tok for *_head, toks in results if toks for tok in toks})
+            con.executemany("INSERT OR IGNORE INTO vocab(token) VALUES (?)", ((tok,) for tok in tokens))
+            ids: dict[str, int] = {}
+            for j in range(0, len(tokens), 500):
+                chunk = tokens[j:j + 500]
+                ids.update(con.execute(f"SELECT token, id FROM vocab WHERE token IN ({','.join('?' * len(chunk))})", chunk))
+            for path, size, mtime, toks in results:
+                if size < 0:
+                    continue
+                try:
+                    rel = Path(path).relative_to(self.root).as_posix()
+                except Exception:
+                    continue
+                cur = con.execute(
+                    "INSERT OR REPLACE INTO files(rel, size, mtime, indexed) VALUES (?, ?, ?, ?)",
+                    (rel, size, mtime, 0 if toks is None else 1),
+                )
+                if toks:
+                    fid = cur.lastrowid
+                    con.executemany("INSERT OR IGNORE INTO postings(token_id, file_id) VALUES (?, ?)", ((ids[tok], fid) for tok in toks))
+
+    def candidates(self, query: str) -> tuple[set[str] | None, dict[str, tuple[int, float]]]:
+        """(chemins indexes contenant tous les identifiants, etat de l'index) ; None si la requete n'en contient aucun."""
+        con = self._connect()
+        try:
+            if self.state is None:
+                self.state = self._load_state(con)
+            words = {tok.lower() for tok in _CONTENT_TOKEN_RE.findall(query)}
+            if not words:
+                return None, self.state
+            result: set[str] | None = None
+            # Un identifiant de la requete peut n'etre qu'une partie d'un identifiant du fichier.
+            for word in sorted(words, key=len, reverse=True):
+                rels = {
+                    rel
+                    for (rel,) in con.execute(
+                        "SELECT DISTINCT f.rel FROM vocab v JOIN postings p ON p.token_id = v.id "
+                        "JOIN files f ON f.id = p.file_id WHERE instr(v.token, ?) > 0",
+                        (word,),
+                    )
+                }
+                result = rels if result is None else result & rels
+                if not result:
+                    break
+            return result or set(), self.state
+        finally:
+            con.close()
+
+def _grep_pattern(query: str, regex: bool = False, case_sensitive: bool = False) -> re.Pattern:
+    """Expression compilee pour la recherche de contenu (re.error si l'expression est invalide)."""
+    return re.compile(query if regex else re.escape(query), 0 if case_sensitive else re.IGNORECASE)
+
+def _grep_count(args: tuple[str, str, int]) -> tuple[str, int]:
+    path, source, flags = args
+    try:
+        text = _read_text(Path(path))
+    except Exception:
+        return path, 0
+    return path, sum(1 for _ in re.finditer(source, text, flags))
+
+def _grep_files(
+    root: Path,
+    files: Sequence[Path],
+    meta: dict[Path, _FileMeta],
+    query: str,
+    regex: bool = False,
+    case_sensitive: bool = False,
+    index: _ContentIndex | None = None,
+    cancel: threading.Event | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> tuple[list[tuple[Path, int]], int]:
+    """Fichiers contenant la requete (nombre d'occurrences) et nombre de fichiers relus."""
+    rx = _grep_pattern(query, regex, case_sensitive)
+    to_read: list[Path] = list(files)
+    if index is not None and not regex:
+        matching, state = index.candidates(query)
+        if matching is not None:
+            to_read = []
+            for fp in files:
+                try:
+                    rel = fp.relative_to(root).as_posix()
+                except Exception:
+                    rel = ""
+                if rel in matching:
+                    to_read.append(fp)
+                    continue
+                # Ecarte seulement si l'index est a jour maintenant : le fichier a pu changer depuis le scan.
+                indexed = state.get(rel)
+                m = meta.get(fp)
+                fresh = indexed is not None and m is not None and indexed == (m.size, m.mtime)
+                if fresh:
+                    try:
+                        st = fp.stat()
+                        fresh = indexed == (st.st_size, st.st_mtime)
+                    except OSError:
+                        fresh = False
+                if not fresh:
+                    to_read.append(fp)
+    found: list[tuple[Path, int]] = []
+    by_path = {str(fp): fp for fp in to_read}
+    for i, (path, count) in enumerate(_parallel_map(_grep_count, [(p, rx.pattern, rx.flags) for p in by_path]), 1):
+        if count:
+            found.append((by_path[path], count))
+        if progress:
+            progress(i, len(by_path))
+        if cancel is not None and cancel.is_set():
+            break
+    return found, len(by_path)
+
+def _grep_worker(
+    root: Path,
+    files: Sequence[Path],
+    meta: dict[Path, _FileMeta],
+    query: str,
+    regex: bool,
+    case_sensitive: bool,
+    index: _ContentIndex | None,
+    q: "queue.Queue",
+    cancel: threading.Event | None = None,
+):
+    try:
+        t0 = time.perf_counter()
+        found, read = _grep_files(root, files, meta, query, regex, case_sensitive, index, cancel, _ProgressThrottle(q))
+        if cancel and cancel.is_set():
+            q.put(("cancelled", "grep"))
+            return
+        q.put(("grep_done", query, found, read, time.perf_counter() - t0))
+    except re.error as e:
+        q.put(("error", f"Expression reguliere invalide : {e}"))
+    except Exception as e:
+        LOGGER.exception("Echec recherche", exc_info=e)
+        q.put(("error", str(e)))
+
+IMPORTS_CACHE_KIND = "imports:1"
+IMPORT_LANG_BY_EXT = {
+    ".py": "py",
+    ".pyi": "py",
+    ".js": "js",
+    ".jsx": "js",
+    ".mjs": "js",
+    ".cjs": "js",
+    ".ts": "js",
+    ".tsx": "js",
+    ".vue": "js",
+    ".php": "php",
+}
+JS_RESOLVE_EXTS = (".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".vue", ".json")
+
+_PY_IMPORT_RE = re.compile(r"^[ \t]*(?:from[ \t]+(\.*[\w.]*)[ \t]+import[ \t]+\(?([\w, \t*]+)|import[ \t]+([\w., \t]+))", re.M)
+_JS_IMPORT_RE = re.compile(
+    r"""(?:\bimport\s+(?:[\w*{}\s,$]+\s+from\s+)?|\bexport\s+[\w*{}\s,$]+\s+from\s+|\brequire\s*\(\s*|\bimport\s*\(\s*)(['"])([^'"\n]+)\1"""
+)
+_PHP_NAMESPACE_RE = re.compile(r"^\s*namespace\s+([\w\\]+)\s*[;{]", re.M)
+_PHP_USE_RE = re.compile(r"(?:^|[;{])\s*use\s+(?!function\b|const\b)([^;{]+?)(?:\{([^}]*)\})?\s*;", re.M)
+_PHP_REF_RE = re.compile(r"\b(?:new|extends|implements|instanceof)\s+(\\?[A-Z][\w\\]*(?:\s*,\s*\\?[A-Z][\w\\]*)*)|(\\?\b[A-Z][\w\\]*)::")
+_PHP_INCLUDE_RE = re.compile(r"""\b(?:require|include)(?:_once)?\s*\(?\s*(__DIR__\s*\.\s*)?(['"])([^'"]+)\2""")
+
+def _python_imports(text: str) -> list[str]:
+    import ast
+
+    specs: list[str] = []
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        # Fichier invalide (ou Python 2) : repli sur une lecture ligne a ligne.
+        for m in _PY_IMPORT_RE.finditer(text):
+            if m.group(3):
+                specs += [part.split()[0] for part in m.group(3).split(",") if part.strip()]
+            else:
+                base = m.group(1)
+                specs.append(base)
+                sep = "" if base.endswith(".") else "."
+                specs += [base + sep + name.split()[0] for name in m.group(2).split(",") if name.strip() and name.strip() != "*"]
+        return specs
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            specs += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            base = "." * node.level + (node.module or "")
+            specs.append(base)
+            sep = "" if base.endswith(".") else "."
+            # "from pkg import mod" peut designer un sous-module : la resolution tranchera.
+            specs += [base + sep + alias.name for alias in node.names if alias.name != "*"]
+    return specs
+
+def _php_imports(text: str) -> list[str]:
+    m = _PHP_NAMESPACE_RE.search(text)
+    namespace = m.group(1).strip("\\") if m else ""
+    aliases: dict[str, str] = {}
+    specs: list[str] = []
+    for m in _PHP_USE_RE.finditer(text):
+        head, group = m.group(1).strip(), m.group(2)
+        parts = [head.rstrip("\\") + "\\" + item.strip() for item in group.split(",") if item.strip()] if group is not None else head.split(",")
+        for part in parts:
+            bits = part.strip().split()
+            if not bits:
+                continue
+            fqn = bits[0].strip("\\")
+            alias = bits[-1] if len(bits) >= 3 and bits[-2].lower() == "as" else fqn.rsplit("\\", 1)[-1]
+            aliases[alias] = fqn
+            specs.append("php:" + fqn)
+
+    def qualify(name: str) -> str:
+        if name.startswith("\\"):
+            return name[1:]
+        first, _, rest = name.partition("\\")
+        if first in aliases:
+            return aliases[first] + ("\\" + rest if rest else "")
+        return f"{namespace}\\{name}" if namespace else name
+
+    for m in _PHP_REF_RE.finditer(text):
+        names = m.group(1) or m.group(2)
+        for name in names.split(","):
+            name = name.strip()
+            if name and name not in ("self", "static", "parent"):
+                specs.append("php:" + qualify(name))
+    for m in _PHP_INCLUDE_RE.finditer(text):
+        specs.append(("inc:" if m.group(1) else "incx:") + m.group(3))
+    return specs
+
+def _extract_imports(path: str) -> tuple[str, list[str]]:
+    """Specificateurs d'import bruts d'un fichier (resolus plus tard contre la liste du projet)."""
+    lang = IMPORT_LANG_BY_EXT.get(os.path.splitext(path)[1].lower())
+    if lang is None:
+        return path, []
+    try:
+        text = _read_text(Path(path))
+    except Exception:
+        return path, []
+    if lang == "py":
+        return path, ["py:" + spec for spec in _python_imports(text)]
+    if lang == "js":
+        return path, ["js:" + m.group(2) for m in _JS_IMPORT_RE.finditer(text)]
+    return path, _php_imports(text)
+
+class _ImportResolver:
+    def __init__(self, root: Path, files: Sequence[Path]):
+        self.root = root
+        self.by_rel: dict[str, Path] = {}
+        for fp in files:
+            try:
+                self.by_rel[fp.relative_to(root).as_posix()] = fp
+            except Exception:
+                continue
+        self.py_modules: dict[str, list[Path]] = defaultdict(list)
+        packages = {rel.rsplit("/", 1)[0] for rel in self.by_rel if rel.endswith("/__init__.py")}
+        for rel, fp in self.by_rel.items():
+            if not rel.endswith((".py", ".pyi")):
+                continue
+            parts = rel.rsplit(".", 1)[0].split("/")
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            if not parts:
+                continue
+            # Nom depuis la racine du projet, et depuis le haut de la chaine de paquets (src/pkg -> pkg).
+            start = len(parts) - 1
+            while start > 0 and "/".join(parts[:start]) in packages:
+                start -= 1
+            for name in {".".join(parts), ".".join(parts[start:])}:
+                self.py_modules[name].append(fp)
+        self.psr4: list[tuple[str, str]] = []
+        self.js_aliases: list[tuple[str, str]] = []
+        self._load_composer()
+        self._load_tsconfig()
+
+    def _load_composer(self) -> None:
+        try:
+            data = json.loads((self.root / "composer.json").read_text(encoding="utf-8"))
+        except Exception:
+            return
+        for section in ("autoload", "autoload-dev"):
+            for prefix, dirs in ((data.get(section) or {}).get("psr-4") or {}).items():
+                for d in [dirs] if isinstance(dirs, str) else dirs:
+                    self.psr4.append((prefix.strip("\\"), d.strip("/")))
+        self.psr4.sort(key=lambda item: len(item[0]), reverse=True)
+
+    def _load_tsconfig(self) -> None:
+        for name in ("tsconfig.json", "jsconfig.json"):
+            try:
+                raw = (self.root / name).read_text(encoding="utf-8")
+            except OSError:
+                continue
+            try:
+                # tsconfig tolere commentaires et virgules finales.
+                raw = re.sub(r"^\s*//[^\n]*|/\*.*?\*/", "", raw, flags=re.M | re.S)
+                data = json.loads(re.sub(r",(\s*[}\]])", r"\1", raw))
+                opts = data.get("compilerOptions") or {}
+                base = opts.get("baseUrl") or "."
+                paths = opts.get("paths") or {}
+            except Exception as exc:
+                LOGGER.warning("%s illisible, alias d'imports ignores : %s", name, exc)
+                continue
+            for alias, targets in paths.items():
+                if not targets:
+                    continue
+                # Cibles relatives a baseUrl, lui-meme relatif au dossier du tsconfig (la racine).
+                target = self._norm(f"{base}/{targets[0].rstrip('*')}")
+                if target is not None:
+                    self.js_aliases.append((alias.rstrip("*"), f"{target}/" if target else ""))
+            if self.js_aliases:
+                self.js_aliases.sort(key=lambda item: len(item[0]), reverse=True)
+                return
+
+    @staticmethod
+    def _norm(path: str) -> str | None:
+        out: list[str] = []
+        for part in path.split("/"):
+            if part in ("", "."):
+                continue
+            if part == "..":
+                if not out:
+                    return None
+                out.pop()
+            else:
+                out.append(part)
+        return "/".join(out)
+
+    def _closest(self, candidates: Sequence[Path], src: Path) -> Path:
+        if len(candidates) == 1:
+            return candidates[0]
+        src_parts = src.parts
+        return max(candidates, key=lambda fp: (len(os.path.commonprefix([fp.parts, src_parts])), -len(fp.parts)))
+
+    def _resolve_py(self, spec: str, src_rel: str, src: Path) -> Path | None:
+        level = len(spec) - len(spec.lstrip("."))
+        name = spec[level:]
+        if level:
+            parts = src_rel.rsplit(".", 1)[0].split("/")
+            package = parts[:-1]
+            if level > 1:
+                package = package[: len(package) - (level - 1)] if level - 1 <= len(package) else None
+            if package is None:
+                return None
+            rel = "/".join(package + (name.split(".") if name else []))
+            fp = self.by_rel.get(rel + ".py") or self.by_rel.get(rel + "/__init__.py") or self.by_rel.get(rel + ".pyi")
+            return fp
+        candidates = self.py_modules.get(name)
+        return self._closest(candidates, src) if candidates else None
+
+    def _resolve_path(self, rel: str | None, exts: Sequence[str] = ()) -> Path | None:
+        if rel is None:
+            return None
+        fp = self.by_rel.get(rel)
+        if fp is not None:
+            return fp
+        for ext in exts:
+            fp = self.by_rel.get(rel + ext) or self.by_rel.get(f"{rel}/index{ext}")
+            if fp is not None:
+                return fp
+        return None
+
+    def _resolve_js(self, spec: str, src_dir: str) -> Path | None:
+        spec = spec.split("?", 1)[0]
+        if spec.startswith("."):
+            return self._resolve_path(self._norm(f"{src_dir}/{spec}"), JS_RESOLVE_EXTS)
+        for alias, target in self.js_aliases:
+            if spec.startswith(alias):
+                return self._resolve_path(self._norm(target + spec[len(alias):]), JS_RESOLVE_EXTS)
+        return None
+
+    def _resolve_php(self, fqn: str) -> Path | None:
+        for prefix, base in self.psr4:
+            if fqn == prefix or fqn.startswith(prefix + "\\") or not prefix:
+                rest = fqn[len(prefix):].strip("\\").replace("\\", "/")
+                fp = self.by_rel.get(f"{base}/{rest}.php".lstrip("/"))
+                if fp is not None:
+                    return fp
+        return None
+
+    def resolve(self, src: Path, specs: Iterable[str]) -> set[Path]:
+        try:
+            src_rel = src.relative_to(self.root).as_posix()
+        except Exception:
+            return set()
+        src_dir = src_rel.rsplit("/", 1)[0] if "/" in src_rel else ""
+        deps: set[Path] = set()
+        for spec in specs:
+            kind, _, value = spec.partition(":")
+            if kind == "py":
+                fp = self._resolve_py(value, src_rel, src)
+            elif kind == "js":
+                fp = self._resolve_js(value, src_dir)
+            elif kind == "php":
+                fp = self._resolve_php(value)
+            elif kind == "inc":
+                fp = self._resolve_path(self._norm(f"{src_dir}/{value}"))
+            elif kind == "incx":
+                fp = self._resolve_path(self._norm(f"{src_dir}/{value}")) or self._resolve_path(self._norm(value))
+            else:
+                fp = None
+            if fp is not None and fp != src:
+                deps.add(fp)
+        return deps
+
+class _ImportGraph:
+    """Graphe des imports internes au projet : fichier -> fichiers dont il depend."""
+
+    def __init__(self, root: Path, deps: dict[Path, set[Path]]):
+        self.root = root
+        self.deps = deps
+        rdeps: dict[Path, set[Path]] = defaultdict(set)
+        for src, targets in deps.items():
+            for target in targets:
+                rdeps[target].add(src)
+        self.rdeps = dict(rdeps)
+
+    @property
+    def edges(self) -> int:
+        return sum(len(targets) for targets in self.deps.values())
+
+    def closure(self, seeds: Iterable[Path], reverse: bool = False) -> set[Path]:
+        """Fermeture transitive des dependances (ou des dependants si reverse), graines comprises."""
+        graph = self.rdeps if reverse else self.deps
+        seen = set(seeds)
+        stack = list(seen)
+        while stack:
+            for nxt in graph.get(stack.pop(), ()):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return seen
+
+    def topo_order(self, files: Sequence[Path]) -> list[Path]:
+        """Fichiers donnes, dependances d'abord (cycles tolerees), a egalite dans l'ordre des chemins."""
+        def rel_key(fp: Path) -> str:
+            try:
+                return fp.relative_to(self.root).as_posix().casefold()
+            except Exception:
+                return str(fp).casefold()
+
+        wanted = set(files)
+        ordered: list[Path] = []
+        state: dict[Path, int] = {}
+        for seed in sorted(wanted, key=rel_key):
+            if seed in state:
+                continue
+            state[seed] = 1
+            stack = [(seed, iter(sorted((d for d in self.deps.get(seed, ()) if d in wanted), key=rel_key)))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if child not in state:
+                        state[child] = 1
+                        stack.append((child, iter(sorted((d for d in self.deps.get(child, ()) if d in wanted), key=rel_key))))
+                        break
+                else:
+                    stack.pop()
+                    state[node] = 2
+                    ordered.append(node)
+        return ordered
+
+def _build_import_graph(
+    root: Path,
+    files: Sequence[Path],
+    meta: dict[Path, _FileMeta],
+    cancel: threading.Event | None = None,
+    cache: _FileCache | None = None,
+) -> _ImportGraph | None:
+    """Extrait (en parallele, avec cache par mtime) puis resout les imports ; None si annule."""
+    sources: dict[str, Path] = {}
+    for fp in files:
+        if fp.suffix.lower() in IMPORT_LANG_BY_EXT:
+            try:
+                sources[fp.relative_to(root).as_posix()] = fp
+            except Exception:
+                continue
+    stamps = {rel: (meta[fp].size, meta[fp].mtime) for rel, fp in sources.items() if fp in meta}
+    cache = cache or _FileCache(root, IMPORTS_CACHE_KIND)
+    specs: dict[str, list[str]] = cache.get_many(stamps)  # type: ignore[assignment]
+    todo = [rel for rel in sources if rel not in specs]
+    fresh: list[tuple[str, int, float, object]] = []
+    for path, found in _parallel_map(_extract_imports, [str(sources[rel]) for rel in todo]):
+        rel = Path(path).relative_to(root).as_posix()
+        specs[rel] = found
+        if rel in stamps:
+            fresh.append((rel, *stamps[rel], found))
+        if cancel is not None and cancel.is_set():
+            break
+    if fresh:
+        cache.put_many(fresh)
+    if cancel is not None and cancel.is_set():
+        return None
+    resolver = _ImportResolver(root, files)
+    deps = {sources[rel]: resolver.resolve(sources[rel], found) for rel, found in specs.items() if rel in sources}
+    return _ImportGraph(root, {src: targets for src, targets in deps.items() if targets})
+
+HOT_CACHE_VERSION = 1
+HOT_SINCE_DAYS = 365  # fenetre d'historique, comptee depuis la date du commit HEAD
+HOT_HALF_LIFE_DAYS = 30  # un commit vieux de 30 jours compte moitie moins qu'un commit du jour
+HOT_BULK_FILES = 100  # commits plus larges (reformatage, mise a jour de vendor) : ignores pour le co-changement
+HOT_COCHANGE_WEIGHT = 1.0
+HOT_TOP_DEFAULT = 20
+
+class _GitHotness:
+    """Chaque commit compte 0.5 ** (age / HOT_HALF_LIFE_DAYS), l'age etant mesure depuis HEAD (score stable par HEAD)."""
+
+    def __init__(self, root: Path, head: str, ref_time: int, paths: list[str], commits: list[tuple[int, list[int]]]):
+        self.root = root
+        self.head = head
+        self.ref_time = ref_time
+        self.paths = paths
+        self.commits = commits
+        self.ids = {rel: i for i, rel in enumerate(paths)}
+        self.weights = [0.5 ** (max(0, ref_time - t) / (HOT_HALF_LIFE_DAYS * 86400)) for t, _ids in commits]
+        self.scores = [0.0] * len(paths)
+        self.touches: list[list[int]] = [[] for _ in paths]
+        for c, (_t, ids) in enumerate(commits):
+            w = self.weights[c]
+            for i in ids:
+                self.scores[i] += w
+                self.touches[i].append(c)
+
+    def _id(self, fp: Path) -> int | None:
+        try:
+            return self.ids.get(fp.relative_to(self.root).as_posix())
+        except ValueError:
+            return None
+
+    def score(self, fp: Path) -> float:
+        i = self._id(fp)
+        return 0.0 if i is None else self.scores[i]
+
+    def rel_score(self, rel_posix: str) -> float:
+        i = self.ids.get(rel_posix)
+        return 0.0 if i is None else self.scores[i]
+
+    def cochange(self, selection: Iterable[Path]) -> dict[int, float]:
+        """Poids des commits (hors commits massifs) ou chaque fichier change avec un fichier de la selection."""
+        seen: set[int] = set()
+        out: dict[int, float] = defaultdict(float)
+        for fp in selection:
+            i = self._id(fp)
+            for c in self.touches[i] if i is not None else ():
+                ids = self.commits[c][1]
+                if c in seen or len(ids) > HOT_BULK_FILES:
+                    continue
+                seen.add(c)
+                for j in ids:
+                    out[j] += self.weights[c]
+        return out
+
+    def relevance(self, files: Iterable[Path], selection: Iterable[Path] = ()) -> dict[Path, float]:
+        """Score de chaque fichier, plus HOT_COCHANGE_WEIGHT x son co-changement avec la selection."""
+        together = self.cochange(selection)
+        out: dict[Path, float] = {}
+        for fp in files:
+            i = self._id(fp)
+            out[fp] = 0.0 if i is None else self.scores[i] + HOT_COCHANGE_WEIGHT * together.get(i, 0.0)
+        return out
+
+    def top(self, files: Iterable[Path], n: int) -> list[Path]:
+        """Les n fichiers les plus actifs parmi files (jamais modifies dans la fenetre : exclus)."""
+        import heapq
+
+        scored = ((s, fp) for fp, s in self.relevance(files).items() if s > 0)
+        return [fp for _s, fp in heapq.nlargest(n, scored, key=lambda item: item[0])]
+
+    def to_json(self, since_days: int) -> dict:
+        return {
+            "version": HOT_CACHE_VERSION, "head": self.head, "since": since_days, "ref": self.ref_time,
+            "paths": self.paths, "commits": self.commits,
+        }
+
+def _hotness_cache_path(root: Path) -> Path:
+    return _project_cache_dir(root) / "hotness.json"
+
+def _git_hotness(
+    root: Path, since_days: int = HOT_SINCE_DAYS, cancel: threading.Event | None = None, path: Path | None = None
+) -> _GitHotness | None:
+    """Activite git en un seul "git log --name-only" lu en flux, cachee par HEAD ; None hors depot, en echec ou si annule."""
+    git = shutil.which("git")
+    if not git or not _has_git(root):
+        return None
+    try:
+        cp = subprocess.run([git, "-C", str(root), "log", "-1", "--format=%H %ct"], capture_output=True, text=True, check=True)
+        head, ref = cp.stdout.split()
+        ref_time = int(ref)
+    except Exception:
+        return None
+    path = path or _hotness_cache_path(root)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") == HOT_CACHE_VERSION and data.get("head") == head and data.get("since") == since_days:
+            return _GitHotness(root, head, ref_time, data["paths"], [(t, ids) for t, ids in data["commits"]])
+    except Exception:
+        pass
+    since = time.strftime("%Y-%m-%d %H:%M:%S +0000", time.gmtime(ref_time - since_days * 86400))
+    cmd = [
+        git, "-C", str(root), "-c", "core.quotepath=off", "log", "--no-merges", "--no-renames", "--name-only",
+        "--relative", "--format=%x00%ct", f"--since={since}", head,
+    ]
+    ids: dict[str, int] = {}
+    paths: list[str] = []
+    commits: list[tuple[int, list[int]]] = []
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, encoding="utf-8", errors="replace")
+    except Exception as exc:
+        LOGGER.warning("git log indisponible : %s", exc)
+        return None
+    cancelled = False
+    try:
+        current: list[int] | None = None
+        for line in proc.stdout:  # type: ignore[union-attr]
+            line = line.rstrip("\n")
+            if line.startswith("\x00"):
+                current = []
+                commits.append((int(line[1:] or 0), current))
+                if cancel is not None and len(commits) & 0x3FF == 0 and cancel.is_set():
+                    cancelled = True
+                    break
+            elif line and current is not None:
+                i = ids.get(line)
+                if i is None:
+                    i = ids[line] = len(paths)
+                    paths.append(line)
+                current.append(i)
+    finally:
+        if cancelled:
+            proc.kill()
+        proc.stdout.close()  # type: ignore[union-attr]
+        if proc.wait() != 0 and not cancelled:
+            LOGGER.warning("git log a echoue pour %s", root)
+    if cancelled:
+        return None
+    hotness = _GitHotness(root, head, ref_time, paths, [(t, found) for t, found in commits if found])
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(hotness.to_json(since_days), separators=(",", ":")), encoding="utf-8")
+    except Exception as exc:
+        LOGGER.warning("Ecriture du cache d'activite git impossible : %s", exc)
+    return hotness
+
+FINGERPRINT_CACHE_KIND = "fingerprint:1"
+DUP_MIN_BYTES = 64  # fichiers vides, __init__.py... : jamais signales comme doublons
+NEAR_DUP_MAX_BYTES = 4 << 20
+NEAR_DUP_MIN_LINES = 8
+NEAR_DUP_JACCARD = 0.8
+MINHASH_SIZE = 64  # valeurs de 32 bits par signature
+MINHASH_BANDS = 16  # 4 valeurs par bande : une paire a J=0.8 partage une bande avec p > 0.999
+DUP_DIFF_MAX_BYTES = 1 << 20
+
+def _minhash(features: Iterable[str]) -> bytes:
+    """Signature MinHash (MINHASH_SIZE minima de 32 bits) d'un ensemble de lignes, en octets."""
+    import hashlib
+
+    mins = [0xFFFFFFFF] * MINHASH_SIZE
+    for feature in features:
+        # Une sortie SHAKE de 256 octets donne d'un coup les 64 hash independants de la ligne.
+        values = memoryview(hashlib.shake_128(feature.encode("utf-8", errors="replace")).digest(4 * MINHASH_SIZE)).cast("I")
+        mins = list(map(min, mins, values))
+    return array("I", mins).tobytes()
+
+def _minhash_similarity(a: bytes, b: bytes) -> float:
+    va, vb = memoryview(a).cast("I"), memoryview(b).cast("I")
+    return sum(x == y for x, y in zip(va, vb)) / MINHASH_SIZE
+
+def _file_fingerprint(path: str) -> tuple[str, list | None]:
+    """(chemin, [sha1, minhash hex | None]) ; le MinHash porte sur les lignes non vides, espaces ignores."""
+    import hashlib
+
+    sha = hashlib.sha1()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(READ_CHUNK), b""):
+                sha.update(block)
+            size = f.tell()
+    except OSError:
+        return path, None
+    sig = None
+    if size <= NEAR_DUP_MAX_BYTES:
+        try:
+            lines = {line.strip() for line in _read_text(Path(path)).splitlines()}
+        except Exception:
+            lines = set()
+        lines.discard("")
+        if len(lines) >= NEAR_DUP_MIN_LINES:
+            sig = _minhash(lines).hex()
+    return path, [sha.hexdigest(), sig]
+
+def _fingerprints(
+    root: Path, files: Sequence[Path], cancel: threading.Event | None = None, cache: _FileCache | None = None
+) -> dict[Path, tuple[str, bytes | None]] | None:
+    """Empreintes des fichiers d'au moins DUP_MIN_BYTES ; None si annule."""
+    stamps: dict[str, tuple[int, float]] = {}
+    by_rel: dict[str, Path] = {}
+    for fp in files:
+        try:
+            st = fp.stat()
+            rel = fp.relative_to(root).as_posix()
+        except Exception:
+            continue
+        if st.st_size >= DUP_MIN_BYTES:
+            stamps[rel] = (st.st_size, st.st_mtime)
+            by_rel[rel] = fp
+    cache = cache or _FileCache(root, FINGERPRINT_CACHE_KIND)
+    found = cache.get_many(stamps)
+    todo = [str(by_rel[rel]) for rel in by_rel if rel not in found]
+    fresh: list[tuple[str, int, float, object]] = []
+    for path, value in _parallel_map(_file_fingerprint, todo):
+        if cancel is not None and cancel.is_set():
+            return None
+        if value is not None:
+            rel = Path(path).relative_to(root).as_posix()
+            found[rel] = value
+            fresh.append((rel, *stamps[rel], value))
+    if fresh:
+        cache.put_many(fresh)
+    return {
+        by_rel[rel]: (sha, bytes.fromhex(sig) if sig else None)
+        for rel, (sha, sig) in found.items()  # type: ignore[misc]
+    }
+
+def _duplicate_map(files: Sequence[Path], fingerprints: dict[Path, tuple[str, bytes | None]]) -> dict[Path, tuple[Path, bool]]:
+    """Doublons de files -> (reference, identique) ; quasi identique : Jaccard estimee (MinHash, LSH) >= NEAR_DUP_JACCARD."""
+    first_of: dict[str, Path] = {}
+    width = 4 * MINHASH_SIZE // MINHASH_BANDS
+    bands: list[dict[bytes, list[tuple[Path, bytes]]]] = [{} for _ in range(MINHASH_BANDS)]
+    out: dict[Path, tuple[Path, bool]] = {}
+    for fp in files:
+        info = fingerprints.get(fp)
+        if info is None:
+            continue
+        sha, sig = info
+        if sha in first_of:
+            out[fp] = (first_of[sha], True)
+            continue
+        first_of[sha] = fp
+        if sig is None:
+            continue
+        keys = [sig[b * width : (b + 1) * width] for b in range(MINHASH_BANDS)]
+        best, best_sim = None, NEAR_DUP_JACCARD
+        seen: set[Path] = set()
+        for band, key in zip(bands, keys):
+            for other, other_sig in band.get(key, ()):
+                if other not in seen:
+                    seen.add(other)
+                    sim = _minhash_similarity(sig, other_sig)
+                    if sim >= best_sim:
+                        best, best_sim = other, sim
+        if best is not None:
+            out[fp] = (best, False)
+            continue
+        for band, key in zip(bands, keys):
+            band.setdefault(key, []).append((fp, sig))
+    return out
+
+class _Cfg:
+    def __init__(
+        self,
+        win="1100x720",
+        col=None,
+        recent=None,
+        ext_state=None,
+        theme="dark",
+        wrap=False,
+        font_size=12,
+        pane=520,
+        sort_col="name",
+        sort_rev=False,
+        filter_text="",
+        codex_cmd: str = "",
+        sort_by_dir: bool = False,
+        ai_filter: bool = False,
+        include_vendor: bool = False,
+        tracked_only: bool = False,
+        respect_gitignore: bool = False,
+        vendor_mode: str | None = None,
+        safe_export_exclude_sensitive: bool = False,
+        restore_last: bool = False,
+        content_index: bool = False,
+        hide_duplicates: bool = False,
+        dir_cap_files: int = 0,
+        dir_cap_bytes: int = 0,
+        dir_cap_keep: int = DIR_CAP_KEEP,
+        dir_cap_sample: str = "newest",
+    ):
+        self.win_geom = win
+        self.col_widths = col or {"name": 320, "size": 100, "hot": 90, "rel": 600}
+        self.recent_dirs = recent or []
+        self.ext_enabled = ext_state or {}
+        self.theme = theme
+        self.preview_wrap = wrap
+        self.preview_font_size = font_size
+        self.pane_pos = pane
+        self.sort_col = sort_col
+        self.sort_rev = sort_rev
+        self.filter_text = filter_text
+        self.codex_cmd = codex_cmd
+        self.sort_by_dir = sort_by_dir
+        self.ai_filter = ai_filter
+        self.include_vendor = include_vendor  # legacy toggle
+        self.tracked_only = tracked_only
+        self.respect_gitignore = respect_gitignore
+        self.vendor_mode = vendor_mode or ("symfony" if include_vendor else "none")
+        if self.vendor_mode not in VENDOR_MODES:
+            self.vendor_mode = "none"
+        self.safe_export_exclude_sensitive = safe_export_exclude_sensitive
+        self.restore_last = restore_last
+        self.content_index = content_index
+        self.hide_duplicates = hide_duplicates
+        self.dir_cap_files = dir_cap_files
+        self.dir_cap_bytes = dir_cap_bytes
+        self.dir_cap_keep = dir_cap_keep
+        self.dir_cap_sample = dir_cap_sample
+
+    @classmethod
+    def load(cls):
+        try:
+            raw = json.loads(CFG_PATH.read_text(encoding="utf-8"))
+            win = raw.get("win_geom", "1100x720")
+            col = raw.get("col_widths", {"name": 320, "size": 100, "hot": 90, "rel": 600})
+            recent = [p for p in raw.get("recent_dirs", []) if Path(p).exists()]
+            ext_state = raw.get("ext_enabled", {})
+            theme = raw.get("theme", "dark")
+            wrap = raw.get("preview_wrap", False)
+            font_size = int(raw.get("preview_font_size", 12))
+            pane = int(raw.get("pane_pos", 520))
+            sort_col = raw.get("sort_col", "name")
+            sort_rev = bool(raw.get("sort_rev", False))
+            filter_text = raw.get("filter_text", "")
+            codex_cmd = raw.get("codex_cmd", "")
+            sort_by_dir = bool(raw.get("sort_by_dir", False))
+            ai_filter = bool(raw.get("ai_filter", False))
+            include_vendor = bool(raw.get("include_vendor", False))
+            tracked_only = bool(raw.get("tracked_only", False))
+            respect_gitignore = bool(raw.get("respect_gitignore", False))
+            vendor_mode = raw.get("vendor_mode")
+            if not vendor_mode:
+                vendor_mode = "symfony" if include_vendor else "none"
+            safe_export_exclude_sensitive = bool(raw.get("safe_export_exclude_sensitive", False))
+            restore_last = bool(raw.get("restore_last", False))
+            content_index = bool(raw.get("content_index", False))
+            hide_duplicates = bool(raw.get("hide_duplicates", False))
+            dir_cap_files = int(raw.get("dir_cap_files", 0))
+            dir_cap_bytes = int(raw.get("dir_cap_bytes", 0))
+            dir_cap_keep = int(raw.get("dir_cap_keep", DIR_CAP_KEEP))
+            dir_cap_sample = raw.get("dir_cap_sample", "newest")
+            return cls(
+                win,
+                col,
+                recent,
+                ext_state,
+                theme,
+                wrap,
+                font_size,
+                pane,
+                sort_col,
+                sort_rev,
+                filter_text,
+                codex_cmd,
+                sort_by_dir,
+                ai_filter,
+                include_vendor,
+                tracked_only,
+                respect_gitignore,
+                vendor_mode,
+                safe_export_exclude_sensitive,
+                restore_last,
+                content_index,
+                hide_duplicates,
+                dir_cap_files,
+                dir_cap_bytes,
+                dir_cap_keep,
+                dir_cap_sample,
+            )
+        except Exception:
+            return cls()
+
+    def save(self):
+        try:
+            CFG_PATH.write_text(
+                json.dumps(
+                    {
+                        "win_geom": self.win_geom,
+                        "col_widths": self.col_widths,
+                        "recent_dirs": self.recent_dirs,
+                        "ext_enabled": self.ext_enabled,
+                        "theme": self.theme,
+                        "preview_wrap": self.preview_wrap,
+                        "preview_font_size": self.preview_font_size,
+                        "pane_pos": self.pane_pos,
+                        "sort_col": self.sort_col,
+                        "sort_rev": self.sort_rev,
+                        "filter_text": self.filter_text,
+                        "codex_cmd": self.codex_cmd,
+                        "sort_by_dir": self.sort_by_dir,
+                        "ai_filter": self.ai_filter,
+                        "include_vendor": self.vendor_mode in ("symfony", "all"),
+                        "tracked_only": self.tracked_only,
+                        "respect_gitignore": self.respect_gitignore,
+                        "vendor_mode": self.vendor_mode,
+                        "safe_export_exclude_sensitive": self.safe_export_exclude_sensitive,
+                        "restore_last": self.restore_last,
+                        "content_index": self.content_index,
+                        "hide_duplicates": self.hide_duplicates,
+                        "dir_cap_files": self.dir_cap_files,
+                        "dir_cap_bytes": self.dir_cap_bytes,
+                        "dir_cap_keep": self.dir_cap_keep,
+                        "dir_cap_sample": self.dir_cap_sample,
+                    },
+                    indent=2,
+                ),
+                encoding="utf-8",
+            )
+        except Exception:
+            pass
+
+class _NotifyingQueue(queue.Queue):
+    """File de messages qui previent la boucle Tk a chaque depot (plus de scrutation a vide)."""
+
+    def __init__(self, notify=None):
+        super().__init__()
+        self.notify = notify
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        if self.notify is not None:
+            try:
+                self.notify()
+            except Exception:
+                pass
+
+class _ProgressThrottle:
+    """Regroupe les messages ("progress", i, total) : au plus un toutes les PROGRESS_MIN_INTERVAL secondes."""
+
+    def __init__(self, q: "queue.Queue", interval: float = PROGRESS_MIN_INTERVAL):
+        self.q = q
+        self.interval = interval
+        self._last = 0.0
+
+    def __call__(self, i: int, total: int) -> None:
+        now = time.monotonic()
+        if i >= total or now - self._last >= self.interval:
+            self._last = now
+            self.q.put(("progress", i, total))
+
+class _Worker(Protocol):
+    def __call__(self, root: Path, files: Sequence[Path], *extra, q: "queue.Queue", cancel: threading.Event | None = None): ...
+
+SKELETON_CACHE_KIND = "skeleton:2"
+SKELETON_PY_EXTS = {".py", ".pyi"}
+SKELETON_BRACE_EXTS = {
+    ".php": "php",
+    ".js": "js",
+    ".jsx": "js",
+    ".mjs": "js",
+    ".cjs": "js",
+    ".ts": "js",
+    ".tsx": "js",
+    ".java": "java",
+    ".go": "go",
+}
+SKELETON_MAX_ASSIGN_LINES = 3
+_SKELETON_CONTAINER_RE = re.compile(r"(?<![$\w.])(?:class|interface|trait|enum|struct|namespace|impl|record|module)\b")
+_SKELETON_HEAD_COMMENT_RE = re.compile(r"/\*.*?\*/|//[^\n]*", re.S)
+_SKELETON_PARENS_RE = re.compile(r"\([^()]*\)")
+
+def _python_skeleton(text: str) -> str | None:
+    """Squelette Python via ast : imports, constantes, classes et signatures avec docstrings, corps elides."""
+    import ast
+
+    text = text.removeprefix("\ufeff")
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+    lines = text.splitlines()
+    out: list[str] = []
+
+    def col(lineno: int, offset: int) -> str:
+        # col_offset d'ast est en octets UTF-8.
+        return lines[lineno - 1].encode("utf-8")[:offset].decode("utf-8", errors="ignore")
+
+    def docstring(node) -> "ast.Expr | None":
+        first = node.body[0] if getattr(node, "body", None) else None
+        if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str):
+            return first
+        return None
+
+    def keep(node) -> None:
+        span = lines[node.lineno - 1 : node.end_lineno]
+        if isinstance(node, (ast.Import, ast.ImportFrom)) or len(span) <= SKELETON_MAX_ASSIGN_LINES:
+            out.extend(span)
+        else:
+            out.append(span[0] + " ...")
+
+    def emit(node, spaced: bool) -> None:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if spaced and out and out[-1].strip():
+                out.append("")
+            start = node.decorator_list[0].lineno if node.decorator_list else node.lineno
+            body = node.body[0]
+            if body.lineno > node.lineno and not lines[body.lineno - 1][: body.col_offset].strip():
+                out.extend(lines[start - 1 : body.lineno - 1])
+                indent = col(body.lineno, body.col_offset)
+            else:
+                # Corps sur la ligne de la signature ("def f(): return 1").
+                out.extend(lines[start - 1 : body.lineno - 1])
+                out.append(col(body.lineno, body.col_offset).rstrip())
+                indent = col(node.lineno, node.col_offset) + "    "
+            doc = docstring(node)
+            if doc is not None and doc.lineno > node.lineno:
+                out.extend(lines[doc.lineno - 1 : doc.end_lineno])
+            if isinstance(node, ast.ClassDef):
+                size = len(out)
+                for child in node.body:
+                    if child is not doc:
+                        emit(child, len(out) > size)
+                if len(out) == size and doc is None:
+                    out.append(indent + "...")
+            else:
+                out.append(indent + "...")
+        elif isinstance(node, (ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign)):
+            keep(node)
+
+    doc = docstring(tree)
+    if doc is not None:
+        out.extend(lines[doc.lineno - 1 : doc.end_lineno])
+    for node in tree.body:
+        if node is not doc:
+            emit(node, True)
+    return "\n".join(out)
+
+def _skip_literal(text: str, i: int, lang: str) -> int:
+    """Fin du commentaire ou de la chaine qui commence en i (i s'il n'y en a pas)."""
+    c = text[i]
+    nxt = text[i + 1 : i + 2]
+    if c == "/" and nxt == "/" or c == "#" and lang == "php" and nxt != "[":
+        end = text.find("\n", i)
+        return len(text) if end < 0 else end
+    if c == "/" and nxt == "*":
+        end = text.find("*/", i + 2)
+        return len(text) if end < 0 else end + 2
+    if c == '"' and lang == "java" and text.startswith('"""', i):
+        end = text.find('"""', i + 3)
+        return len(text) if end < 0 else end + 3
+    if c in "\"'`":
+        # Hors PHP et gabarits, une chaine ne traverse pas la fin de ligne : une apostrophe isolee
+        # (texte JSX, commentaire mal ferme) ne fausse donc jamais plus d'une ligne.
+        multiline = lang == "php" or c == "`"
+        j = i + 1
+        n = len(text)
+        while j < n:
+            ch = text[j]
+            if ch == "\\" and not (c == "`" and lang == "go"):
+                j += 2
+                continue
+            if ch == c:
+                return j + 1
+            if ch == "\n" and not multiline:
+                return j
+            j += 1
+        return n
+    return i
+
+def _brace_end(text: str, i: int, lang: str) -> int | None:
+    """Position apres l'accolade qui ferme celle ouverte en i (None si elle n'est pas fermee)."""
+    n = len(text)
+    j, level = i + 1, 1
+    while j < n and level:
+        ch = text[j]
+        if ch in "/#\"'`":
+            end = _skip_literal(text, j, lang)
+            if end != j:
+                j = end
+                continue
+        if ch == "{":
+            level += 1
+        elif ch == "}":
+            level -= 1
+        j += 1
+    return None if level else j
+
+def _brace_skeleton(text: str, lang: str) -> str | None:
+    """Squelette PHP, JS/TS, Java, Go : chaque corps de fonction devient "{ ... }" ; None si les accolades ne s'equilibrent pas."""
+    out: list[str] = []
+    n = len(text)
+    i = depth = paren = seg_start = head_start = 0
+    while i < n:
+        c = text[i]
+        if c in "/#\"'`":
+            end = _skip_literal(text, i, lang)
+            if end != i:
+                i = end
+                continue
+        if c == "(":
+            paren += 1
+        elif c == ")":
+            paren = max(0, paren - 1)
+        elif c == "{" and paren and not text[head_start:i].rstrip().endswith((")", "=>")):
+            # Destructuration, valeur par defaut, type objet dans des parametres : ce n'est pas un corps.
+            j = _brace_end(text, i, lang)
+            if j is None:
+                return None
+            i = j
+            continue
+        elif c == ";":
+            head_start = i + 1
+        elif c == "}":
+            depth -= 1
+            if depth < 0:
+                return None
+            head_start = i + 1
+        elif c == "{":
+            head = _SKELETON_HEAD_COMMENT_RE.sub("", text[head_start:i])
+            bare = head
+            while True:
+                stripped = _SKELETON_PARENS_RE.sub("", bare)
+                if stripped == bare:
+                    break
+                bare = stripped
+            if not _SKELETON_CONTAINER_RE.search(bare) and ("(" in head or "=>" in head):
+                j = _brace_end(text, i, lang)
+                if j is None:
+                    return None
+                out.append(text[seg_start : i + 1])
+                out.append(" ... }")
+                i = seg_start = head_start = j
+                continue
+            depth += 1
+            head_start = i + 1
+        i += 1
+    if depth:
+        return None
+    out.append(text[seg_start:])
+    return "".join(out)
+
+def _skeleton_file(path: str) -> tuple[str, str | None]:
+    """Squelette d'un fichier ; None si le langage n'est pas pris en charge ou l'analyse echoue."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in SKELETON_PY_EXTS and ext not in SKELETON_BRACE_EXTS:
+        return path, None
+    try:
+        text = _read_text(Path(path))
+    except Exception:
+        return path, None
+    if ext in SKELETON_PY_EXTS:
+        return path, _python_skeleton(text)
+    return path, _brace_skeleton(text, SKELETON_BRACE_EXTS[ext])
+
+def _skeletons(
+    root: Path,
+    files: Sequence[Path],
+    cancel: threading.Event | None = None,
+    cache: _FileCache | None = None,
+) -> dict[Path, str | None] | None:
+    wanted = [fp for fp in files if fp.suffix.lower() in SKELETON_PY_EXTS or fp.suffix.lower() in SKELETON_BRACE_EXTS]
+    return _cached_file_map(root, wanted, SKELETON_CACHE_KIND, _skeleton_file, cancel, cache)  # type: ignore[return-value]
+
+SUMMARY_CACHE_KIND = "summary:1"
+SUMMARY_LANGS = {".json": "json", ".xml": "xml", ".sql": "sql"}
+SUMMARY_MIN_BYTES = 256 << 10
+SUMMARY_SAMPLE_ITEMS = 3  # elements gardes par tableau JSON, enfants par balise XML, lignes par table SQL
+SUMMARY_MAX_KEYS = 64  # cles par objet (ou chemins XML x 4) decrites dans le schema
+SUMMARY_SAMPLE_NODES = 400
+SUMMARY_STR_MAX = 120
+SUMMARY_MAX_CHARS = 32 << 10  # par partie du resume
+SQL_STATEMENT_KEEP = 16 << 10  # caracteres gardes en tete de chaque instruction
+_JSON_TOKEN_RE = re.compile(r'[ \t\r\n]*(?:([{}\[\]:,])|(")|(-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?)|(true|false|null))')
+_JSON_STRING_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_JSON_STRING_PART_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+_JSON_WS_RE = re.compile(r"[ \t\r\n]*")
+
+def _clip(text: str, limit: int = SUMMARY_MAX_CHARS) -> str:
+    return text if len(text) <= limit else text[:limit] + f"\n... [{len(text) - limit} caracteres de plus]"
+
+def _json_tokens(chunks: Iterable[str], str_max: int = SUMMARY_STR_MAX) -> Iterator[tuple[str, object, int]]:
+    """Jetons (type, valeur, longueur) d'un flux JSON, chaines coupees a str_max ; ValueError si invalide."""
+    decoder = json.JSONDecoder()
+    buf, pos = "", 0
+    head: str | None = None  # chaine en cours, a cheval sur plusieurs morceaux
+    length = 0
+    maps: list[bool] = []  # conteneurs ouverts (objet ?)
+    want_value = True
+    it = iter(chunks)
+    while True:
+        chunk = next(it, None)
+        final = chunk is None
+        if not final:
+            buf, pos = buf[pos:] + chunk, 0
+        if head is not None:
+            m = _JSON_STRING_RE.match(buf, pos)
+            end = m.end() - 1 if m else _JSON_STRING_PART_RE.match(buf, pos).end()
+            if len(head) < str_max:
+                head += buf[pos:end][:str_max - len(head)]
+            length += end - pos
+            pos = end
+            if m is None:
+                if final:
+                    raise ValueError("chaine non terminee")
+                continue
+            pos += 1
+            yield "str", head, length
+            head = None
+        while True:
+            if want_value:
+                start = _JSON_WS_RE.match(buf, pos).end()
+                if start < len(buf) and buf[start] not in "]}":
+                    try:
+                        value, end = decoder.raw_decode(buf, start)
+                    except ValueError:
+                        end = -1
+                    # Un nombre ou un litteral en fin de tampon peut etre coupe, comme plus bas.
+                    if end > 0 and (final or (buf[start] in '{["' and end < len(buf)) or len(buf) - end >= 32):
+                        pos, want_value = end, False
+                        yield "value", value, 0
+                        continue
+            m = _JSON_TOKEN_RE.match(buf, pos)
+            if m is None:
+                rest = buf[pos:]
+                if (final and rest.strip()) or (not final and len(rest) > 64):
+                    raise ValueError(f"jeton invalide : {rest[:20]!r}")
+                break
+            if not final and len(buf) - m.end() < 32 and (m.group(3) or m.group(4)):
+                break  # nombre ou litteral peut-etre coupe ("1" de "1.5e3")
+            pos = m.end()
+            tok = m.group(1)
+            want_value = tok == "[" or tok == ":" or (tok == "," and bool(maps) and not maps[-1])
+            if tok:
+                if tok in "{[":
+                    maps.append(tok == "{")
+                elif tok in "}]" and maps:
+                    maps.pop()
+                yield tok, None, 0
+            elif m.group(2):
+                sm = _JSON_STRING_RE.match(buf, pos)
+                if sm is None:
+                    head, length = "", 0
+                    break
+                yield "str", buf[pos:min(sm.end() - 1, pos + str_max)], sm.end() - 1 - pos
+                pos = sm.end()
+            elif m.group(3):
+                yield "num", m.group(3), 0
+            else:
+                yield "lit", m.group(4), 0
+        if final:
+            if head is not None:
+                raise ValueError("chaine non terminee")
+            return
+
+def _json_string(raw: str, length: int) -> str:
+    try:
+        text = json.loads(f'"{raw}"')
+    except ValueError:
+        # Tete coupee au milieu d'un echappement : je la raccourcis jusqu'au dernier "\\".
+        try:
+            text = json.loads(f'"{raw[:raw.rfind(chr(92))]}"')
+        except ValueError:
+            text = raw
+    return text if length <= len(raw) else f"{text}... [{length} caracteres]"
+
+_JSON_SCALAR_TYPES = {str: "chaine", int: "entier", float: "decimal", bool: "booleen", type(None): "null"}
+
+def _json_sample(value, budget: int) -> tuple[object, int]:
+    """Copie reduite (premiers elements, chaines coupees) d'une valeur decodee, et noeuds restants."""
+    budget -= 1
+    if isinstance(value, dict):
+        out: dict = {}
+        for key, child in value.items():
+            if budget <= 0:
+                break
+            out[key], budget = _json_sample(child, budget)
+        if len(out) < len(value):
+            out["..."] = f"{len(value) - len(out)} cles de plus"
+        return out, budget
+    if isinstance(value, list):
+        items: list = []
+        for child in value[:SUMMARY_SAMPLE_ITEMS]:
+            if budget <= 0:
+                break
+            node, budget = _json_sample(child, budget)
+            items.append(node)
+        if len(items) < len(value):
+            items.append(f"... {len(value) - len(items)} elements de plus")
+        return items, budget
+    if isinstance(value, str) and len(value) > SUMMARY_STR_MAX:
+        return f"{value[:SUMMARY_STR_MAX]}... [{len(value)} caracteres]", budget
+    return value, budget
+
+class _JsonShape:
+    """Schema infere d'une valeur JSON : types rencontres, cles des objets, elements des tableaux."""
+
+    __slots__ = ("types", "keys", "objects", "items", "min_len", "max_len", "more_keys")
+
+    def __init__(self):
+        self.types: Counter[str] = Counter()
+        self.keys: dict[str, _JsonShape] = {}
+        self.objects = 0
+        self.items: _JsonShape | None = None
+        self.min_len: int | None = None
+        self.max_len = 0
+        self.more_keys = False
+
+    def key(self, name: str) -> "_JsonShape | None":
+        shape = self.keys.get(name)
+        if shape is None:
+            if len(self.keys) >= SUMMARY_MAX_KEYS:
+                self.more_keys = True
+                return None
+            shape = self.keys[name] = _JsonShape()
+        return shape
+
+    def item(self) -> "_JsonShape":
+        if self.items is None:
+            self.items = _JsonShape()
+        return self.items
+
+    def absorb(self, value) -> None:
+        """Ajoute au schema une valeur deja decodee (meme resultat que ses jetons)."""
+        if isinstance(value, dict):
+            self.types["objet"] += 1
+            self.objects += 1
+            for key, child in value.items():
+                shape = self.key(key)
+                if shape is not None:
+                    shape.absorb(child)
+        elif isinstance(value, list):
+            self.types["tableau"] += 1
+            n = len(value)
+            self.min_len = n if self.min_len is None else min(self.min_len, n)
+            self.max_len = max(self.max_len, n)
+            if value:
+                item = self.item()
+                for child in value:
+                    item.absorb(child)
+        else:
+            self.types[_JSON_SCALAR_TYPES.get(type(value), "chaine")] += 1
+
+    def render(self, name: str, lines: list[str], depth: int = 0, parent: int = 0) -> None:
+        kinds = []
+        for kind, _n in self.types.most_common():
+            if kind == "tableau":
+                span = f"{self.min_len}..{self.max_len}" if self.min_len != self.max_len else str(self.max_len)
+                kind = f"tableau[{span}]"
+            kinds.append(kind)
+        seen = sum(self.types.values())
+        optional = f" (optionnel, {seen}/{parent})" if parent and seen < parent else ""
+        lines.append(f"{'  ' * depth}{name}: {' | '.join(kinds)}{optional}")
+        for key, shape in self.keys.items():
+            shape.render(key, lines, depth + 1, self.objects)
+        if self.more_keys:
+            lines.append(f"{'  ' * (depth + 1)}... (plus de {SUMMARY_MAX_KEYS} cles)")
+        if self.items is not None:
+            self.items.render("[]", lines, depth + 1)
+
+def _summarize_json(chunks: Iterable[str]) -> list[tuple[str, str]]:
+    """Schema infere et document reduit aux premiers elements de chaque tableau."""
+    root = _JsonShape()
+    sample: list = []  # conteneur de la racine
+    budget = SUMMARY_SAMPLE_NODES
+    # pile : [objet ?, schema, echantillon, nombre d'enfants, schema de la cle, nom de la cle, cle attendue]
+    stack: list[list] = []
+    for kind, value, length in _json_tokens(chunks):
+        top = stack[-1] if stack else None
+        if kind in (",", ":"):
+            if kind == "," and top is not None and top[0]:
+                top[6] = True
+            continue
+        if top is not None and top[0] and top[6]:
+            if kind == "}":
+                pass
+            elif kind != "str":
+                raise ValueError("cle attendue")
+            else:
+                name = _json_string(value, length)  # type: ignore[arg-type]
+                top[4] = top[1].key(name) if top[1] is not None else None
+                top[5], top[6] = name, False
+                continue
+        if kind in ("}", "]"):
+            if top is None or top[0] != (kind == "}"):
+                raise ValueError("fermeture inattendue")
+            stack.pop()
+            is_map, shape, box, count = top[:4]
+            if shape is not None and not is_map:
+                shape.min_len = count if shape.min_len is None else min(shape.min_len, count)
+                shape.max_len = max(shape.max_len, count)
+            if box is not None and count > len(box):
+                if is_map:
+                    box["..."] = f"{count - len(box)} cles de plus"
+                else:
+                    box.append(f"... {count - len(box)} elements de plus")
+            continue
+        if top is None:
+            if sample:
+                raise ValueError("plusieurs valeurs a la racine")
+            shape, parent = root, sample
+        else:
+            top[3] += 1
+            if top[0]:
+                shape, parent = top[4], top[2]
+            else:
+                shape = top[1].item() if top[1] is not None else None
+                parent = top[2] if top[2] is not None and len(top[2]) < SUMMARY_SAMPLE_ITEMS else None
+        if parent is not None and budget <= 0:
+            parent = None
+        if kind == "value":
+            if shape is not None:
+                shape.absorb(value)
+            if parent is not None:
+                node, budget = _json_sample(value, budget)
+                budget += 1  # decompte ci-dessous
+        elif kind in ("{", "["):
+            box = ({} if kind == "{" else []) if parent is not None else None
+            if shape is not None:
+                shape.types["objet" if kind == "{" else "tableau"] += 1
+                shape.objects += kind == "{"
+            stack.append([kind == "{", shape, box, 0, None, None, True])
+            node = box
+        else:
+            if kind == "str":
+                label, node = "chaine", _json_string(value, length) if parent is not None else None  # type: ignore[arg-type]
+            elif kind == "num":
+                label = "decimal" if any(c in value for c in ".eE") else "entier"  # type: ignore[operator]
+                node = json.loads(value) if parent is not None else None  # type: ignore[arg-type]
+            else:
+                label = "booleen" if value != "null" else "null"
+                node = json.loads(value) if parent is not None else None  # type: ignore[arg-type]
+            if shape is not None:
+                shape.types[label] += 1
+        if parent is not None:
+            budget -= 1
+            if isinstance(parent, dict):
+                parent[top[5]] = node  # type: ignore[index]
+            else:
+                parent.append(node)
+    if stack or not sample:
+        raise ValueError("document incomplet")
+    lines = ["Schema infere :"]
+    root.render("racine", lines)
+    schema = "\n".join(lines[: SUMMARY_MAX_KEYS * 8])
+    return [("text", _clip(schema)), ("json", _clip(json.dumps(sample[0], indent=2, ensure_ascii=False)))]
+
+def _summarize_xml(chunks: Iterable[str]) -> list[tuple[str, str]]:
+    """Structure des elements (chemins, occurrences, attributs) et document reduit aux premiers enfants par balise."""
+    import xml.etree.ElementTree as ET
+
+    def local(tag) -> str:
+        return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else "?"
+
+    parser = ET.XMLPullParser(("start", "end"))
+    paths: dict[str, list] = {}  # chemin -> [occurrences, attributs, texte ?]
+    more_paths = False
+    # pile : [element, chemin, {balise enfant: [gardes, retires]}]
+    stack: list[list] = []
+    root = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                path = f"{stack[-1][1]}/{local(elem.tag)}" if stack else local(elem.tag)
+                info = paths.get(path)
+                if info is None and len(paths) < SUMMARY_MAX_KEYS * 4:
+                    info = paths[path] = [0, set(), False]
+                elif info is None:
+                    more_paths = True
+                if info is not None:
+                    info[0] += 1
+                    if len(info[1]) < 16:
+                        info[1].update(local(a) for a in elem.attrib)
+                stack.append([elem, path, {}])
+                if root is None:
+                    root = elem
+                continue
+            _elem, path, children = stack.pop()
+            if elem.text and elem.text.strip():
+                if path in paths:
+                    paths[path][2] = True
+                if len(elem.text) > SUMMARY_STR_MAX:
+                    elem.text = f"{elem.text[:SUMMARY_STR_MAX]}... [{len(elem.text)} caracteres]"
+            if elem.tail and len(elem.tail) > SUMMARY_STR_MAX:
+                elem.tail = elem.tail[:SUMMARY_STR_MAX]
+            for tag, (_kept, dropped) in children.items():
+                if dropped:
+                    elem.append(ET.Comment(f" ... {dropped} elements <{tag}> de plus "))
+            if stack:
+                counts = stack[-1][2].setdefault(local(elem.tag), [0, 0])
+                if counts[0] < SUMMARY_SAMPLE_ITEMS:
+                    counts[0] += 1
+                else:
+                    # Seuls les premiers enfants de chaque balise restent attaches : memoire bornee.
+                    stack[-1][0].remove(elem)
+                    counts[1] += 1
+    parser.close()
+    if root is None:
+        raise ValueError("document vide")
+    lines = ["Structure (occurrences, attributs) :"]
+    for path, (count, attrs, text) in paths.items():
+        depth = path.count("/")
+        attr = f" {' '.join(sorted(attrs))}" if attrs else ""
+        lines.append(f"{'  ' * depth}<{path.rsplit('/', 1)[-1]}{attr}> x{count}{' (texte)' if text else ''}")
+    if more_paths:
+        lines.append(f"... (plus de {SUMMARY_MAX_KEYS * 4} chemins)")
+    ET.indent(root)
+    return [("text", _clip("\n".join(lines))), ("xml", _clip(ET.tostring(root, encoding="unicode")))]
+
+class _SqlSummary:
+    """Resume en flux d'un dump SQL : instructions recopiees, premieres lignes de donnees de chaque table, le reste compte."""
+
+    _CODE_RE = re.compile(r"""[;'"`()]|--|/\*""")
+    _QUOTE_RE = {"'": re.compile(r"[\\']"), '"': re.compile(r'[\\"]'), "`": re.compile("`")}
+    _INSERT_RE = re.compile(r"\s*(?:INSERT|REPLACE)\b[^(]*?\bINTO\s+([^\s(]+)", re.I)
+    _VALUES_RE = re.compile(r"\bVALUES\s*$", re.I)
+    _COPY_RE = re.compile(r"(?:\s*(?:--[^\n]*\n|/\*.*?\*/))*\s*COPY\s+([^\s(]+)[^;]*?\bFROM\s+stdin\b", re.I | re.S)
+
+    def __init__(self):
+        self.out: list[str] = []
+        self.out_chars = 0
+        self.omitted = 0
+        self.statements = 0
+        self.tables: dict[str, list[int]] = {}  # table -> [lignes, lignes gardees]
+        self.quote: str | None = None
+        self.comment: str | None = None
+        self.hold = ""
+        self.copy: list[int] | None = None
+        self.copy_rows: list[str] = []
+        self.copy_line = ""
+        self.copy_data = False  # fin de la ligne de l'instruction COPY lue
+        self._reset()
+
+    def _reset(self) -> None:
+        self.head: list[str] = []
+        self.head_len = 0
+        self.length = 0
+        self.depth = 0
+        self.rows = 0
+        self.cut: int | None = None
+        self.table: str | None = None
+        self.values = False
+        self.kept_before = 0
+
+    def feed(self, chunk: str) -> None:
+        text = self.hold + chunk
+        # "--", "/*", "*/" ou un echappement coupes entre deux morceaux : la fin attend le morceau suivant.
+        keep = len(text)
+        while keep and text[keep - 1] in "-/*\\":
+            keep -= 1
+        self.hold = text[keep:]
+        self._scan(text[:keep])
+
+    def result(self) -> list[tuple[str, str]]:
+        self._scan(self.hold)
+        self.hold = ""
+        if self.copy is not None:
+            self._end_copy()
+        if "".join(self.head).strip():
+            self._end()
+        lines = [f"-- Resume : {self.statements} instructions, {SUMMARY_SAMPLE_ITEMS} premieres lignes par table"]
+        lines.extend(f"-- {table} : {rows} lignes" for table, (rows, _kept) in self.tables.items())
+        if self.omitted:
+            lines.append(f"-- {self.omitted} instructions omises (taille du resume)")
+        return [("sql", "\n".join(lines + [""] + self.out))]
+
+    def _take(self, text: str) -> None:
+        self.length += len(text)
+        room = SQL_STATEMENT_KEEP - self.head_len
+        if room > 0 and text:
+            piece = text[:room]
+            self.head.append(piece)
+            self.head_len += len(piece)
+
+    def _emit(self, text: str) -> None:
+        if self.out_chars + len(text) > SUMMARY_MAX_CHARS:
+            self.omitted += 1
+            return
+        self.out.append(text)
+        self.out_chars += len(text) + 1
+
+    def _scan(self, text: str) -> None:
+        i, n = 0, len(text)
+        while i < n:
+            if self.copy is not None:
+                j = text.find("\n", i)
+                end = n if j < 0 else j + 1
+                if len(self.copy_line) < SUMMARY_MAX_CHARS:
+                    self.copy_line += text[i:end][: SUMMARY_MAX_CHARS - len(self.copy_line)]
+                i = end
+                if j >= 0:
+                    self._copy_row()
+                continue
+            if self.comment is not None:
+                closing = "\n" if self.comment == "--" else "*/"
+                j = text.find(closing, i)
+                end = n if j < 0 else j + len(closing)
+                self._take(text[i:end])
+                i = end
+                if j >= 0:
+                    self.comment = None
+                continue
+            if self.quote is not None:
+                m = self._QUOTE_RE[self.quote].search(text, i)
+                if m is None:
+                    self._take(text[i:])
+                    return
+                end = min(m.end() + 1, n) if m.group() == "\\" else m.end()
+                if m.group() != "\\":
+                    self.quote = None
+                self._take(text[i:end])
+                i = end
+                continue
+            m = self._CODE_RE.search(text, i)
+            if m is None:
+                self._take(text[i:])
+                return
+            self._take(text[i:m.start()])
+            tok = m.group()
+            i = m.end()
+            if tok == "(":
+                self.depth += 1
+                if self.depth == 1:
+                    self._row_start()
+            self._take(tok)
+            if tok == ";":
+                self._end()
+            elif tok in ("'", '"', "`"):
+                self.quote = tok
+            elif tok in ("--", "/*"):
+                self.comment = tok
+            elif tok == ")":
+                self.depth -= 1
+                if self.depth == 0 and self.values and self.cut is None and self.kept_before + self.rows >= SUMMARY_SAMPLE_ITEMS:
+                    self.cut = self.length
+
+    def _row_start(self) -> None:
+        if self.table is None:
+            m = self._INSERT_RE.match("".join(self.head))
+            self.table = m.group(1) if m else ""
+            if self.table:
+                self.kept_before = self.tables.setdefault(self.table, [0, 0])[1]
+        if self.table and not self.values:
+            self.values = bool(self._VALUES_RE.search("".join(self.head)))
+        if self.values:
+            self.rows += 1
+
+    def _end(self) -> None:
+        text = "".join(self.head)
+        self.statements += 1
+        extra = self.length - self.head_len
+        if self.table and self.values:
+            stats = self.tables[self.table]
+            stats[0] += self.rows
+            keep = min(self.rows, SUMMARY_SAMPLE_ITEMS - self.kept_before)
+            if keep > 0:
+                stats[1] += keep
+                if self.rows > keep:
+                    text = text[: self.cut] if self.cut is not None else text
+                    text += f" /* ... {self.rows - keep} lignes de plus */;"
+                elif extra:
+                    text += f" /* ... {extra} caracteres de plus */"
+                self._emit(text.strip())
+        else:
+            if extra:
+                text += f" /* ... {extra} caracteres de plus */"
+            m = self._COPY_RE.match(text)
+            if m:
+                self.copy = self.tables.setdefault(m.group(1), [0, 0])
+            self._emit(text.strip())
+        self._reset()
+
+    def _copy_row(self) -> None:
+        line, self.copy_line = self.copy_line, ""
+        if not self.copy_data:
+            self.copy_data = True
+            return
+        if line.rstrip("\r\n") == "\\.":
+            self._end_copy()
+            return
+        self.copy[0] += 1  # type: ignore[index]
+        if self.copy[1] < SUMMARY_SAMPLE_ITEMS:  # type: ignore[index]
+            self.copy[1] += 1  # type: ignore[index]
+            self.copy_rows.append(line[:SQL_STATEMENT_KEEP].rstrip("\r\n"))
+
+    def _end_copy(self) -> None:
+        rows = self.copy_rows + ["\\."]
+        dropped = self.copy[0] - len(self.copy_rows)  # type: ignore[index]
+        if dropped > 0:
+            rows.append(f"-- ... {dropped} lignes de plus")
+        self._emit("\n".join(rows))
+        self.copy, self.copy_rows, self.copy_data = None, [], False
+
+def _summary_file(path: str) -> tuple[str, list[tuple[str, str]] | None]:
+    """Resume d'un gros fichier de donnees ([(langage, texte)]) ; None si le format n'est pas reconnu."""
+    fp = Path(path)
+    lang = SUMMARY_LANGS.get(fp.suffix.lower())
+    try:
+        if lang == "json":
+            return path, _summarize_json(_chunks(fp))
+        if lang == "xml":
+            return path, _summarize_xml(_chunks(fp))
+        if lang == "sql":
+            summary = _SqlSummary()
+            for chunk in _chunks(fp):
+                summary.feed(chunk)
+            return path, summary.result()
+    except Exception as exc:
+        LOGGER.info("Resume impossible pour %s : %s", fp, exc)
+    return path, None
+
+def _summaries(
+    root: Path, files: Sequence[Path], cancel: threading.Event | None = None, cache: _FileCache | None = None
+) -> dict[Path, list | None] | None:
+    return _cached_file_map(
+        root, files, SUMMARY_CACHE_KIND, _summary_file, cancel, cache, chunksize=1, min_items=2
+    )  # type: ignore[return-value]
+
+NOTEBOOK_CACHE_KIND = "notebook:1"
+NOTEBOOK_STR_MAX = 1 << 20  # tete gardee des chaines du flux (sorties base64 comprises)
+NOTEBOOK_OUTPUT_LINES = 5
+NOTEBOOK_OUTPUT_CHARS = 2000
+
+def _notebook_output_path(path: tuple) -> int:
+    """Profondeur relative a une sortie de cellule ("outputs", index, ...) ; -1 hors des sorties."""
+    try:
+        return len(path) - path.index("outputs") - 2
+    except ValueError:
+        return -1
+
+def _clip_output(value):
+    if isinstance(value, str):
+        return value[:NOTEBOOK_OUTPUT_CHARS]
+    if isinstance(value, list):
+        return [_clip_output(item) for item in value[: NOTEBOOK_OUTPUT_LINES + 1]]
+    if isinstance(value, dict):
+        return {key: _clip_output(item) for key, item in value.items()}
+    return value
+
+def _notebook_outputs(outputs) -> list[str]:
+    """Resume des sorties d'une cellule : premieres lignes de texte, types des autres contenus, erreurs."""
+    lines: list[str] = []
+    for out in outputs if isinstance(outputs, list) else ():
+        if not isinstance(out, dict):
+            continue
+        kind = out.get("output_type")
+        if kind in ("error", "pyerr"):
+            lines.append(f"[erreur] {out.get('ename', '')}: {out.get('evalue', '')}"[:200])
+            continue
+        data = out.get("data") if isinstance(out.get("data"), dict) else {}
+        text = out.get("text") if kind == "stream" else data.get("text/plain")
+        others = [mime for mime in data if mime != "text/plain"]
+        if others:
+            lines.append(f"[sortie {', '.join(others)}]")
+        elif text:
+            text_lines = ("".join(text) if isinstance(text, list) else str(text)).splitlines()
+            lines.extend(f"> {line}"[:200] for line in text_lines[:NOTEBOOK_OUTPUT_LINES])
+            if len(text_lines) > NOTEBOOK_OUTPUT_LINES or isinstance(text, list) and len(text) > NOTEBOOK_OUTPUT_LINES:
+                lines.append("> ...")
+    return lines
+
+def _notebook_script(chunks: Iterable[str]) -> tuple[str, str]:
+    """Notebook lu en flux et reecrit en script "# %%" (markdown en commentaires, sorties resumees) : (langage, script)."""
+    cells: list[tuple[str, str, list[str]]] = []
+    root: list = []
+    # pile : [conteneur, chemin, cle en attente, cle attendue ?]
+    stack: list[list] = []
+
+    def deliver(value, path: tuple, parent: list | None) -> None:
+        if len(path) >= 2 and path[-1] == "*" and path[-2] == "cells" and isinstance(value, dict):
+            source = value.get("source", value.get("input", ""))
+            source = "".join(source) if isinstance(source, list) else str(source)
+            kind = str(value.get("cell_type", "code"))
+            if source.strip() or value.get("outputs"):
+                cells.append((kind, source.rstrip(), _notebook_outputs(value.get("outputs")) if kind == "code" else []))
+            return
+        # Notebook, feuille (nbformat 3) ou liste de cellules decodes d'un bloc : les cellules une a une.
+        if path and path[-1] == "cells" and isinstance(value, list):
+            for cell in value:
+                deliver(cell, path + ("*",), None)
+            return
+        if isinstance(value, dict) and isinstance(value.get("cells"), list) and (not path or path[-1] == "*"):
+            for cell in value.pop("cells"):
+                deliver(cell, path + ("cells", "*"), None)
+        if parent is None:
+            root.append(value)
+        elif isinstance(parent[0], dict):
+            parent[0][parent[2]] = value
+        elif _notebook_output_path(path) < 1 or len(parent[0]) <= NOTEBOOK_OUTPUT_LINES:
+            parent[0].append(value)
+
+    for kind, value, length in _json_tokens(chunks, NOTEBOOK_STR_MAX):
+        top = stack[-1] if stack else None
+        if kind == "," and top is not None and isinstance(top[0], dict):
+            top[3] = True
+        if kind in (",", ":"):
+            continue
+        if top is not None and isinstance(top[0], dict) and top[3] and kind != "}":
+            if kind != "str":
+                raise ValueError("cle attendue")
+            top[2], top[3] = _json_string(value, length), False  # type: ignore[arg-type]
+            continue
+        if kind in ("}", "]"):
+            if top is None:
+                raise ValueError("fermeture inattendue")
+            stack.pop()
+            deliver(top[0], top[1], stack[-1] if stack else None)
+            continue
+        path = () if top is None else top[1] + ((top[2],) if isinstance(top[0], dict) else ("*",))
+        if kind in ("{", "["):
+            stack.append([{} if kind == "{" else [], path, None, True])
+            continue
+        if kind == "str":
+            value = _json_string(value, length)  # type: ignore[arg-type]
+        elif kind in ("num", "lit"):
+            value = json.loads(value)  # type: ignore[arg-type]
+        deliver(_clip_output(value) if _notebook_output_path(path) >= 0 else value, path, top)
+    if stack or len(root) != 1 or not isinstance(root[0], dict):
+        raise ValueError("notebook incomplet")
+    meta = root[0].get("metadata") if isinstance(root[0].get("metadata"), dict) else {}
+    lang = (meta.get("kernelspec") or {}).get("language") or (meta.get("language_info") or {}).get("name") or "python"
+    lang = str(lang).lower()
+    comment = (_STRIP_SYNTAX.get(_STRIP_FAMILY.get(lang, ""), {}).get("line") or ("#",))[0]
+    parts: list[str] = []
+    for kind, source, outputs in cells:
+        if kind == "code":
+            body = [source] if source else []
+            parts.append("\n".join([f"{comment} %%", *body, *(f"{comment} {line}" for line in outputs)]))
+        else:
+            parts.append("\n".join([f"{comment} %% [{kind}]", *(f"{comment} {line}".rstrip() for line in source.splitlines())]))
+    return lang, "\n\n".join(parts) + "\n"
+
+def _notebook_file(path: str) -> tuple[str, list[str] | None]:
+    try:
+        return path, list(_notebook_script(_chunks(Path(path))))
+    except Exception as exc:
+        LOGGER.info("Notebook illisible %s : %s", path, exc)
+        return path, None
+
+def _notebooks(
+    root: Path, files: Sequence[Path], cancel: threading.Event | None = None, cache: _FileCache | None = None
+) -> dict[Path, list[str] | None] | None:
+    return _cached_file_map(root, files, NOTEBOOK_CACHE_KIND, _notebook_file, cancel, cache, chunksize=4)  # type: ignore[return-value]
+
+I18N_CACHE_KIND = "i18n:1"
+I18N_DEFAULT_LOCALE = "en"
+I18N_EXTS = {".yaml", ".yml", ".json", ".po", ".xlf", ".xliff"}
+I18N_MARKUP_EXTS = {".po", ".xlf", ".xliff"}  # l'extension suffit ; YAML et JSON doivent etre sous I18N_DIRS
+I18N_DIRS = {"translations", "translation", "locales", "locale", "i18n", "l10n", "lang", "langs", "languages"}
+I18N_DIFF_MAX_KEYS = 100
+I18N_KEY_MAX = 4096  # cles JSON lues en entier (phrases source utilisees comme cles)
+# Codes ISO 639-1 : un segment "dev" ou "api" n'est pas une langue.
+I18N_LANGS = frozenset(
+    "aa ab af ak am an ar as av ay az ba be bg bh bi bm bn bo br bs ca ce ch co cr cs cu cv cy da de dv dz ee el "
+    "en eo es et eu fa ff fi fj fo fr fy ga gd gl gn gu gv ha he hi ho hr ht hu hy hz ia id ie ig ii ik io is it "
+    "iu ja jv ka kg ki kj kk kl km kn ko kr ks ku kv kw ky la lb lg li ln lo lt lu lv mg mh mi mk ml mn mr ms mt "
+    "my na nb nd ne ng nl nn no nr nv ny oc oj om or os pa pi pl ps pt qu rm rn ro ru rw sa sc sd se sg si sk sl "
+    "sm sn so sq sr ss st su sv sw ta te tg th ti tk tl tn to tr ts tt tw ty ug uk ur uz ve vi vo wa wo xh yi yo "
+    "za zh zu".split()
+)
+_I18N_LOCALE_RE = re.compile(r"([a-z]{2})(?:[_-](?:[A-Za-z]{2}|[A-Z][a-z]{3}|\d{3}))?")
+_I18N_YAML_KEY_RE = re.compile(r"""(?:"((?:[^"\\]|\\.)*)"|'((?:[^']|'')*)'|([^\s#'"\-?:][^#]*?|-[^\s#][^#]*?))\s*:(?:\s+(.*))?$""")
+_I18N_PO_RE = re.compile(r'(msgctxt|msgid_plural|msgid|msgstr(?:\[\d+\])?)\s+"(.*)"\s*$|"(.*)"\s*$')
+
+def _i18n_locale(segment: str) -> str | None:
+    m = _I18N_LOCALE_RE.fullmatch(segment)
+    return segment if m is not None and m.group(1) in I18N_LANGS else None
+
+def _i18n_slot(rel: str) -> tuple[str, str] | None:
+    """(motif du groupe, langue) : messages.fr.yaml -> messages.*.yaml, locale/fr/LC_MESSAGES/x.po -> locale/*/LC_MESSAGES/x.po."""
+    parts = rel.split("/")
+    name = parts[-1]
+    stem, dot, ext = name.rpartition(".")
+    if not dot or f".{ext.lower()}" not in I18N_EXTS:
+        return None
+    if f".{ext.lower()}" not in I18N_MARKUP_EXTS and not any(part.lower() in I18N_DIRS for part in parts[:-1]):
+        return None
+    domain, sep, last = stem.rpartition(".")
+    if sep and _i18n_locale(last):
+        return "/".join(parts[:-1] + [f"{domain}.*.{ext}"]), last
+    if _i18n_locale(stem):
+        return "/".join(parts[:-1] + [f"*.{ext}"]), stem
+    for k in range(len(parts) - 2, -1, -1):
+        if _i18n_locale(parts[k]):
+            return "/".join(parts[:k] + ["*"] + parts[k + 1:]), parts[k]
+    return None
+
+def _i18n_json_keys(chunks: Iterable[str]) -> list[str]:
+    """Cles feuilles ("a.b.c") d'un JSON de traduction, sur le flux de _json_tokens ; un tableau compte comme une feuille."""
+    keys: list[str] = []
+    path: list[str] = []  # cles des objets imbriques ouverts
+    maps = 0
+    key = ""
+    expect_key = False
+    skip = 0  # profondeur dans un tableau (contenu ignore)
+
+    def flatten(obj: dict, prefix: list[str]) -> None:
+        for k, v in obj.items():
+            if isinstance(v, dict) and v:
+                flatten(v, prefix + [k])
+            else:
+                keys.append(".".join(prefix + [k]))
+
+    for tok, value, length in _json_tokens(chunks, I18N_KEY_MAX):
+        if skip:
+            if tok in ("{", "["):
+                skip += 1
+            elif tok in ("}", "]"):
+                skip -= 1
+                if not skip and maps:
+                    keys.append(".".join(path + [key]))
+            continue
+        if tok == "{":
+            if maps:
+                path.append(key)
+            maps += 1
+            expect_key = True
+        elif tok == "}":
+            maps -= 1
+            if maps and path:
+                path.pop()
+            expect_key = False
+        elif tok == "[":
+            skip = 1
+        elif tok == ",":
+            expect_key = maps > 0
+        elif tok == "str" and expect_key:
+            key, expect_key = _json_string(value, length), False  # type: ignore[arg-type]
+        elif tok == "value":
+            if isinstance(value, dict):
+                flatten(value, path + [key] if maps else [])
+            elif maps:
+                keys.append(".".join(path + [key]))
+        elif tok in ("str", "num", "lit") and maps:
+            keys.append(".".join(path + [key]))
+    return keys
+
+def _i18n_yaml_keys(lines: Iterable[str]) -> list[str]:
+    """Cles feuilles d'un YAML de traduction, ligne a ligne par l'indentation (listes et blocs | > compris dans leur cle)."""
+    keys: list[str] = []
+    stack: list[list] = []  # [indentation, cle, a des enfants ?]
+    block = -1  # indentation de la cle d'un bloc | ou > en cours
+
+    def pop_to(indent: int) -> None:
+        while stack and stack[-1][0] >= indent:
+            entry = stack.pop()
+            if not entry[2]:
+                keys.append(".".join([e[1] for e in stack] + [entry[1]]))
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+        stripped = line.lstrip(" ")
+        indent = len(line) - len(stripped)
+        if block >= 0:
+            if not stripped or indent > block:
+                continue
+            block = -1
+        if not stripped or stripped[0] == "#" or stripped.startswith(("---", "...", "- ")) or stripped == "-":
+            continue
+        m = _I18N_YAML_KEY_RE.match(stripped)
+        if m is None:
+            continue  # suite d'une valeur sur plusieurs lignes
+        key = m.group(1) if m.group(1) is not None else m.group(2).replace("''", "'") if m.group(2) is not None else m.group(3)
+        value = (m.group(4) or "").strip()
+        pop_to(indent)
+        if stack:
+            stack[-1][2] = True
+        if not value or value[0] == "#":
+            stack.append([indent, key, False])
+            continue
+        if value[0] in "|>":
+            block = indent
+        keys.append(".".join([e[1] for e in stack] + [key]))
+    pop_to(0)
+    return keys
+
+def _i18n_po_keys(lines: Iterable[str]) -> list[str]:
+    """msgid traduits (msgstr non vide) d'un catalogue gettext, prefixes de leur msgctxt ; entetes et entrees obsoletes ignores."""
+    keys: list[str] = []
+    entry: dict[str, str] = {}
+    field = ""
+
+    def flush() -> None:
+        msgid = entry.get("msgid", "")
+        if msgid and any(v for f, v in entry.items() if f.startswith("msgstr")):
+            ctxt = entry.get("msgctxt")
+            keys.append(f"{ctxt}|{msgid}" if ctxt else msgid)
+        entry.clear()
+
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] == "#":
+            if not line and entry:
+                flush()
+            continue
+        m = _I18N_PO_RE.match(line)
+        if m is None:
+            continue
+        if m.group(1):
+            field = m.group(1)
+            if field in ("msgctxt", "msgid") and any(f.startswith("msgstr") for f in entry):
+                flush()
+            entry[field] = m.group(2)
+        elif field:
+            entry[field] = entry.get(field, "") + m.group(3)
+    flush()
+    return keys
+
+def _i18n_xliff_keys(chunks: Iterable[str]) -> list[str]:
+    """Identifiants (id, sinon resname) des <trans-unit> (XLIFF 1.2) et <unit> (XLIFF 2)."""
+    import xml.etree.ElementTree as ET
+
+    parser = ET.XMLPullParser(("start", "end"))
+    keys: list[str] = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            tag = elem.tag.rsplit("}", 1)[-1] if isinstance(elem.tag, str) else ""
+            if tag not in ("trans-unit", "unit"):
+                continue
+            if event == "start":
+                key = elem.get("resname") or elem.get("id")
+                if key:
+                    keys.append(key)
+            else:
+                elem.clear()
+    parser.close()
+    return keys
+
+def _i18n_keys_file(path: str) -> tuple[str, list[str] | None]:
+    """(chemin, cles de traduction dans l'ordre du fichier) ; None si le fichier n'a pas pu etre lu."""
+    p = Path(path)
+    ext = p.suffix.lower()
+    try:
+        if ext == ".json":
+            keys = _i18n_json_keys(_chunks(p))
+        elif ext == ".po":
+            keys = _i18n_po_keys(_iter_lines(p))
+        elif ext in (".xlf", ".xliff"):
+            keys = _i18n_xliff_keys(_chunks(p))
+        else:
+            keys = _i18n_yaml_keys(_iter_lines(p))
+    except Exception as exc:
+        LOGGER.info("Traduction illisible %s : %s", path, exc)
+        return path, None
+    return path, keys
+
+def _i18n_keys(
+    root: Path, files: Sequence[Path], cancel: threading.Event | None = None, cache: _FileCache | None = None
+) -> dict[Path, list[str] | None] | None:
+    return _cached_file_map(root, files, I18N_CACHE_KIND, _i18n_keys_file, cancel, cache, chunksize=8)  # type: ignore[return-value]
+
+class _I18nDiff:
+    __slots__ = ("reference", "locale", "reference_locale", "total", "missing", "extra")
+
+    def __init__(self, reference: Path, locale: str, reference_locale: str, total: int, missing: list[str], extra: list[str]):
+        self.reference = reference
+        self.locale = locale
+        self.reference_locale = reference_locale
+        self.total = total
+        self.missing = missing
+        self.extra = extra
+
+    def render(self, reference_rel: str) -> str:
+        lines = [
+            f"{self.total} cles ({self.locale}), {len(self.missing)} manquante(s) et {len(self.extra)} en plus "
+            f"par rapport a {reference_rel} ({self.reference_locale})."
+        ]
+        for title, keys in (("Manquantes", self.missing), ("En plus", self.extra)):
+            if not keys:
+                continue
+            lines.append(f"{title} :")
+            lines.extend(f"- {_shorten(key, SUMMARY_STR_MAX)}" for key in keys[:I18N_DIFF_MAX_KEYS])
+            if len(keys) > I18N_DIFF_MAX_KEYS:
+                lines.append(f"- ... et {len(keys) - I18N_DIFF_MAX_KEYS} autres")
+        return "\n".join(lines)
+
+def _i18n_diffs(
+    root: Path, files: Sequence[Path], locale: str = I18N_DEFAULT_LOCALE, cancel: threading.Event | None = None
+) -> dict[Path, _I18nDiff] | None:
+    """Fichiers de traduction reduits a leurs ecarts de cles avec la reference de leur groupe ; None si annule."""
+    groups: dict[str, dict[str, Path]] = defaultdict(dict)
+    for fp in files:
+        try:
+            slot = _i18n_slot(fp.relative_to(root).as_posix())
+        except ValueError:
+            continue
+        if slot is not None:
+            groups[slot[0]][slot[1]] = fp
+    groups = {pattern: by_locale for pattern, by_locale in groups.items() if len(by_locale) > 1}
+    if not groups:
+        return {}
+    keys = _i18n_keys(root, [fp for by_locale in groups.values() for fp in by_locale.values()], cancel)
+    if keys is None:
+        return None
+    diffs: dict[Path, _I18nDiff] = {}
+    for by_locale in groups.values():
+        readable = {loc: keys[fp] for loc, fp in by_locale.items() if keys.get(fp) is not None}
+        if len(readable) < 2:
+            continue
+        ref_locale = locale if locale in readable else min(readable, key=lambda loc: (-len(readable[loc]), loc))  # type: ignore[arg-type]
+        ref_keys = readable[ref_locale]
+        ref_set = set(ref_keys)
+        for loc, loc_keys in readable.items():
+            if loc == ref_locale:
+                continue
+            loc_set = set(loc_keys)  # type: ignore[arg-type]
+            diffs[by_locale[loc]] = _I18nDiff(
+                by_locale[ref_locale], loc, ref_locale, len(loc_set),
+                [k for k in ref_keys if k not in loc_set], [k for k in loc_keys if k not in ref_set],  # type: ignore[union-attr]
+            )
+    return diffs
+
+DEPS_API_CACHE_KIND = "depsapi:2"
+DEPS_API_CACHE_PATH = CONTENT_CACHE_DIR / "deps_api.sqlite"  # partage entre projets : une version = une surface
+DEPS_API_MAX_FILES = 2000  # fichiers d'API retenus par paquet
+DEPS_API_MAX_CHARS = 64 << 10  # par paquet dans l'export
+DEPS_API_FILE_MAX_BYTES = 1 << 20
+DEPS_API_RAW_SUFFIXES = (".d.ts", ".d.mts", ".d.cts", ".pyi")  # deja reduits a l'API : exportes tels quels
+DEPS_API_SKIP_DIRS = {
+    "test", "tests", "__tests__", "testing", "fixtures", "doc", "docs", "example", "examples",
+    "benchmark", "benchmarks", "node_modules", "vendor", "__pycache__",
+}
+_DEPS_PEP508_NAME_RE = re.compile(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+def _pep503(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+class _DependencyApi:
+    __slots__ = ("ecosystem", "name", "version", "base", "roots", "prefixes", "used", "files")
+
+    def __init__(self, ecosystem: str, name: str, version: str, base: Path, roots: Sequence[str] = ("",)):
+        self.ecosystem = ecosystem
+        self.name = name
+        self.version = version
+        self.base = base
+        self.roots = list(roots)  # dossiers ou fichiers d'API, relatifs a base
+        self.prefixes: list[tuple[str, str, str]] = []  # composer : (psr-4|psr-0, espace de noms, dossier)
+        self.used: set[str] = set()
+        self.files: list[tuple[str, str]] = []
+
+    @property
+    def key(self) -> str:
+        key = f"{self.ecosystem}:{self.name}@{self.version}"
+        own = self.version.partition("+")[0].partition("#")[0]
+        if own and not own.startswith("dev-"):
+            return key
+        # Sans version stable (paquet lie, workspace, depot "path") : le cache est partage entre projets,
+        # le dossier du paquet et la date de son manifeste distinguent deux copies du meme nom.
+        manifest = self.base / ("package.json" if self.ecosystem == "npm" else "composer.json")
+        try:
+            stamp = (manifest if manifest.exists() else self.base).stat().st_mtime_ns
+        except OSError:
+            stamp = 0
+        return f"{key}|{os.path.normcase(os.path.abspath(self.base))}|{stamp}"
+
+    def php_file(self, fqn: str) -> str | None:
+        """Chemin (relatif a base) de la classe fqn selon l'autoload du paquet."""
+        for std, prefix, d in self.prefixes:
+            if fqn != prefix and not fqn.startswith(prefix + "\\"):
+                continue
+            if std == "psr-4":
+                rest = fqn[len(prefix):].strip("\\").replace("\\", "/")
+            else:
+                ns, _, cls = fqn.rpartition("\\")
+                rest = "/".join(filter(None, [ns.replace("\\", "/"), cls.replace("_", "/")]))
+            return f"{d}/{rest}.php".lstrip("/")
+        return None
+
+    def surface_paths(self) -> list[str]:
+        """Fichiers d'API du paquet (relatifs a base), hors tests et modules prives, bornes a DEPS_API_MAX_FILES."""
+        if self.ecosystem == "npm":
+            suffixes: tuple[str, ...] = DEPS_API_RAW_SUFFIXES[:3]
+        elif self.ecosystem == "composer":
+            suffixes = (".php",)
+        else:
+            suffixes = (".pyi", ".py")
+        found: list[str] = []
+        for start in self.roots:
+            top = self.base / start if start else self.base
+            if top.is_file():
+                found.append(start)
+                continue
+            for dirpath, dirnames, filenames in os.walk(top):
+                dirnames[:] = sorted(
+                    d for d in dirnames
+                    if d.casefold() not in DEPS_API_SKIP_DIRS and not d.startswith(".")
+                    and not (self.ecosystem == "python" and d.startswith("_"))
+                )
+                rel_dir = Path(dirpath).relative_to(self.base).as_posix()
+                for name in sorted(filenames):
+                    if not name.endswith(suffixes):
+                        continue
+                    if self.ecosystem == "python" and name.startswith("_") and not name.startswith("__init__."):
+                        continue
+                    found.append(name if rel_dir == "." else f"{rel_dir}/{name}")
+                    if len(found) >= DEPS_API_MAX_FILES:
+                        return found
+        if self.ecosystem == "python":
+            # Un module documente par ses stubs : le .py voisin n'apporte rien de plus.
+            stubs = {rel[:-1] for rel in found if rel.endswith(".pyi")}
+            found = [rel for rel in found if rel not in stubs]
+        return found
+
+    def priority(self, rel: str) -> int:
+        """0 : element importe par le projet, 1 : point d'entree ou interface, 2 : le reste."""
+        stem = rel.rsplit(".", 2 if rel.endswith(DEPS_API_RAW_SUFFIXES[:3]) else 1)[0]
+        if self.ecosystem == "composer":
+            if rel in self.used:
+                return 0
+            return 1 if stem.endswith("Interface") else 2
+        if self.ecosystem == "npm":
+            subpaths = {spec[len(self.name):].strip("/") for spec in self.used}
+            if any(sub and (stem.endswith("/" + sub) or stem == sub) for sub in subpaths):
+                return 0
+            return 1 if stem.rsplit("/", 1)[-1] == "index" or "/" not in stem else 2
+        module = stem[:-len("/__init__")] if stem.endswith("/__init__") else stem
+        module = module.replace("/", ".").replace("-stubs", "")
+        if module in self.used:
+            return 0
+        return 1 if "." not in module else 2
+
+    def render(self, root: Path) -> str:
+        try:
+            base_rel = self.base.relative_to(root).as_posix()
+        except ValueError:
+            base_rel = self.base.as_posix()
+        ordered = sorted(self.files, key=lambda item: (self.priority(item[0]), item[0]))
+        lines = [f"### {self.ecosystem} {self.name} {self.version or '(version inconnue)'} - {len(self.files)} fichier(s) d'API", ""]
+        budget = DEPS_API_MAX_CHARS
+        shown = 0
+        for rel, text in ordered:
+            if len(text) > budget and shown:
+                break
+            text = _clip(text, budget)
+            budget -= len(text)
+            shown += 1
+            path = f"{base_rel}/{rel}"
+            lines.append(f"#### {path}")
+            lines.append(f"```{_lang_for(Path(rel))}")
+            lines.append(text.rstrip("\n"))
+            lines.append("```")
+            lines.append("")
+        if shown < len(ordered):
+            lines.append(f"... {len(ordered) - shown} autre(s) fichier(s) d'API non exporte(s) (limite de {_human_bytes(DEPS_API_MAX_CHARS)} par paquet)")
+            lines.append("")
+        return "\n".join(lines)
+
+def _pyproject_dependencies(root: Path) -> set[str]:
+    import tomllib
+
+    try:
+        with (root / "pyproject.toml").open("rb") as fh:
+            data = tomllib.load(fh)
+    except Exception:
+        return set()
+    project = data.get("project") or {}
+    specs = list(project.get("dependencies") or [])
+    for group in (project.get("optional-dependencies") or {}).values():
+        specs += group
+    for group in (data.get("dependency-groups") or {}).values():
+        specs += group
+    names = {_pep503(m.group(1)) for m in (_DEPS_PEP508_NAME_RE.match(spec) for spec in specs if isinstance(spec, str)) if m}
+    poetry = (data.get("tool") or {}).get("poetry") or {}
+    tables = [poetry.get("dependencies") or {}, poetry.get("dev-dependencies") or {}]
+    tables += [(group or {}).get("dependencies") or {} for group in (poetry.get("group") or {}).values()]
+    for table in tables:
+        names.update(_pep503(name) for name in table if name.lower() != "python")
+    return names
+
+def _declared_dependencies(root: Path) -> dict[str, set[str]]:
+    """Dependances declarees par ecosysteme : composer.json, package.json, pyproject.toml."""
+    declared: dict[str, set[str]] = {"composer": set(), "npm": set(), "python": _pyproject_dependencies(root)}
+    try:
+        data = json.loads((root / "composer.json").read_text(encoding="utf-8"))
+        for section in ("require", "require-dev"):
+            # "php", "ext-json"... ne sont pas des paquets.
+            declared["composer"].update(name.lower() for name in (data.get(section) or {}) if "/" in name)
+    except Exception:
+        pass
+    try:
+        data = json.loads((root / "package.json").read_text(encoding="utf-8"))
+        for section in ("dependencies", "devDependencies", "peerDependencies", "optionalDependencies"):
+            declared["npm"].update(data.get(section) or {})
+    except Exception:
+        pass
+    return declared
+
+def _composer_packages(root: Path, names: set[str]) -> list[_DependencyApi]:
+    vendor = root / "vendor"
+    try:
+        data = json.loads((vendor / "composer" / "installed.json").read_text(encoding="utf-8"))
+        entries = data.get("packages", []) if isinstance(data, dict) else data
+    except Exception:
+        # Pas d'installed.json : manifeste de chaque paquet.
+        entries = []
+        for name in sorted(names):
+            try:
+                entries.append(json.loads((vendor / name / "composer.json").read_text(encoding="utf-8")))
+            except Exception:
+                continue
+    out: list[_DependencyApi] = []
+    for entry in entries:
+        name = str(entry.get("name") or "").lower()
+        if name not in names:
+            continue
+        install = entry.get("install-path")
+        base = Path(os.path.normpath(vendor / "composer" / install)) if install else vendor / name
+        version = str(entry.get("version") or "")
+        if version.startswith("dev-") or not version:
+            # Une branche bouge : la revision installee fait partie de la version.
+            ref = (entry.get("source") or entry.get("dist") or {}).get("reference") or ""
+            version = f"{version}#{ref[:12]}" if ref else version
+        dep = _DependencyApi("composer", name, version, base)
+        autoload = entry.get("autoload") or {}
+        for std in ("psr-4", "psr-0"):
+            for prefix, dirs in (autoload.get(std) or {}).items():
+                for d in [dirs] if isinstance(dirs, str) else dirs:
+                    if prefix.strip("\\"):
+                        dep.prefixes.append((std, prefix.strip("\\"), d.strip("/")))
+        dep.prefixes.sort(key=lambda item: len(item[1]), reverse=True)
+        if dep.prefixes:
+            dep.roots = sorted({d for _std, _prefix, d in dep.prefixes})
+        out.append(dep)
+    return out
+
+def _npm_packages(root: Path, names: set[str]) -> list[_DependencyApi]:
+    out: list[_DependencyApi] = []
+    modules = root / "node_modules"
+    for name in sorted(names):
+        base = modules / name
+        try:
+            data = json.loads((base / "package.json").read_text(encoding="utf-8"))
+        except Exception:
+            continue
+        dep = _DependencyApi("npm", name, str(data.get("version") or ""), base)
+        if not (data.get("types") or data.get("typings")):
+            # Types publies a part (DefinitelyTyped) : @types/scope__nom.
+            types = modules / "@types" / name.lstrip("@").replace("/", "__")
+            try:
+                types_data = json.loads((types / "package.json").read_text(encoding="utf-8"))
+            except Exception:
+                types_data = None
+            if types_data is not None:
+                dep.base = types
+                dep.version += f"+types@{types_data.get('version') or ''}"
+            elif not any(base.glob("*.d.ts")):
+                # Ni types livres ni @types : squelette du point d'entree.
+                entry = _ImportResolver._norm(str(data.get("module") or data.get("main") or "index.js"))
+                if entry:
+                    dep.roots = [entry if (base / entry).is_file() else entry + ".js"]
+        out.append(dep)
+    return out
+
+def _site_packages(root: Path) -> list[Path]:
+    found: list[Path] = []
+    for venv in (".venv", "venv"):
+        found += sorted((root / venv).glob("lib/python*/site-packages"))
+        if (root / venv / "Lib" / "site-packages").is_dir():
+            found.append(root / venv / "Lib" / "site-packages")
+    return found
+
+def _python_packages(root: Path, names: set[str]) -> list[_DependencyApi]:
+    out: dict[str, _DependencyApi] = {}
+    for site in _site_packages(root):
+        for info in sorted(site.glob("*.dist-info")):
+            dist, _, version = info.name[: -len(".dist-info")].partition("-")
+            name = _pep503(dist)
+            if name not in names or name in out:
+                continue
+            try:
+                modules = (info / "top_level.txt").read_text(encoding="utf-8").split()
+            except Exception:
+                # Sans top_level.txt : premiers segments des chemins du RECORD.
+                try:
+                    record = (info / "RECORD").read_text(encoding="utf-8").splitlines()
+                except Exception:
+                    record = []
+                modules = sorted({
+                    line.split(",", 1)[0].split("/", 1)[0].removesuffix(".py")
+                    for line in record
+                    if line and not line.startswith("..") and ".dist-info" not in line.split("/", 1)[0]
+                })
+            roots = []
+            for module in sorted(set(modules)):
+                if not module or module.startswith("_") or module == "__pycache__":
+                    continue
+                for candidate in (f"{module}-stubs", module, f"{module}.pyi", f"{module}.py"):
+                    if (site / candidate).exists():
+                        roots.append(candidate)
+                        break
+            if roots:
+                out[name] = _DependencyApi("python", name, version, site, roots)
+    return list(out.values())
+
+def _mark_imported(deps: Sequence[_DependencyApi], specs: Iterable[Sequence[str] | None]) -> None:
+    """Renseigne dep.used a partir des imports du projet (bruts, _extract_imports)."""
+    npm = {dep.name: dep for dep in deps if dep.ecosystem == "npm"}
+    py: dict[str, _DependencyApi] = {}
+    for dep in deps:
+        if dep.ecosystem == "python":
+            for start in dep.roots:
+                py.setdefault(start.split(".", 1)[0].removesuffix("-stubs"), dep)
+    php = [dep for dep in deps if dep.ecosystem == "composer" and dep.prefixes]
+    for found in specs:
+        for spec in found or ():
+            kind, _, value = spec.partition(":")
+            if kind == "js" and not value.startswith((".", "/")):
+                parts = value.split("?", 1)[0].split("/")
+                dep = npm.get("/".join(parts[:2]) if value.startswith("@") else parts[0])
+                if dep is not None:
+                    dep.used.add(value)
+            elif kind == "py" and not value.startswith("."):
+                dep = py.get(value.split(".", 1)[0])
+                if dep is not None:
+                    dep.used.add(value)
+            elif kind == "php":
+                for dep in php:
+                    rel = dep.php_file(value)
+                    if rel is not None:
+                        dep.used.add(rel)
+                        break
+
+def _dependency_api_file(path: str) -> tuple[str, str | None]:
+    """Surface publique d'un fichier de dependance : tel quel (.d.ts, .pyi) ou son squelette."""
+    try:
+        if os.path.getsize(path) > DEPS_API_FILE_MAX_BYTES:
+            return path, None
+        if path.endswith(DEPS_API_RAW_SUFFIXES):
+            return path, _read_text(Path(path))
+    except Exception:
+        return path, None
+    return _skeleton_file(path)
+
+def _dependency_apis(
+    root: Path, files: Sequence[Path], cancel: threading.Event | None = None, cache: _FileCache | None = None
+) -> list[_DependencyApi] | None:
+    """Paquets declares, installes et importes par les fichiers, avec leur surface publique ; None si annule."""
+    declared = _declared_dependencies(root)
+    deps = (
+        _composer_packages(root, declared["composer"])
+        + _npm_packages(root, declared["npm"])
+        + _python_packages(root, declared["python"])
+    )
+    if not deps:
+        return []
+    sources = [fp for fp in files if fp.suffix.lower() in IMPORT_LANG_BY_EXT]
+    specs = _cached_file_map(root, sources, IMPORTS_CACHE_KIND, _extract_imports, cancel)
+    if specs is None:
+        return None
+    _mark_imported(deps, specs.values())  # type: ignore[arg-type]
+    deps = [dep for dep in deps if dep.used]
+    cache = cache or _FileCache(root, DEPS_API_CACHE_KIND, DEPS_API_CACHE_PATH)
+    # La cle (version, ou dossier et manifeste sans version stable) tient lieu d'empreinte.
+    keys = {dep: dep.key for dep in deps}
+    found = cache.get_many({key: (0, 0.0) for key in keys.values()})
+    todo: dict[str, tuple[_DependencyApi, str]] = {}
+    for dep in deps:
+        if keys[dep] in found:
+            dep.files = [(rel, text) for rel, text in found[keys[dep]]]  # type: ignore[union-attr]
+        else:
+            todo.update((str(dep.base / rel), (dep, rel)) for rel in dep.surface_paths())
+    for path, text in _parallel_map(_dependency_api_file, list(todo), chunksize=8):
+        if cancel is not None and cancel.is_set():
+            return None
+        dep, rel = todo[path]
+        if text and text.strip():
+            dep.files.append((rel, text))
+    fresh = [dep for dep in deps if keys[dep] not in found]
+    for dep in fresh:
+        dep.files.sort()
+    if fresh:
+        cache.put_many((keys[dep], 0, 0.0, dep.files) for dep in fresh)
+    return [dep for dep in deps if dep.files]
+
+TRUNCATE_HEAD = 200
+TRUNCATE_TAIL = 50
+
+# graph, hotness, keep_full, capped et dependency_api sont renseignes par l'application au lancement.
+class _ExportOptions:
+    __slots__ = (
+        "mode", "query", "regex", "case_sensitive", "context", "order", "graph", "hotness", "keep_full", "capped", "dependency_api",
+        "strip_comments", "strip_docstrings", "collapse_blank", "normalize_indent", "shared_blocks",
+        "collapse_duplicates", "truncate_bytes", "truncate_lines", "head_lines", "tail_lines",
+        "summarize_data", "notebooks", "strip_blobs", "i18n", "i18n_locale",
+    )
+
+    MODES = ("full", "excerpt", "skeleton", "mixed")
+    ORDERS = ("path", "deps", "hot")
+
+    def __init__(
+        self,
+        mode: str = "full",
+        query: str = "",
+        regex: bool = False,
+        case_sensitive: bool = False,
+        context: int = 3,
+        order: str = "path",
+        graph: "_ImportGraph | None" = None,
+        strip_comments: bool = False,
+        strip_docstrings: bool = False,
+        collapse_blank: bool = False,
+        normalize_indent: bool = False,
+        shared_blocks: bool = False,
+        collapse_duplicates: bool = False,
+        truncate_bytes: int = 0,
+        truncate_lines: int = 0,
+        head_lines: int = TRUNCATE_HEAD,
+        tail_lines: int = TRUNCATE_TAIL,
+        summarize_data: bool = False,
+        notebooks: bool = True,
+        strip_blobs: bool = False,
+        i18n: bool = False,
+        i18n_locale: str = I18N_DEFAULT_LOCALE,
+    ):
+        self.mode = mode if mode in self.MODES else "full"
+        self.query = query
+        self.regex = regex
+        self.case_sensitive = case_sensitive
+        self.context = max(0, int(context))
+        self.order = order if order in self.ORDERS else "path"
+        self.graph = graph
+        self.hotness: _GitHotness | None = None
+        self.keep_full: frozenset[Path] = frozenset()
+        self.capped: dict[Path, tuple[int, int]] = {}
+        self.dependency_api = False
+        self.strip_comments = strip_comments
+        self.strip_docstrings = strip_docstrings
+        self.collapse_blank = collapse_blank
+        self.normalize_indent = normalize_indent
+        self.shared_blocks = shared_blocks
+        self.collapse_duplicates = collapse_duplicates
+        self.truncate_bytes = max(0, int(truncate_bytes))
+        self.truncate_lines = max(0, int(truncate_lines))
+        self.head_lines = max(0, int(head_lines))
+        self.tail_lines = max(0, int(tail_lines))
+        self.summarize_data = summarize_data
+        self.notebooks = notebooks
+        self.strip_blobs = strip_blobs
+        self.i18n = i18n
+        self.i18n_locale = i18n_locale.strip() or I18N_DEFAULT_LOCALE
+
+    @property
+    def excerpt(self) -> bool:
+        return self.mode == "excerpt" and bool(self.query)
+
+    @property
+    def lean(self) -> bool:
+        return not self.excerpt and (self.strip_comments or self.strip_docstrings or self.collapse_blank or self.normalize_indent)
+
+    def transform(self, lang: str) -> "_StripTransform | None":
+        if not self.lean:
+            return None
+        return _StripTransform(lang, self.strip_comments, self.strip_docstrings, self.collapse_blank, self.normalize_indent)
+
+    def blob_filter(self) -> "_BlobFilter | None":
+        return _BlobFilter() if self.strip_blobs and not self.excerpt else None
+
+    @property
+    def truncates(self) -> bool:
+        return not self.excerpt and bool(self.truncate_bytes or self.truncate_lines)
+
+    def truncation_for(self, fp: Path) -> int | None:
+        """Seuil en lignes pour _head_tail (0 : fichier trop gros, tronque d'office), None sans troncature."""
+        if not self.truncates:
+            return None
+        if self.truncate_bytes:
+            try:
+                if fp.stat().st_size > self.truncate_bytes:
+                    return 0
+            except OSError:
+                pass
+        return self.truncate_lines or None
+
+    def summary_for(self, fp: Path) -> bool:
+        if not self.summarize_data or self.excerpt or fp.suffix.lower() not in SUMMARY_LANGS:
+            return False
+        try:
+            return fp.stat().st_size >= SUMMARY_MIN_BYTES
+        except OSError:
+            return False
+
+    def notebook_for(self, fp: Path) -> bool:
+        return self.notebooks and not self.excerpt and fp.suffix.lower() == ".ipynb"
+
+    def skeleton_for(self, fp: Path) -> bool:
+        return self.mode == "skeleton" or (self.mode == "mixed" and fp not in self.keep_full)
+
+    @property
+    def deps_first(self) -> bool:
+        return self.order == "deps" and self.graph is not None
+
+    @property
+    def hot_first(self) -> bool:
+        return self.order == "hot" and self.hotness is not None
+
+    def describe(self) -> str | None:
+        """Ligne "Mode" de l'introduction (None pour l'export complet dans l'ordre des chemins)."""
+        parts: list[str] = []
+        if self.excerpt:
+            kind = "regex" if self.regex else "texte"
+            parts.append(f"extraits ({kind} \"{self.query}\", contexte +/- {self.context} lignes)")
+        elif self.mode == "skeleton":
+            parts.append("squelette (signatures et docstrings, corps elides)")
+        elif self.mode == "mixed":
+            parts.append("mixte (selection complete, squelette pour les autres fichiers)")
+        if self.lean:
+            what = [
+                label
+                for flag, label in (
+                    (self.strip_comments, "commentaires"),
+                    (self.strip_docstrings, "docstrings"),
+                    (self.collapse_blank, "lignes vides"),
+                    (self.normalize_indent, "indentation"),
+                )
+                if flag
+            ]
+            parts.append(f"allege ({', '.join(what)})")
+        if self.shared_blocks and not self.excerpt and not self.strip_comments:
+            parts.append("blocs communs factorises")
+        if self.collapse_duplicates:
+            parts.append("doublons regroupes")
+        if self.summarize_data and not self.excerpt:
+            parts.append("gros JSON/XML/SQL resumes")
+        if self.strip_blobs and not self.excerpt:
+            parts.append("blobs remplaces")
+        if self.i18n and not self.excerpt:
+            parts.append(f"traductions regroupees (reference {self.i18n_locale})")
+        if self.dependency_api and not self.excerpt:
+            parts.append("API des dependances importees")
+        if self.truncates:
+            limits = [_human_bytes(self.truncate_bytes)] if self.truncate_bytes else []
+            if self.truncate_lines:
+                limits.append(f"{self.truncate_lines} lignes")
+            parts.append(f"tronque au-dela de {' ou '.join(limits)} ({self.head_lines} premieres / {self.tail_lines} dernieres lignes)")
+        if self.deps_first:
+            parts.append("dependances d'abord")
+        if self.hot_first:
+            parts.append("fichiers les plus actifs d'abord (historique git)")
+        return ", ".join(parts) or None
+
+    def sort(self, root: Path, files: Iterable[Path]) -> list[Path]:
+        files_sorted = sorted(files, key=lambda p: p.relative_to(root).as_posix().casefold())
+        if self.deps_first:
+            return self.graph.topo_order(files_sorted)  # type: ignore[union-attr]
+        if self.hot_first:
+            # Tri stable : a activite egale (fichiers jamais modifies compris), l'ordre des chemins.
+            scores = self.hotness.relevance(files_sorted, self.keep_full)  # type: ignore[union-attr]
+            return sorted(files_sorted, key=lambda p: -scores[p])
+        return files_sorted
+
+class _ExportCancelled(Exception):
+    pass
+
+def _export_shared_blocks(
+    root: Path, files: Sequence[Path], options: _ExportOptions, cancel: threading.Event | None = None
+) -> tuple[list[_SharedBlock], dict] | None:
+    # Les blocs ne contiennent que des commentaires : inutile si on les retire deja.
+    if not options.shared_blocks or options.excerpt or options.strip_comments:
+        return [], {}
+    return _shared_blocks(root, files, cancel)
+
+def _export_duplicates(
+    root: Path, files: Sequence[Path], options: _ExportOptions, cancel: threading.Event | None = None
+) -> dict[Path, tuple[Path, bool]] | None:
+    """Doublons a regrouper, a traitement egal ; les quasi-doublons (diff du brut) ne valent qu'en export complet."""
+    if not options.collapse_duplicates:
+        return {}
+    fingerprints = _fingerprints(root, files, cancel)
+    if fingerprints is None:
+        return None
+    out: dict[Path, tuple[Path, bool]] = {}
+    for skeleton in (False, True):
+        group = [fp for fp in files if options.skeleton_for(fp) == skeleton]
+        near = not skeleton and not options.excerpt
+        out.update((fp, dup) for fp, dup in _duplicate_map(group, fingerprints).items() if dup[1] or near)
+    return out
+
+def _export_summaries(
+    root: Path, files: Sequence[Path], options: _ExportOptions, cancel: threading.Event | None = None
+) -> dict[Path, list | None] | None:
+    wanted = [fp for fp in files if options.summary_for(fp)]
+    if not wanted:
+        return {}
+    return _summaries(root, wanted, cancel)
+
+def _export_i18n(
+    root: Path, files: Sequence[Path], options: _ExportOptions, cancel: threading.Event | None = None
+) -> dict[Path, _I18nDiff] | None:
+    if not options.i18n or options.excerpt:
+        return {}
+    return _i18n_diffs(root, files, options.i18n_locale, cancel)
+
+def _export_dependency_api(
+    root: Path, files: Sequence[Path], options: _ExportOptions, cancel: threading.Event | None = None
+) -> list[_DependencyApi] | None:
+    if not options.dependency_api or options.excerpt:
+        return []
+    return _dependency_apis(root, files, cancel)
+
+def _export_notebooks(
+    root: Path, files: Sequence[Path], options: _ExportOptions, cancel: threading.Event | None = None
+) -> dict[Path, list[str] | None] | None:
+    wanted = [fp for fp in files if options.notebook_for(fp)]
+    if not wanted:
+        return {}
+    return _notebooks(root, wanted, cancel)
+
+def _near_duplicate_diff(canon: Path, fp: Path, canon_rel: str, rel: str) -> str | None:
+    """Diff unifie de fp par rapport a sa reference ; None s'il n'est pas plus court que le fichier."""
+    import difflib
+
+    try:
+        if canon.stat().st_size > DUP_DIFF_MAX_BYTES or fp.stat().st_size > DUP_DIFF_MAX_BYTES:
+            return None
+        before, after = _read_text(canon), _read_text(fp)
+    except Exception:
+        return None
+    diff = "".join(
+        line if line.endswith("\n") else line + "\n"
+        for line in difflib.unified_diff(before.splitlines(True), after.splitlines(True), canon_rel, rel, n=2)
+    )
+    return diff if len(diff) < len(after) else None
+
+def _export_skeletons(
+    root: Path, files: Sequence[Path], options: _ExportOptions, cancel: threading.Event | None = None
+) -> dict[Path, str | None] | None:
+    if options.mode not in ("skeleton", "mixed"):
+        return {}
+    return _skeletons(root, [fp for fp in files if options.skeleton_for(fp)], cancel)
+
+def _split_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Lignes (fin de ligne incluse) d'un flux de morceaux de texte."""
+    pending = ""
+    for chunk in chunks:
+        parts = (pending + chunk).split("\n")
+        pending = parts.pop()
+        for part in parts:
+            yield part + "\n"
+    if pending:
+        yield pending
+
+def _iter_lines(p: Path) -> Iterator[str]:
+    """Lignes du fichier (fin de ligne incluse) en un seul passage sur _chunks."""
+    return _split_lines(_chunks(p))
+
+def _head_tail(lines: Iterable[str], head: int, tail: int, max_lines: int, elided: list[int]) -> Iterator[str]:
+    """Tete et queue du flux au-dela de max_lines lignes (0 : head + tail) ; les lignes elidees s'ajoutent a elided."""
+    it = iter(lines)
+    yield from islice(it, head)
+    budget = max(max_lines - head, tail)
+    pending: list[str] = []  # lignes suivant la tete tant que le seuil n'est pas franchi
+    ring: deque[str] | None = None
+    skipped = 0
+    for line in it:
+        if ring is not None:
+            if len(ring) == tail:
+                skipped += 1
+            ring.append(line)
+            continue
+        pending.append(line)
+        if len(pending) > budget:
+            ring = deque(pending[len(pending) - tail:] if tail else (), maxlen=tail)
+            skipped = len(pending) - len(ring)
+            pending = []
+    if ring is None:
+        yield from pending
+        return
+    elided.append(skipped)
+    yield f"... [{skipped} lignes elidees] ...\n"
+    yield from ring
+
+# Syntaxe minimale par famille de langages pour l'allegement des exports :
+# commentaires de ligne, blocs, guillemets, guillemets multi-lignes.
+_STRIP_SYNTAX: dict[str, dict] = {
+    "c": {"line": ("//",), "block": (("/*", "*/"),), "quotes": ('"', "'", "`"), "multiline": ("`",)},
+    "rust": {"line": ("//",), "block": (("/*", "*/"),), "quotes": ('"',), "multiline": ('"',)},
+    "php": {"line": ("//", "#"), "block": (("/*", "*/"),), "quotes": ('"', "'", "`"), "multiline": ('"', "'", "`"), "heredoc": True},
+    "css": {"line": (), "block": (("/*", "*/"),), "quotes": ('"', "'"), "multiline": ()},
+    "scss": {"line": ("//",), "block": (("/*", "*/"),), "quotes": ('"', "'"), "multiline": ()},
+    "python": {"line": ("#",), "block": (), "quotes": ('"""', "'''", '"', "'"), "multiline": ('"""', "'''"), "docstrings": True},
+    "sql": {"line": ("--",), "block": (("/*", "*/"),), "quotes": ('"', "'"), "multiline": ('"', "'")},
+    "markup": {"line": (), "block": (("<!--", "-->"),), "quotes": (), "multiline": ()},
+    # "#" n'ouvre un commentaire qu'en debut de ligne ou apres un blanc ($#, ${#x}...) ; indentation significative.
+    "hash": {"line": ("#",), "block": (), "quotes": ('"', "'"), "multiline": ('"', "'"), "hash_ws": True, "keep_indent": True},
+    # Un guillemet n'ouvre une chaine qu'en debut de valeur ("title: it's mine" reste du texte), sur une seule ligne.
+    "yaml": {"line": ("#",), "block": (), "quotes": ('"', "'"), "multiline": (), "hash_ws": True, "keep_indent": True, "value_quotes": True},
+}
+_STRIP_FAMILY = {
+    **dict.fromkeys(("javascript", "typescript", "tsx", "jsx", "java", "kotlin", "groovy", "c", "cpp", "objectivec"), "c"),
+    **dict.fromkeys(("swift", "csharp", "go", "dart", "scala", "protobuf"), "c"),
+    "rust": "rust",
+    "php": "php",
+    "css": "css",
+    "scss": "scss",
+    "python": "python",
+    "sql": "sql",
+    **dict.fromkeys(("html", "xml", "vue", "svelte", "twig", "astro"), "markup"),
+    "yaml": "yaml",
+    **dict.fromkeys(("toml", "bash", "ruby", "perl", "r", "julia", "powershell", "graphql"), "hash"),
+}
+STRIP_HOLD = 4  # plus long jeton ("<!--") : un jeton coupe entre deux morceaux attend le suivant
+STRIP_INDENT = 4
+STRIP_HEREDOC_HOLD = 256  # en-tete "<<<ID" attendu au plus sur autant de caracteres
+_STRIP_HEREDOC_RE = re.compile(r"<<<[ \t]*([\"']?)([A-Za-z_][A-Za-z0-9_]*)\1(?=\r?\n)")
+_STRIP_YAML_VALUE_START = ("", ":", "-", "[", "{", ",", "?")
+
+class _StripTransform:
+    """Allegement en flux (commentaires, docstrings, lignes vides, indentation), l'etat etant garde d'un morceau a l'autre."""
+
+    def __init__(self, lang: str, comments: bool = True, docstrings: bool = True, blank: bool = True, indent: bool = True):
+        family = _STRIP_FAMILY.get(lang)
+        spec = _STRIP_SYNTAX.get(family or "", {})
+        self.spec = spec
+        self.comments = comments and bool(spec)
+        self.docstrings = docstrings and bool(spec.get("docstrings"))
+        self.blank = blank
+        self.indent = indent and bool(spec) and not spec.get("keep_indent")
+        tokens = sorted(
+            (*spec.get("line", ()), *(o for o, _c in spec.get("block", ())), *spec.get("quotes", ()), *(("<<<",) if spec.get("heredoc") else ())),
+            key=len,
+            reverse=True,
+        )
+        self._code_re = re.compile("|".join([*map(re.escape, tokens), "\n"]))
+        self._closers = dict(spec.get("block", ()))
+        self._string_res = {
+            q: re.compile(r"\\.|" + re.escape(q) + ("" if q in spec.get("multiline", ()) else "|\n"), re.S) for q in spec.get("quotes", ())
+        }
+        # None : code ; ("line", garde) ; ("block", fermeture, garde) ; ("str", guillemet, garde) ; ("heredoc", fermeture, identifiant)
+        self.state: tuple | None = None
+        self.pending = ""
+        self.prev = "\n"
+        self.line: list[str] = []
+        self.line_literal = False
+        self.line_removed = False
+        self.blank_run = 0
+        self.last_sig = ""
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def feed(self, chunk: str) -> str:
+        self.bytes_in += len(chunk.encode("utf-8", errors="replace"))
+        return self._process(self.pending + chunk, final=False)
+
+    def flush(self) -> str:
+        text = self._process(self.pending, final=True)
+        if self.line:
+            text += self._end_line(terminated=False)
+        return text
+
+    @property
+    def saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+    def _process(self, buf: str, final: bool) -> str:
+        out: list[str] = []
+        n = len(buf)
+        limit = n if final else max(0, n - STRIP_HOLD)
+        i = 0
+        hold = False
+        while i < limit:
+            state = self.state
+            if state is None:
+                m = self._code_re.search(buf, i)
+                if m is None or m.start() >= limit:
+                    self._code(buf[i:limit])
+                    i = limit
+                    break
+                self._code(buf[i : m.start()])
+                tok = m.group()
+                prev = buf[m.start() - 1] if m.start() else self.prev
+                i = m.end()
+                if tok == "\n":
+                    out.append(self._end_line())
+                elif tok in self._closers:
+                    self._open(("block", self._closers[tok], not self.comments), tok)
+                elif tok == "<<<":
+                    h = _STRIP_HEREDOC_RE.match(buf, m.start())
+                    if h is None and not final and n - m.start() < STRIP_HEREDOC_HOLD and "\n" not in buf[m.start() : n]:
+                        # En-tete coupe entre deux morceaux : on attend la fin de la ligne.
+                        i, hold = m.start(), True
+                        break
+                    if h is None:
+                        self._code(tok)
+                    else:
+                        self._code(h.group())
+                        ident = h.group(2)
+                        self.state = ("heredoc", re.compile(r"\n[ \t]*" + ident + r"(?![A-Za-z0-9_])"), ident)
+                        i = h.end()
+                elif tok in self._string_res and self.spec.get("value_quotes") and "".join(self.line).rstrip()[-1:] not in _STRIP_YAML_VALUE_START:
+                    self._code(tok)
+                elif tok in self._string_res:
+                    keep = True
+                    if self.docstrings and len(tok) == 3 and self.last_sig in ("", ":") and not "".join(self.line).strip():
+                        keep = False
+                    self.state = ("str", tok, keep)
+                    if keep:
+                        self.line.append(tok)
+                    else:
+                        self.line_removed = True
+                elif tok == "#" and buf[i : i + 1] == "!" and not self.last_sig and not "".join(self.line).strip():
+                    # Shebang : garde, sans compter comme du code (la docstring du module suit).
+                    self._open(("line", True), tok)
+                elif tok == "#" and (
+                    self.spec.get("hash_ws") and not prev.isspace() or buf[i : i + 1] == "[" and self.spec is _STRIP_SYNTAX["php"]
+                ):
+                    # "$#", "a#b" (shell), "#[" (attribut PHP) : pas un commentaire.
+                    self._code(tok)
+                else:
+                    self._open(("line", not self.comments), tok)
+            elif state[0] == "line":
+                j = buf.find("\n", i, limit)
+                end = limit if j < 0 else j
+                if state[1]:
+                    self.line.append(buf[i:end])
+                i = end
+                if j >= 0:
+                    self.state = None
+            elif state[0] == "block":
+                j = buf.find(state[1], i)
+                end = limit if j < 0 or j >= limit else j + len(state[1])
+                if state[2]:
+                    out.append(self._literal(buf[i:end], literal=False))
+                i = end
+                if 0 <= j < limit:
+                    self.state = None
+            elif state[0] == "heredoc":
+                # Corps de heredoc/nowdoc recopie tel quel jusqu'a la ligne "ID" (indentee ou suivie de ";", ",", ")").
+                m = state[1].search(buf, i)
+                if m is not None and (m.end() < n or final):
+                    out.append(self._literal(buf[i : m.end()], literal=True))
+                    self.last_sig = state[2][-1]
+                    self.state = None
+                    i = m.end()
+                    continue
+                k = buf.rfind("\n", i, n)
+                rest = buf[k + 1 :].lstrip(" \t") if k >= 0 else ""
+                if k >= 0 and not final and (m is not None or (len(rest) <= len(state[2]) and state[2].startswith(rest))):
+                    # Fermeture peut-etre coupee entre deux morceaux : on repart de sa fin de ligne.
+                    out.append(self._literal(buf[i:k], literal=True))
+                    i, hold = k, True
+                    break
+                out.append(self._literal(buf[i:limit], literal=True))
+                i = limit
+                break
+            else:
+                quote, keep = state[1], state[2]
+                m = self._string_res[quote].search(buf, i)
+                if m is None or m.start() >= limit:
+                    if keep:
+                        out.append(self._literal(buf[i:limit], literal=True))
+                    i = limit
+                    break
+                tok = m.group()
+                if tok == "\n":
+                    # Chaine non terminee en fin de ligne : on repasse en code.
+                    end = m.start()
+                    self.state = None
+                elif tok == quote:
+                    end = m.end()
+                    self.state = None
+                else:
+                    end = m.end()
+                if keep:
+                    out.append(self._literal(buf[i:end], literal=True))
+                    if self.state is None:
+                        self.last_sig = quote[-1]
+                i = end
+        # Un jeton commence avant la limite peut la depasser : on repart apres lui.
+        stop = i if hold else max(i, limit)
+        if stop:
+            self.prev = buf[stop - 1]
+        self.pending = buf[stop:]
+        text = "".join(out)
+        self.bytes_out += len(text.encode("utf-8", errors="replace"))
+        return text
+
+    def _open(self, state: tuple, tok: str) -> None:
+        self.state = state
+        if state[-1]:
+            self.line.append(tok)
+        else:
+            self.line_removed = True
+
+    def _code(self, text: str) -> None:
+        if text:
+            self.line.append(text)
+            stripped = text.rstrip()
+            if stripped:
+                self.last_sig = stripped[-1]
+
+    def _literal(self, text: str, literal: bool) -> str:
+        """Texte conserve d'une chaine ou d'un commentaire, fins de ligne comprises."""
+        parts = text.split("\n")
+        out: list[str] = []
+        for part in parts[:-1]:
+            self.line.append(part)
+            out.append(self._end_line())
+            self.line_literal = literal
+        self.line.append(parts[-1])
+        return "".join(out)
+
+    def _end_line(self, terminated: bool = True) -> str:
+        line = "".join(self.line)
+        self.line = []
+        literal, removed = self.line_literal, self.line_removed
+        self.line_literal = self.line_removed = False
+        eol = "\n" if terminated else ""
+        if literal:
+            self.blank_run = 0
+            return line + eol
+        if self.blank:
+            line = line.rstrip()
+        if not line.strip():
+            if removed:
+                return ""
+            self.blank_run += 1
+            return "" if self.blank and self.blank_run > 1 else line + eol
+        self.blank_run = 0
+        if self.indent:
+            body = line.lstrip(" \t")
+            width = len(line[: len(line) - len(body)].expandtabs(STRIP_INDENT))
+            tabs, spaces = divmod(width, STRIP_INDENT)
+            line = "\t" * tabs + " " * spaces + body
+        return line + eol
+
+LOC_CACHE_KIND = "loc:2"
+LOC_CHARS_PER_TOKEN = 4  # estimation courante pour du code et de l'anglais
+LOC_DIR_DEPTH = 2  # "src/Controller" : regroupement par dossier du panneau
+LOC_FIELDS = ("fichiers", "code", "commentaires", "vides", "tokens")
+
+class _LineTally:
+    """Compte en flux les lignes non vides, les lignes vides et leurs caracteres (hors blancs de bord)."""
+
+    __slots__ = ("tail", "lines", "blank", "chars")
+
+    def __init__(self):
+        self.tail = ""
+        self.lines = self.blank = self.chars = 0
+
+    def feed(self, text: str) -> None:
+        parts = (self.tail + text).split("\n")
+        self.tail = parts.pop()
+        for line in parts:
+            stripped = line.strip()
+            if stripped:
+                self.lines += 1
+                self.chars += len(stripped) + 1
+            else:
+                self.blank += 1
+
+    def flush(self) -> None:
+        if self.tail.strip():
+            self.feed("\n")
+
+def _loc_stats_file(path: str) -> tuple[str, list[int] | None]:
+    """(chemin, [code, commentaires, vides, tokens]) facon cloc ; une ligne videe par _StripTransform est un commentaire."""
+    p = Path(path)
+    tally = _LineTally()
+    code = _LineTally()
+    lang = _lang_for(p)
+    transform = _StripTransform(lang, comments=True, docstrings=True, blank=False, indent=False) if _STRIP_FAMILY.get(lang) else None
+    try:
+        for chunk in _chunks(p):
+            tally.feed(chunk)
+            if transform is not None:
+                code.feed(transform.feed(chunk))
+    except Exception:
+        return path, None
+    tally.flush()
+    if transform is None:
+        code = tally
+    else:
+        code.feed(transform.flush())
+        code.flush()
+    comments = max(0, tally.lines - code.lines)
+    return path, [code.lines, comments, tally.blank, -(-tally.chars // LOC_CHARS_PER_TOKEN)]
+
+def _loc_stats(
+    root: Path,
+    files: Sequence[Path],
+    cancel: threading.Event | None = None,
+    cache: _FileCache | None = None,
+) -> dict[Path, list[int] | None] | None:
+    return _cached_file_map(root, files, LOC_CACHE_KIND, _loc_stats_file, cancel, cache)  # type: ignore[return-value]
+
+class _LocTally:
+    def __init__(self, root: Path):
+        self.root = root
+        self.members: set[str] = set()
+        self.by_ext: dict[str, list[int]] = defaultdict(lambda: [0] * len(LOC_FIELDS))
+        self.by_dir: dict[str, list[int]] = defaultdict(lambda: [0] * len(LOC_FIELDS))
+        self.total = [0] * len(LOC_FIELDS)
+
+    def _keys(self, fp: Path) -> tuple[str, str]:
+        try:
+            parts = fp.relative_to(self.root).parts[:-1]
+        except ValueError:
+            parts = ()
+        return _ext_key(fp) or "(sans extension)", "/".join(parts[:LOC_DIR_DEPTH]) or "."
+
+    def _add(self, fp: Path, stats: Sequence[int], sign: int) -> None:
+        row = (sign, *(sign * n for n in stats))
+        ext, d = self._keys(fp)
+        for target in (self.by_ext[ext], self.by_dir[d], self.total):
+            for i, n in enumerate(row):
+                target[i] += n
+
+    def update(self, iids: Iterable[str], stats: dict[Path, list[int] | None]) -> None:
+        """Ramene l'ensemble a iids (chemins des lignes de la liste) ; les fichiers sans statistiques sont ignores."""
+        wanted = set(iids)
+        for sign, changed in ((-1, self.members - wanted), (1, wanted - self.members)):
+            for iid in changed:
+                found = stats.get(Path(iid))
+                if found:
+                    self._add(Path(iid), found, sign)
+        self.members = wanted
+
+    def rows(self, by: str) -> list[tuple[str, list[int]]]:
+        """(cle, [fichiers, code, commentaires, vides, tokens]) par tokens decroissants."""
+        table = self.by_ext if by == "ext" else self.by_dir
+        return sorted(((key, row) for key, row in table.items() if row[0] > 0), key=lambda item: (-item[1][4], item[0]))
+
+BLOB_MIN_CHARS = 256  # base64 / hexadecimal nus
+BLOB_DATA_MIN_CHARS = 64  # contenu d'une URI data:
+BLOB_SVG_MIN_CHARS = 1024
+BLOB_SVG_MAX_CHARS = 1 << 20  # un <svg> n'est remplace que si sa fermeture arrive avant
+BLOB_JSON_MIN_CHARS = 1024  # JSON minifie dans une chaine
+BLOB_HOLD = 128  # fin de tampon gardee tant qu'un debut de blob ("data:...;base64,") peut y etre coupe
+_BLOB_START_RE = re.compile(
+    r"(?P<data>\bdata:[\w.+-]+/[\w.+-]+(?:;[\w.+-]+(?:=[\w.+-]+)?)*,)"
+    r"|(?P<svg>(?i:<svg)(?=[\s>/]))"
+    r"|(?P<json>['\"`])(?=\{\\?\"|\[\{|\[\\?\")"
+    r"|(?P<b64>[A-Za-z0-9+/]{40})"
+)
+_BLOB_B64_RE = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+_BLOB_B64_CONT_RE = re.compile(r"\r?\n[ \t]*(?=[A-Za-z0-9+/]{16})")
+_BLOB_DATA_RES = {True: re.compile(r"[A-Za-z0-9+/=]*"), False: re.compile(r"[^\"')\s<>]*")}
+_BLOB_SVG_END_RE = re.compile(r"</svg\s*>", re.I)
+_BLOB_STRING_RES = {
+    q: re.compile(rf"[^\\{q}{nl}]*(?:\\.[^\\{q}{nl}]*)*", re.S) for q, nl in (("'", r"\n"), ('"', r"\n"), ("`", ""))
+}
+_BLOB_HEX = frozenset("0123456789abcdefABCDEF")
+_BLOB_B64_TABLE = bytes(
+    0x61 if chr(b).isascii() and (chr(b).isalnum() or chr(b) in "+/") else 0x20 for b in range(256)
+)
+
+# L'alternative de _BLOB_START_RE est lente a balayer : on saute de litteral en litteral, la regex ne fait que valider.
+class _BlobStarts:
+    __slots__ = ("buf", "needles", "next")
+
+    def __init__(self, buf: str):
+        self.buf = buf
+        raw = buf.encode("ascii", errors="replace")
+        runs = raw.translate(_BLOB_B64_TABLE)
+        # (texte, litteral, decalage du debut de correspondance avant le litteral)
+        self.needles = (
+            (raw, b"data:", 0), (raw.lower(), b"<svg", 0), (runs, b"a" * 40, 0),
+            (raw, b'{"', 1), (raw, b'{\\"', 1), (raw, b"[{", 1), (raw, b'["', 1), (raw, b'[\\"', 1),
+        )
+        self.next = [-2] * len(self.needles)
+
+    def search(self, pos: int) -> re.Match | None:
+        while True:
+            best = -1
+            for k, (hay, needle, shift) in enumerate(self.needles):
+                at = self.next[k]
+                if at != -1 and at < pos:
+                    found = hay.find(needle, pos + shift)
+                    at = self.next[k] = found - shift if found != -1 else -1
+                if at != -1 and (best == -1 or at < best):
+                    best = at
+            if best == -1:
+                return None
+            m = _BLOB_START_RE.match(self.buf, best)
+            if m is not None:
+                return m
+            pos = best + 1
+
+class _BlobFilter:
+    """Remplacement en flux des blobs (base64, hex, data:, <svg>, JSON embarque) ; count et removed les comptent."""
+
+    def __init__(self):
+        self.buf = ""
+        self.count = 0
+        self.removed = 0
+        # blob en cours : type, etat ("pending", "blob", "plain"), morceaux gardes, longueur, hash...
+        self.kind: str | None = None
+        self.state = ""
+        self.parts: list[str] = []
+        self.length = 0
+        self.hasher = None
+        self.label = ""
+        self.quote = ""
+        self.base64 = False
+        self.segment = 0
+
+    def feed(self, chunk: str) -> str:
+        self.buf += chunk
+        return self._scan(final=False)
+
+    def flush(self) -> str:
+        return self._scan(final=True)
+
+    def _scan(self, final: bool) -> str:
+        buf, pos, out = self.buf, 0, []
+        starts = _BlobStarts(buf)
+        while True:
+            if self.kind is not None:
+                pos, done = self._continue(buf, pos, final, out)
+                if not done:
+                    break
+                continue
+            m = starts.search(pos)
+            if m is None or (not final and m.end() > len(buf) - 8):
+                cut = len(buf) if final else max(pos, len(buf) - BLOB_HOLD)
+                if m is not None:
+                    cut = min(cut, m.start())
+                out.append(buf[pos:cut])
+                pos = cut
+                break
+            out.append(buf[pos:m.start()])
+            pos = self._start(m, out)
+        self.buf = buf[pos:]
+        return "".join(out)
+
+    def _start(self, m: re.Match, out: list[str]) -> int:
+        self.kind = m.lastgroup
+        self.state, self.parts, self.length, self.hasher, self.segment = "pending", [], 0, None, 0
+        if self.kind == "data":
+            out.append(m.group())  # le prefixe "data:type;base64," reste lisible
+            self.base64 = ";base64," in m.group().lower()
+            return m.end()
+        if self.kind == "json":
+            out.append(m.group())
+            self.quote = m.group()
+            return m.end()
+        return m.start()
+
+    def _continue(self, buf: str, pos: int, final: bool, out: list[str]) -> tuple[int, bool]:
+        """Avance dans le blob courant ; (position, termine ?), termine False s'il faut la suite du flux."""
+        n = len(buf)
+        if self.kind == "svg":
+            m = _BLOB_SVG_END_RE.search(buf, pos)
+            if m is None:
+                end = n if final else max(pos, n - 8)
+                self._take(buf[pos:end], out)
+                if final:
+                    self._end(out, closed=False)
+                return end, final
+            self._take(buf[pos:m.end()], out)
+            self._end(out)
+            return m.end(), True
+        if self.kind == "json":
+            end = _BLOB_STRING_RES[self.quote].match(buf, pos).end()
+            self._take(buf[pos:end], out)
+            if end >= n - 1 and not final:  # fin du tampon, ou "\" dont on ne voit pas la suite
+                return end, False
+            self._end(out)
+            return end, True
+        rx = _BLOB_B64_RE if self.kind == "b64" else _BLOB_DATA_RES[self.base64]
+        while True:
+            end = rx.match(buf, pos).end()
+            self._take(buf[pos:end], out)
+            self.segment += end - pos
+            pos = end
+            if pos == n and not final:
+                return pos, False
+            if self.kind != "b64" or self.segment < 40 or buf[pos - 1] == "=":
+                break
+            # Base64 coupe en lignes (PEM, YAML) : la ligne suivante continue le blob.
+            cont = _BLOB_B64_CONT_RE.match(buf, pos)
+            if cont is None:
+                if not final and n - pos < BLOB_HOLD and buf[pos] in "\r\n":
+                    return pos, False
+                break
+            self._take(buf[pos:cont.end()], out)
+            self.segment = 0
+            pos = cont.end()
+        self._end(out)
+        return pos, True
+
+    def _threshold(self) -> int:
+        return {"b64": BLOB_MIN_CHARS, "data": BLOB_DATA_MIN_CHARS}.get(self.kind, BLOB_JSON_MIN_CHARS)  # type: ignore[arg-type]
+
+    def _take(self, text: str, out: list[str]) -> None:
+        if not text:
+            return
+        self.length += len(text)
+        if self.state == "blob":
+            self.hasher.update(text.encode("utf-8", errors="replace"))  # type: ignore[union-attr]
+            return
+        if self.state == "plain":
+            out.append(text)
+            return
+        self.parts.append(text)
+        if self.kind == "svg":
+            # Sans fermeture en vue, ce n'etait peut-etre pas un element : rien n'est remplace.
+            if self.length > BLOB_SVG_MAX_CHARS:
+                self.state = "plain"
+                out.append("".join(self.parts))
+                self.parts = []
+            return
+        if self.length < self._threshold():
+            return
+        held = "".join(self.parts)
+        self.parts = []
+        if self.kind == "b64":
+            chars = set("".join(held.split()))
+            digits = any(c.isdigit() for c in chars)
+            is_hex = chars <= _BLOB_HEX and digits and any(c.isalpha() for c in chars)
+            if not is_hex and not (digits and any(c.isupper() for c in chars) and any(c.islower() for c in chars)):
+                self.state = "plain"
+                out.append(held)
+                return
+            self.label = "hex" if is_hex else "base64"
+        else:
+            self.label = self.kind  # type: ignore[assignment]
+        import hashlib
+
+        self.state = "blob"
+        self.hasher = hashlib.sha1(held.encode("utf-8", errors="replace"))
+
+    def _end(self, out: list[str], closed: bool = True) -> None:
+        if self.kind == "svg" and self.state == "pending" and closed and self.length >= BLOB_SVG_MIN_CHARS:
+            import hashlib
+
+            self.state, self.label = "blob", "svg"
+            self.hasher = hashlib.sha1("".join(self.parts).encode("utf-8", errors="replace"))
+        if self.state == "blob":
+            placeholder = f"[blob {self.label} {self.length} car., sha1 {self.hasher.hexdigest()[:12]}]"  # type: ignore[union-attr]
+            out.append(placeholder)
+            self.count += 1
+            self.removed += max(0, self.length - len(placeholder))
+        elif self.state == "pending":
+            out.append("".join(self.parts))
+        self.kind, self.parts, self.hasher = None, [], None
+
+SHARED_BLOCK_MIN_LINES = 3
+SHARED_BLOCK_MIN_CHARS = 100
+SHARED_BLOCK_MAX_LINES = 200
+SHARED_BLOCK_WINDOW = 64 << 10  # octets lus en tete et en queue de chaque fichier
+_SHARED_BLOCK_LINE_RE = re.compile(r"\s*(?:$|#|//|/\*|\*|<!--|-->|--|;|REM\b|::)")
+_HASH_MASK = (1 << 64) - 1
+
+class _SharedBlock:
+    """Bloc de lignes (commentaires : licence, bandeau genere) repete en tete ou en queue de plusieurs fichiers."""
+
+    __slots__ = ("number", "where", "lines", "count", "lang")
+
+    def __init__(self, number: int, where: str, lines: list[str], count: int, lang: str):
+        self.number = number
+        self.where = where
+        self.lines = lines
+        self.count = count
+        self.lang = lang
+
+    @property
+    def ref(self) -> str:
+        return f"[bloc commun #{self.number} : {len(self.lines)} lignes, voir \"Blocs communs\"]"
+
+def _edge_windows(fp: Path) -> tuple[list[str], list[str]]:
+    """Premieres et dernieres lignes du fichier (sans fin de ligne), lues par fenetres bornees."""
+    try:
+        with fp.open("rb") as f:
+            head = f.read(SHARED_BLOCK_WINDOW)
+            size = f.seek(0, os.SEEK_END)
+            if size <= SHARED_BLOCK_WINDOW:
+                tail = b""
+            else:
+                f.seek(max(SHARED_BLOCK_WINDOW, size - SHARED_BLOCK_WINDOW))
+                tail = f.read()
+    except OSError:
+        return [], []
+    head_lines = head.decode("utf-8", errors="replace").removeprefix("\ufeff").split("\n")
+    if not tail:
+        lines = [line.rstrip("\r") for line in head_lines]
+        if lines and not lines[-1]:
+            lines.pop()
+        return lines, lines
+    head_lines.pop()  # ligne coupee par la fenetre
+    tail_lines = tail.decode("utf-8", errors="replace").split("\n")[1:]
+    if tail_lines and not tail_lines[-1]:
+        tail_lines.pop()
+    return [line.rstrip("\r") for line in head_lines], [line.rstrip("\r") for line in tail_lines]
+
+def _edge_candidates(lines: Sequence[str]) -> list[tuple[int, int]]:
+    """(hash roulant, nb de caracteres) de chaque prefixe de la serie de commentaires en tete de lines."""
+    out: list[tuple[int, int]] = []
+    h = chars = 0
+    for k, line in enumerate(lines[:SHARED_BLOCK_MAX_LINES], 1):
+        if not _SHARED_BLOCK_LINE_RE.match(line):
+            break
+        h = (h * 1000003 ^ hash(line)) & _HASH_MASK
+        chars += len(line) + 1
+        # Un bloc ne finit pas sur une ligne vide : elle reste dans le fichier.
+        out.append((h, chars) if line.strip() else (0, 0))
+    return out
+
+def _shared_blocks(
+    root: Path, files: Sequence[Path], cancel: threading.Event | None = None
+) -> tuple[list[_SharedBlock], dict[Path, tuple[int, _SharedBlock | None, _SharedBlock | None]]] | None:
+    """Blocs de tete et de queue communs (hash roulant) ; (blocs, fichier -> (decalage, tete, queue)), None si annule."""
+    counts: Counter = Counter()
+    per_file: dict[Path, tuple[int, list[tuple[int, int]], list[tuple[int, int]]]] = {}
+    for fp in files:
+        if cancel is not None and cancel.is_set():
+            return None
+        head, tail = _edge_windows(fp)
+        # Un "<?php" initial reste en place, le bloc commence apres lui.
+        offset = 1 if head and head[0].strip() == "<?php" else 0
+        heads = _edge_candidates(head[offset:])
+        start = offset + len(heads) if head is tail else 0
+        tails = _edge_candidates(tail[start:][::-1])
+        for k, (h, _chars) in enumerate(heads, 1):
+            if h and k >= SHARED_BLOCK_MIN_LINES:
+                counts["h", k, h] += 1
+        for k, (h, _chars) in enumerate(tails, 1):
+            if h and k >= SHARED_BLOCK_MIN_LINES:
+                counts["t", k, h] += 1
+        if heads or tails:
+            per_file[fp] = (offset, heads, tails)
+
+    def best(where: str, candidates: list[tuple[int, int]]) -> tuple | None:
+        for k in range(len(candidates), SHARED_BLOCK_MIN_LINES - 1, -1):
+            h, chars = candidates[k - 1]
+            if h and chars >= SHARED_BLOCK_MIN_CHARS and counts[where, k, h] >= 2:
+                return where, k, h
+        return None
+
+    chosen: dict[Path, tuple[int, tuple | None, tuple | None]] = {}
+    owners: dict[tuple, Path] = {}
+    for fp, (offset, heads, tails) in per_file.items():
+        keys = (best("h", heads), best("t", tails))
+        if keys != (None, None):
+            chosen[fp] = (offset, *keys)
+            for key in keys:
+                if key is not None:
+                    owners.setdefault(key, fp)
+    blocks: dict[tuple, _SharedBlock] = {}
+    for key, fp in sorted(owners.items(), key=lambda item: (item[0][0] != "h", -counts[item[0]])):
+        where, k, _h = key
+        head, tail = _edge_windows(fp)
+        offset = chosen[fp][0]
+        lines = head[offset : offset + k] if where == "h" else tail[len(tail) - k :]
+        blocks[key] = _SharedBlock(len(blocks) + 1, "tete" if where == "h" else "queue", lines, 0, _lang_for(fp))
+    assign: dict[Path, tuple[int, _SharedBlock | None, _SharedBlock | None]] = {}
+    for fp, (offset, head_key, tail_key) in chosen.items():
+        head_block, tail_block = blocks.get(head_key), blocks.get(tail_key)  # type: ignore[arg-type]
+        for block in (head_block, tail_block):
+            if block is not None:
+                block.count += 1
+        assign[fp] = (offset, head_block, tail_block)
+    return list(blocks.values()), assign
+
+def _without_shared_blocks(
+    lines: Iterator[str], offset: int, head: _SharedBlock | None, tail: _SharedBlock | None, removed: list[int] | None = None
+) -> Iterator[str]:
+    """Lignes du fichier avec ses blocs communs remplaces par leur reference (verifies ligne a ligne)."""
+    if head is not None:
+        first = [next(lines, "") for _ in range(offset + len(head.lines))]
+        if [line.rstrip("\r\n") for line in first[offset:]] == head.lines:
+            yield from first[:offset]
+            yield head.ref + "\n"
+            # Lignes de tete en moins : les numeros de ligne suivants en sont decales.
+            if removed is not None:
+                removed.append(len(head.lines) - 1)
+        else:
+            yield from first
+    if tail is None:
+        yield from lines
+        return
+    window: deque[str] = deque()
+    size = len(tail.lines)
+    for line in lines:
+        if len(window) == size:
+            yield window.popleft()
+        window.append(line)
+    if [line.rstrip("\r\n") for line in window] == tail.lines:
+        yield tail.ref + ("\n" if window and window[-1].endswith("\n") else "")
+    else:
+        yield from window
+
+def _emit_file(
+    write: Callable[[str], object],
+    fp: Path,
+    rel: str,
+    i: int,
+    total: int,
+    options: _ExportOptions,
+    rx: re.Pattern | None = None,
+    cancel: threading.Event | None = None,
+    skeleton: str | None = None,
+    lean: list[tuple[str, int, int]] | None = None,
+    shared: tuple[int, _SharedBlock | None, _SharedBlock | None] | None = None,
+    duplicate: tuple[Path, bool] | None = None,
+    root: Path | None = None,
+    truncated: list[tuple[str, int, int, bool]] | None = None,
+    summary: list | None = None,
+    notebook: list[str] | None = None,
+    blobs: list[tuple[str, int, int]] | None = None,
+    i18n: _I18nDiff | None = None,
+) -> int:
+    """Ecrit le bloc d'un fichier et retourne le nombre de blocs ecrits ; _ExportCancelled si annule."""
+    lang = _lang_for(fp)
+    if duplicate is not None:
+        canon, exact = duplicate
+        try:
+            canon_rel = canon.relative_to(root).as_posix() if root else canon.as_posix()
+        except ValueError:
+            canon_rel = canon.as_posix()
+        if exact:
+            write(f"### {i}/{total} - {rel} [identique a {canon_rel}]\n\n")
+            return 1
+        diff = _near_duplicate_diff(canon, fp, canon_rel, rel)
+        if diff is not None:
+            write(f"### {i}/{total} - {rel} [proche de {canon_rel}, diff]\n{'-'*80}\n```diff\n{diff}```\n\n")
+            return 1
+    if i18n is not None:
+        try:
+            ref_rel = i18n.reference.relative_to(root).as_posix() if root else i18n.reference.as_posix()
+        except ValueError:
+            ref_rel = i18n.reference.as_posix()
+        write(f"### {i}/{total} - {rel} [traduction, ecarts avec {ref_rel}]\n{'-'*80}\n```text\n{i18n.render(ref_rel)}\n```\n\n")
+        return 1
+    if summary is not None:
+        write(f"### {i}/{total} - {rel} [resume]\n{'-'*80}\n")
+        for part_lang, text in summary:
+            write(f"```{part_lang}\n{text}\n```\n\n")
+        return 1
+    if notebook is not None:
+        lang = notebook[0]
+    transform = options.transform(lang)
+    blob_filter = options.blob_filter()
+    if skeleton is not None or rx is None or not options.excerpt:
+        if skeleton is not None:
+            write(f"### {i}/{total} - {rel} [squelette]\n{'-'*80}\n")
+            source: Iterable[str] = (skeleton, "\n")
+        elif notebook is not None:
+            write(f"### {i}/{total} - {rel} [notebook]\n{'-'*80}\n")
+            source = (notebook[1],)
+        else:
+            write(f"### {i}/{total} - {rel}\n{'-'*80}\n")
+            source = _chunks(fp)
+        head_removed: list[int] = []
+        if shared is not None and notebook is None:
+            lines = iter(f"{skeleton}\n".splitlines(True)) if skeleton is not None else _iter_lines(fp)
+            source = _without_shared_blocks(lines, *shared, removed=head_removed)
+        write(f"```{lang}\n")
+
+        def stream() -> Iterator[str]:
+            # Les blobs sont retires avant l'allegement : une chaine base64 n'a rien d'un commentaire.
+            for c in source:
+                if cancel and cancel.is_set():
+                    raise _ExportCancelled
+                if blob_filter:
+                    c = blob_filter.feed(c)
+                yield transform.feed(c) if transform else c
+            if blob_filter:
+                c = blob_filter.flush()
+                yield transform.feed(c) if transform else c
+            if transform:
+                yield transform.flush()
+
+        # La troncature porte sur le texte allege : le marqueur d'elision n'est jamais retire.
+        max_lines = options.truncation_for(fp) if skeleton is None else None
+        body = stream()
+        elided: list[int] = []
+        if max_lines is not None:
+            body = _head_tail(_split_lines(body), options.head_lines, options.tail_lines, max_lines, elided)
+        for c in body:
+            write(c)
+        if transform and lean is not None:
+            lean.append((rel, transform.bytes_in, transform.bytes_out))
+        if elided and truncated is not None:
+            # Sans allegement ni notebook, les numeros sont ceux du fichier source.
+            exact = transform is None and blob_filter is None and notebook is None
+            truncated.append((rel, options.head_lines + 1 + sum(head_removed), elided[0], exact))
+        if blob_filter and blob_filter.count and blobs is not None:
+            blobs.append((rel, blob_filter.count, blob_filter.removed))
+        write("```\n\n" if skeleton is not None or notebook is not None else "\n```\n\n")
+        return 1
+
+    ctx = options.context
+    windows = 0
+
+    def flush(start: int, lines: list[str]) -> None:
+        nonlocal windows
+        windows += 1
+        write(f"### {i}/{total} - {rel}:{start}-{start + len(lines) - 1}\n{'-'*80}\n")
+        write(f"```{lang}\n")
+        for n, line in enumerate(lines, start):
+            if not line.endswith("\n"):
+                line += "\n"
+            write(f"{n:>6} | {line}")
+        write("```\n\n")
+
+    # tail : dernieres lignes hors fenetre (contexte avant) ; until : fin du contexte apres.
+    tail: deque[str] = deque(maxlen=ctx)
+    cur: list[str] | None = None
+    cur_start = until = 0
+    for n, line in enumerate(_iter_lines(fp), 1):
+        if cancel and not n & 0xFFF and cancel.is_set():
+            raise _ExportCancelled
+        if rx.search(line):
+            if cur is not None and n - ctx <= until + 1:
+                cur.extend(tail)
+            else:
+                if cur is not None:
+                    flush(cur_start, cur)
+                cur, cur_start = [], n - len(tail)
+                cur.extend(tail)
+            tail.clear()
+            cur.append(line)
+            until = n + ctx
+        elif cur is not None and n <= until:
+            cur.append(line)
+        else:
+            tail.append(line)
+            if cur is not None and n > until + ctx:
+                # Plus aucune fusion possible avec la fenetre courante : je l'ecris tout de suite.
+                flush(cur_start, cur)
+                cur = None
+    if cur is not None:
+        flush(cur_start, cur)
+    return windows
+
+class _ExportPlan:
+    __slots__ = ("skeletons", "blocks", "shared_of", "duplicates", "summaries", "notebooks", "translations", "apis")
+
+    def __init__(self, skeletons, blocks, shared_of, duplicates, summaries, notebooks, translations, apis):
+        self.skeletons: dict[Path, str | None] = skeletons
+        self.blocks: list[_SharedBlock] = blocks
+        self.shared_of: dict[Path, tuple[int, _SharedBlock | None, _SharedBlock | None]] = shared_of
+        self.duplicates: dict[Path, tuple[Path, bool]] = duplicates
+        self.summaries: dict[Path, list | None] = summaries
+        self.notebooks: dict[Path, list[str] | None] = notebooks
+        self.translations: dict[Path, _I18nDiff] = translations
+        self.apis: list[_DependencyApi] = apis
+
+    def restrict(self, files: Sequence[Path]) -> "_ExportPlan":
+        """Part d'un export par module : renvois (doublon, traduction) internes au module, API des dependances a part."""
+        kept = set(files)
+        shared_of = {fp: self.shared_of[fp] for fp in files if fp in self.shared_of}
+        counts: Counter = Counter(id(b) for _offset, *pair in shared_of.values() for b in pair if b is not None)
+        blocks = {
+            id(b): _SharedBlock(b.number, b.where, b.lines, counts[id(b)], b.lang) for b in self.blocks if counts[id(b)]
+        }
+        shared_of = {
+            fp: (offset, blocks.get(id(head)) if head else None, blocks.get(id(tail)) if tail else None)
+            for fp, (offset, head, tail) in shared_of.items()
+        }
+        return _ExportPlan(
+            self.skeletons, list(blocks.values()), shared_of,
+            {fp: dup for fp, dup in self.duplicates.items() if fp in kept and dup[0] in kept},
+            self.summaries, self.notebooks,
+            {fp: diff for fp, diff in self.translations.items() if fp in kept and diff.reference in kept},
+            [],
+        )
+
+def _prepare_export(
+    root: Path, files_sorted: Sequence[Path], options: _ExportOptions, cancel: threading.Event | None = None
+) -> _ExportPlan:
+    skeletons = _export_skeletons(root, files_sorted, options, cancel)
+    shared = _export_shared_blocks(root, files_sorted, options, cancel)
+    duplicates = _export_duplicates(root, files_sorted, options, cancel)
+    summaries = _export_summaries(root, files_sorted, options, cancel)
+    notebooks = _export_notebooks(root, files_sorted, options, cancel)
+    translations = _export_i18n(root, files_sorted, options, cancel)
+    apis = _export_dependency_api(root, files_sorted, options, cancel)
+    if (
+        skeletons is None or shared is None or duplicates is None or summaries is None or notebooks is None
+        or translations is None or apis is None
+    ):
+        raise _ExportCancelled()
+    return _ExportPlan(skeletons, *shared, duplicates, summaries, notebooks, translations, apis)
+
+def _render_export(
+    write: Callable[[str], object],
+    root: Path,
+    files_sorted: Sequence[Path],
+    options: _ExportOptions,
+    plan: _ExportPlan,
+    cancel: threading.Event | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> int:
+    """Ecrit l'export structure (introduction, fichiers, sections finales) ; renvoie le nombre de fichiers ecrits."""
+    rx = _grep_pattern(options.query, options.regex, options.case_sensitive) if options.excerpt else None
+    total = len(files_sorted)
+    write(_compose_structured_intro(root, files_sorted, options, plan.blocks) + "\n")
+    written = 0
+    lean: list[tuple[str, int, int]] = []
+    truncated: list[tuple[str, int, int, bool]] = []
+    blobs: list[tuple[str, int, int]] = []
+    for i, fp in enumerate(files_sorted, 1):
+        if cancel and cancel.is_set():
+            raise _ExportCancelled()
+        try:
+            rel = fp.relative_to(root).as_posix()
+        except Exception:
+            rel = fp.as_posix()
+        emitted = _emit_file(
+            write, fp, rel, i, total, options, rx, cancel,
+            skeleton=plan.skeletons.get(fp), lean=lean, shared=plan.shared_of.get(fp), duplicate=plan.duplicates.get(fp),
+            root=root, truncated=truncated, summary=plan.summaries.get(fp), notebook=plan.notebooks.get(fp), blobs=blobs,
+            i18n=plan.translations.get(fp),
+        )
+        if emitted:
+            written += 1
+        if progress is not None:
+            progress(i, total)
+    if plan.apis:
+        write(_compose_dependency_api(root, plan.apis))
+    if lean:
+        write(_compose_lean_manifest(lean))
+    if truncated:
+        write(_compose_truncation_manifest(truncated))
+    if blobs:
+        write(_compose_blob_manifest(blobs))
+    return written
+
+def _write_export(
+    root: Path,
+    files: Sequence[Path],
+    out_: Path,
+    options: _ExportOptions,
+    cancel: threading.Event | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> int:
+    """Ecrit l'export structure de files dans out_ ; renvoie le nombre de fichiers ecrits, _ExportCancelled si annule."""
+    files_sorted = options.sort(root, files)
+    plan = _prepare_export(root, files_sorted, options, cancel)
+    out_.parent.mkdir(parents=True, exist_ok=True)
+    with out_.open("w", encoding="utf-8", newline="\n") as out:
+        return _render_export(out.write, root, files_sorted, options, plan, cancel, progress)
+
+def _export(
+    root: Path,
+    files: Sequence[Path],
+    out_: Path,
+    q: "queue.Queue",
+    cancel: threading.Event | None = None,
+    options: _ExportOptions | None = None,
+):
+    try:
+        if not files:
+            q.put(("error", "Aucun fichier selectionne."))
+            return
+        written = _write_export(root, files, out_, options or _ExportOptions(), cancel, _ProgressThrottle(q))
+        q.put(("done_export", written, out_))
+    except _ExportCancelled:
+        q.put(("cancelled", "export"))
+    except Exception as e:
+        LOGGER.exception("Echec export", exc_info=e)
+        q.put(("error", str(e)))
+
+SPLIT_MANIFESTS = {"composer.json", "package.json", "pyproject.toml", "setup.py"}
+SPLIT_MAX_BYTES = 4 << 20  # volume vise par export : un module plus gros est coupe en parties
+SPLIT_MIN_BYTES = 64 << 10  # en dessous, les modules sont regroupes
+SPLIT_WORKERS = 4
+SPLIT_INDEX_NAME = "index.md"
+SPLIT_DEPS_NAME = "api-dependances.txt"  # mode vendor "api" : une seule fois pour tous les modules
+
+class _ExportModule:
+    __slots__ = ("name", "base", "reason", "files", "size", "members", "out_name")
+
+    def __init__(self, name: str, base: str, reason: str, files: list[Path] | None = None, size: int = 0):
+        self.name = name
+        self.base = base  # dossier racine du module, relatif a la racine du projet
+        self.reason = reason
+        self.files: list[Path] = files if files is not None else []
+        self.size = size
+        self.members: list[str] = []  # modules regroupes
+        self.out_name = ""
+
+def _module_roots(root: Path, rels: Sequence[str]) -> dict[str, str]:
+    """Dossiers racines de module (relatifs) -> raison : manifeste, bundle Symfony, paquet de src/."""
+    roots: dict[str, str] = {}
+    for rel in rels:
+        parent, _, name = rel.rpartition("/")
+        if not parent:
+            continue
+        if name in SPLIT_MANIFESTS:
+            roots[parent] = "manifeste " + name
+        elif name.endswith("Bundle.php") and name != "Bundle.php":
+            roots.setdefault(parent, "bundle Symfony")
+    for rel in rels:
+        parts = rel.split("/")
+        if len(parts) >= 3 and parts[0] == "src":
+            roots.setdefault("src/" + parts[1], "paquet src/")
+    return roots
+
+def _import_clusters(root: Path, files: Sequence[Path], graph: _ImportGraph) -> list[list[Path]]:
+    """Composantes connexes (imports dans les deux sens) d'au moins deux fichiers, dans l'ordre des chemins."""
+    wanted = set(files)
+    seen: set[Path] = set()
+    clusters: list[list[Path]] = []
+    for seed in files:
+        if seed in seen:
+            continue
+        seen.add(seed)
+        stack, component = [seed], []
+        while stack:
+            fp = stack.pop()
+            component.append(fp)
+            for nxt in (*graph.deps.get(fp, ()), *graph.rdeps.get(fp, ())):
+                if nxt in wanted and nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        if len(component) > 1:
+            clusters.append(sorted(component, key=lambda p: p.relative_to(root).as_posix().casefold()))
+    return clusters
+
+def _balance_modules(
+    modules: list[_ExportModule], sizes: dict[Path, int], max_bytes: int, min_bytes: int
+) -> list[_ExportModule]:
+    """Coupe les modules de plus de max_bytes en parties voisines, regroupe ceux de moins de min_bytes."""
+    out: list[_ExportModule] = []
+    small: list[_ExportModule] = []
+    for module in modules:
+        if module.size < min_bytes:
+            small.append(module)
+            continue
+        if module.size <= max_bytes:
+            out.append(module)
+            continue
+        count = -(-module.size // max_bytes)
+        parts = [_ExportModule(module.name, module.base, module.reason) for _ in range(count)]
+        acc = 0
+        for fp in module.files:
+            size = sizes[fp]
+            # Partie choisie par le milieu du fichier : des coupes au plus pres de size/count.
+            part = parts[min(count - 1, (2 * acc + size) * count // (2 * module.size))]
+            part.files.append(fp)
+            part.size += size
+            acc += size
+        parts = [part for part in parts if part.files]
+        for n, part in enumerate(parts, 1):
+            part.name = f"{module.name} ({n}/{len(parts)})"
+        out.extend(parts)
+    # Regroupement first-fit decreasing : les plus gros petits modules d'abord.
+    bins: list[_ExportModule] = []
+    for module in sorted(small, key=lambda m: m.size, reverse=True):
+        target = next((b for b in bins if b.size + module.size <= max_bytes), None)
+        if target is None:
+            target = _ExportModule("", "", "regroupement")
+            bins.append(target)
+        target.files.extend(module.files)
+        target.size += module.size
+        target.members.append(module.name)
+    for b in bins:
+        b.members.sort(key=str.casefold)
+        if len(b.members) == 1:
+            b.name, b.reason = b.members[0], "petit module"
+            b.members = []
+        else:
+            b.name = "divers"
+    if len(bins) > 1:
+        for n, b in enumerate((b for b in bins if b.name == "divers"), 1):
+            b.name = f"divers {n}"
+    return out + bins
+
+def _split_modules(
+    root: Path,
+    files: Sequence[Path],
+    graph: _ImportGraph | None = None,
+    sizes: dict[Path, int] | None = None,
+    max_bytes: int = SPLIT_MAX_BYTES,
+) -> list[_ExportModule]:
+    """Modules de files (manifestes, bundles Symfony, paquets de src/, sinon composantes d'imports), equilibres et nommes."""
+    files = sorted(files, key=lambda p: p.relative_to(root).as_posix().casefold())
+    sizes = dict(sizes or {})
+    for fp in files:
+        if fp not in sizes:
+            try:
+                sizes[fp] = fp.stat().st_size
+            except OSError:
+                sizes[fp] = 0
+    rels = {fp: fp.relative_to(root).as_posix() for fp in files}
+    roots = _module_roots(root, list(rels.values()))
+    modules: dict[str, _ExportModule] = {}
+    if len(roots) < 2 and graph is not None:
+        clustered: set[Path] = set()
+        for cluster in _import_clusters(root, files, graph):
+            dirs = [rels[fp].rpartition("/")[0].split("/") for fp in cluster]
+            base = "/".join(os.path.commonprefix(dirs))
+            name = base or rels[cluster[0]].rpartition("/")[2]
+            key = name if name not in modules else f"{name} #{len(modules)}"
+            modules[key] = _ExportModule(key, base, "imports", list(cluster))
+            clustered.update(cluster)
+        rest = [fp for fp in files if fp not in clustered]
+        if rest:
+            modules["(racine)"] = _ExportModule("(racine)", "", "reste", rest)
+    else:
+        ordered = sorted(roots, key=len, reverse=True)
+        for fp in files:
+            rel = rels[fp]
+            base = next((d for d in ordered if rel.startswith(d + "/")), "")
+            module = modules.get(base)
+            if module is None:
+                module = modules[base] = _ExportModule(base or "(racine)", base, roots.get(base, "reste"))
+            module.files.append(fp)
+    for module in modules.values():
+        module.size = sum(sizes[fp] for fp in module.files)
+    ordered_modules = sorted(modules.values(), key=lambda m: (m.name == "(racine)", m.base.casefold(), m.name))
+    balanced = _balance_modules(ordered_modules, sizes, max_bytes, min(SPLIT_MIN_BYTES, max_bytes // 8))
+    width = len(str(len(balanced)))
+    for n, module in enumerate(balanced, 1):
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "-", module.name).strip("-.") or "racine"
+        module.out_name = f"{n:0{width}d}-{slug}.txt"
+    return balanced
+
+def _compose_split_index(
+    root: Path, modules: Sequence[_ExportModule], written: dict[str, int], graph: _ImportGraph | None, apis: int = 0
+) -> str:
+    """Fichier index d'un export par module : un export par ligne, puis les imports entre modules."""
+    try:
+        root_res = str(root.resolve())
+    except Exception:
+        root_res = str(root)
+    total = sum(len(m.files) for m in modules)
+    lines = [f"# Projet: {root.name} - export par module", f"Racine: {root_res}"]
+    lines.append(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    lines.append(f"Total: {total} fichier(s), {_human_bytes(sum(m.size for m in modules))}, {len(modules)} export(s)")
+    lines.append("")
+    lines.append("## Exports")
+    lines.append("")
+    lines.append("| Export | Module | Dossier | Detection | Fichiers | Volume |")
+    lines.append("|---|---|---|---|---|---|")
+    for m in modules:
+        what = m.name if not m.members else f"{m.name} ({', '.join(m.members)})"
+        lines.append(f"| {m.out_name} | {what} | {m.base or '.'} | {m.reason} | {written.get(m.out_name, 0)} | {_human_bytes(m.size)} |")
+    lines.append("")
+    if apis:
+        lines.append(f"API des dependances importees ({apis} paquet(s)) : {SPLIT_DEPS_NAME}")
+        lines.append("")
+    if graph is not None:
+        owner = {fp: m.out_name for m in modules for fp in m.files}
+        needs: dict[str, set[str]] = defaultdict(set)
+        for src, targets in graph.deps.items():
+            for target in targets:
+                a, b = owner.get(src), owner.get(target)
+                if a and b and a != b:
+                    needs[a].add(b)
+        if needs:
+            lines.append("## Imports entre exports")
+            lines.append("")
+            for m in modules:
+                if m.out_name in needs:
+                    lines.append(f"- {m.out_name} -> {', '.join(sorted(needs[m.out_name]))}")
+            lines.append("")
+    return "\n".join(lines) + "\n"
+
+def _export_split(
+    root: Path,
+    files: Sequence[Path],
+    out_dir: Path,
+    q: "queue.Queue",
+    cancel: threading.Event | None = None,
+    options: _ExportOptions | None = None,
+    max_bytes: int = SPLIT_MAX_BYTES,
+):
+    """Un export structure par module (_split_modules), ecrits en parallele dans out_dir, plus un index."""
+    try:
+        if not files:
+            q.put(("error", "Aucun fichier selectionne."))
+            return
+        options = options or _ExportOptions()
+        modules = _split_modules(root, files, options.graph, max_bytes=max_bytes)
+        # Empreintes, imports, traductions, API : une seule preparation pour toute la selection.
+        plan = _prepare_export(root, options.sort(root, files), options, cancel)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        throttle = _ProgressThrottle(q)
+        lock = threading.Lock()
+        done = [0]
+        total = sum(len(m.files) for m in modules)
+
+        def run(module: _ExportModule) -> int:
+            last = [0]
+
+            def progress(i: int, _total: int) -> None:
+                with lock:
+                    done[0] += i - last[0]
+                    last[0] = i
+                    throttle(done[0], total)
+
+            files_sorted = options.sort(root, module.files)
+            with (out_dir / module.out_name).open("w", encoding="utf-8", newline="\n") as out:
+                return _render_export(out.write, root, files_sorted, options, plan.restrict(files_sorted), cancel, progress)
+
+        import concurrent.futures
+
+        if plan.apis:
+            (out_dir / SPLIT_DEPS_NAME).write_text(_compose_dependency_api(root, plan.apis), encoding="utf-8", newline="\n")
+        # Threads : il ne reste qu'a lire et ecrire les fichiers de chaque module.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(SPLIT_WORKERS, len(modules))) as pool:
+            futures = {pool.submit(run, m): m for m in modules}
+            written = {futures[f].out_name: f.result() for f in concurrent.futures.as_completed(futures)}
+        (out_dir / SPLIT_INDEX_NAME).write_text(
+            _compose_split_index(root, modules, written, options.graph, len(plan.apis)), encoding="utf-8", newline="\n"
+        )
+        q.put(("done_split", sum(written.values()), len(modules), out_dir))
+    except _ExportCancelled:
+        q.put(("cancelled", "export"))
+    except Exception as e:
+        LOGGER.exception("Echec export par module", exc_info=e)
+        q.put(("error", str(e)))
+
+def _copy(root: Path, files: Sequence[Path], q: "queue.Queue", cancel: threading.Event | None = None):
+    try:
+        if not files:
+            q.put(("error", "Aucun fichier selectionne."))
             return
         total = len(files)
+        progress = _ProgressThrottle(q)
         pieces: list[str] = []
         for i, fp in enumerate(files, 1):
             if cancel and cancel.is_set():
@@ -937,7 +6143,7 @@ def _copy(root: Path, files: Sequence[Path], q: "queue.Queue", cancel: threading
                     return
                 pieces.append(c)
             pieces.append("\n```\n\n")
-            q.put(("progress", i, total))
+            progress(i, total)
         payload = "".join(pieces)
         if len(payload.encode("utf-8", errors="ignore")) > CLIPBOARD_MAX:
             q.put(("too_large_for_clipboard", total, payload))
@@ -947,7 +6153,8 @@ def _copy(root: Path, files: Sequence[Path], q: "queue.Queue", cancel: threading
         LOGGER.exception("Echec copie", exc_info=e)
         q.put(("error", str(e)))
 
-def _build_tree_text(root: Path, files: Sequence[Path]) -> str:
+def _build_tree_text(root: Path, files: Sequence[Path], capped: dict[Path, tuple[int, int]] | None = None) -> str:
+    """Arborescence texte ; un dossier de capped ayant des fichiers listes recoit une entree "... N autres fichiers"."""
     try:
         rels = [fp.relative_to(root).as_posix() for fp in files]
     except Exception:
@@ -961,11 +6168,25 @@ def _build_tree_text(root: Path, files: Sequence[Path]) -> str:
                 d.setdefault('__files__', []).append(part)
             else:
                 d = d.setdefault(part, {})
+    for folder, (hidden, hidden_bytes) in (capped or {}).items():
+        try:
+            parts = [p for p in folder.relative_to(root).as_posix().split('/') if p not in ('', '.')]
+        except ValueError:
+            continue
+        d = tree
+        for part in parts:
+            d = d.get(part)  # type: ignore[assignment]
+            if d is None:
+                break
+        if d is not None and d.get('__files__'):
+            d['__more__'] = f"... {hidden} autres fichiers ({_human_bytes(hidden_bytes)})"
     lines: list[str] = [f"{Path(root).name}/"]
     def rec(node: dict, prefix: str = "") -> None:
-        dirs = sorted([k for k in node.keys() if k != '__files__'], key=lambda x: x.lower())
+        dirs = sorted([k for k in node.keys() if k not in ('__files__', '__more__')], key=lambda x: x.lower())
         files = sorted(node.get('__files__', []), key=lambda x: x.lower())
         entries = [(name + '/', node[name]) for name in dirs] + [(fname, None) for fname in files]
+        if '__more__' in node:
+            entries.append((node['__more__'], None))
         for idx, (name, sub) in enumerate(entries):
             last = (idx == len(entries) - 1)
             connector = ('`-- ' if last else '|-- ')
@@ -976,7 +6197,9 @@ def _build_tree_text(root: Path, files: Sequence[Path]) -> str:
     rec(tree, "")
     return "\n".join(lines)
 
-def _compose_structured_intro(root: Path, files_sorted: Sequence[Path]) -> str:
+def _compose_structured_intro(
+    root: Path, files_sorted: Sequence[Path], options: _ExportOptions | None = None, blocks: Sequence[_SharedBlock] = ()
+) -> str:
     try:
         root_res = str(root.resolve())
     except Exception:
@@ -988,6 +6211,17 @@ def _compose_structured_intro(root: Path, files_sorted: Sequence[Path]) -> str:
     header.append(f"Racine: {root_res}")
     header.append(f"Date: {now}")
     header.append(f"Total fichiers: {total}")
+    capped = options.capped if options is not None else {}
+    if capped:
+        # Seuls comptent les dossiers dont un echantillon est exporte.
+        shown = {fp.parent for fp in files_sorted}
+        capped = {d: v for d, v in capped.items() if d in shown}
+    if capped:
+        hidden = sum(n for n, _b in capped.values())
+        header.append(f"Plafond par dossier: {hidden} fichier(s) non exportes dans {len(capped)} dossier(s) (echantillon seulement)")
+    mode = options.describe() if options is not None else None
+    if mode:
+        header.append(f"Mode: {mode}")
     header.append("")
     header.append("## Table des fichiers")
     for fp in files_sorted:
@@ -1000,43 +6234,91 @@ def _compose_structured_intro(root: Path, files_sorted: Sequence[Path]) -> str:
     header.append("## Arborescence")
     header.append("")
     header.append("```text")
-    header.append(_build_tree_text(root, files_sorted))
+    header.append(_build_tree_text(root, files_sorted, capped))
     header.append("```")
     header.append("")
+    if blocks:
+        header.append("## Blocs communs")
+        header.append("")
+        for block in blocks:
+            header.append(f"### Bloc #{block.number} - {len(block.lines)} lignes, en {block.where} de {block.count} fichier(s)")
+            header.append(f"```{block.lang}")
+            header.extend(block.lines)
+            header.append("```")
+            header.append("")
     header.append("## Contenu")
     header.append("")
     return "\n".join(header)
 
-def _copy_structured(root: Path, files: Sequence[Path], q: "queue.Queue", cancel: threading.Event | None = None):
+def _compose_lean_manifest(lean: Sequence[tuple[str, int, int]]) -> str:
+    """Section finale des exports alleges : octets gagnes par fichier, du plus gros gain au plus petit."""
+    before = sum(b for _rel, b, _a in lean)
+    after = sum(a for _rel, _b, a in lean)
+    lines = ["## Allegement", ""]
+    pct = 100 * (before - after) // before if before else 0
+    lines.append(f"Total: {_human_bytes(before)} -> {_human_bytes(after)} (-{_human_bytes(before - after)}, -{pct}%)")
+    lines.append("")
+    for rel, b, a in sorted(lean, key=lambda item: item[2] - item[1]):
+        if b > a:
+            lines.append(f"- {rel}: {b} -> {a} octets (-{100 * (b - a) // b}%)")
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+def _compose_truncation_manifest(truncated: Sequence[tuple[str, int, int, bool]]) -> str:
+    """Section finale des exports tronques : lignes elidees par fichier."""
+    lines = ["## Troncature", ""]
+    lines.append(f"{len(truncated)} fichier(s) tronque(s), {sum(n for _rel, _start, n, _exact in truncated)} lignes elidees au total.")
+    if not all(exact for *_rest, exact in truncated):
+        lines.append("Les lignes marquees \"texte exporte\" sont numerotees dans le texte allege ou converti, pas dans le fichier source.")
+    lines.append("")
+    for rel, start, n, exact in truncated:
+        lines.append(f"- {rel}: lignes {start}-{start + n - 1} elidees ({n}){'' if exact else ', texte exporte'}")
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+def _compose_dependency_api(root: Path, apis: Sequence[_DependencyApi]) -> str:
+    """Section finale du mode vendor "api" : surface publique des paquets importes par les fichiers exportes."""
+    lines = ["## API des dependances", ""]
+    lines.append(f"{len(apis)} paquet(s) importe(s), surface publique seulement (.d.ts, .pyi, signatures).")
+    lines.append("")
+    return "\n".join(lines) + "\n" + "".join(api.render(root) + "\n" for api in apis)
+
+def _compose_blob_manifest(blobs: Sequence[tuple[str, int, int]]) -> str:
+    """Section finale des exports dont des blobs ont ete remplaces : nombre et taille par fichier."""
+    lines = ["## Blobs", ""]
+    count = sum(n for _rel, n, _removed in blobs)
+    removed = sum(r for _rel, _n, r in blobs)
+    lines.append(f"{count} blob(s) remplace(s) dans {len(blobs)} fichier(s), {removed} caracteres retires au total.")
+    lines.append("")
+    for rel, n, r in blobs:
+        lines.append(f"- {rel}: {n} blob(s), {r} caracteres")
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+def _copy_structured(
+    root: Path,
+    files: Sequence[Path],
+    q: "queue.Queue",
+    cancel: threading.Event | None = None,
+    options: _ExportOptions | None = None,
+):
     try:
         files = list(files)
         if not files:
             q.put(("error", "Aucun fichier selectionne."))
             return
-        files_sorted = sorted(files, key=lambda p: p.relative_to(root).as_posix().casefold())
-        total = len(files_sorted)
-        intro = _compose_structured_intro(root, files_sorted)
-        pieces: list[str] = [intro, ""]
-        for i, fp in enumerate(files_sorted, 1):
-            if cancel and cancel.is_set():
-                q.put(("cancelled", "copy"))
-                return
-            rel = fp.relative_to(root)
-            lang = _lang_for(fp)
-            pieces.append(f"### {i}/{total} - {rel}\n{'-'*80}\n")
-            pieces.append(f"```{lang}\n")
-            for c in _chunks(fp):
-                if cancel and cancel.is_set():
-                    q.put(("cancelled", "copy"))
-                    return
-                pieces.append(c)
-            pieces.append("\n```\n")
-            q.put(("progress", i, total))
-        payload = "\n".join(pieces)
+        options = options or _ExportOptions()
+        files_sorted = options.sort(root, files)
+        plan = _prepare_export(root, files_sorted, options, cancel)
+        pieces: list[str] = []
+        written = _render_export(pieces.append, root, files_sorted, options, plan, cancel, _ProgressThrottle(q))
+        payload = "".join(pieces)
         if len(payload.encode("utf-8", errors="ignore")) > CLIPBOARD_MAX:
-            q.put(("too_large_for_clipboard", total, payload))
+            q.put(("too_large_for_clipboard", written, payload))
         else:
-            q.put(("clip_ready", total, payload))
+            q.put(("clip_ready", written, payload))
+    except _ExportCancelled:
+        q.put(("cancelled", "copy"))
     except Exception as e:
         LOGGER.exception("Echec copie structuree", exc_info=e)
         q.put(("error", str(e)))
@@ -1047,13 +6329,30 @@ class ConcatApp(tk.Tk):
         self.cfg = _Cfg.load()
         self.protocol("WM_DELETE_WINDOW", self._close)
         self.project_dir: Path | None = Path(self.cfg.recent_dirs[0]).resolve() if self.cfg.recent_dirs and Path(self.cfg.recent_dirs[0]).exists() else None
-        self._load_gitignore(self.project_dir)
         self.files_all: list[Path] = []
+        self.file_meta: dict[Path, _FileMeta] = {}
+        # Dossiers plafonnes au scan (_DirCap) : (fichiers masques, octets masques).
+        self.capped_dirs: dict[Path, tuple[int, int]] = {}
+        self.path_index: _PathIndex | None = None
         self.sort_reverse = self.cfg.sort_rev
         self.sort_col = self.cfg.sort_col
-        self.queue: "queue.Queue" = queue.Queue()
+        self._wake_lock = threading.Lock()
+        self._wake_pending = False
+        # Avant la boucle Tk, event_generate depuis un thread bloque : _finish_startup videra la file.
+        self._loop_running = False
+        self._processing = False
+        self._process_after_id: str | None = None
+        try:
+            self._tk_threaded = bool(int(self.tk.eval("set tcl_platform(threaded)")))
+        except Exception:
+            self._tk_threaded = False
+        self.queue: "queue.Queue" = _NotifyingQueue(self._wake if self._tk_threaded else None)
         self._size_cache: dict[str, int] = {}
         self.preview_path: Path | None = None
+        self._large_view: _MappedFile | None = None
+        self._large_top = 0
+        self._large_hit: tuple[int, int, int] | None = None
+        self._large_left = 0
         self._hover_iid: str | None = None
         self._last_total = 0
         self._scan_thread: threading.Thread | None = None
@@ -1076,11 +6375,37 @@ class ConcatApp(tk.Tk):
         self.respect_gitignore_var = tk.BooleanVar(value=self.cfg.respect_gitignore)
         self.vendor_mode_var = tk.StringVar(value=self.cfg.vendor_mode)
         self.safe_export_exclude_sensitive_var = tk.BooleanVar(value=self.cfg.safe_export_exclude_sensitive)
+        self.restore_last_var = tk.BooleanVar(value=self.cfg.restore_last)
+        self.content_index_var = tk.BooleanVar(value=self.cfg.content_index)
+        self.content_index: _ContentIndex | None = None
+        self._content_cancel = threading.Event()
+        self._grep_last: tuple[str, bool, bool, bool] = ("", False, False, True)
+        self.import_graph: _ImportGraph | None = None
+        self._imports_cancel = threading.Event()
+        self.hide_duplicates_var = tk.BooleanVar(value=self.cfg.hide_duplicates)
+        # doublon -> (copie de reference, identique), sur tout le scan ; None tant que non calcule.
+        self.duplicates: dict[Path, tuple[Path, bool]] | None = None
+        self._dups_cancel = threading.Event()
+        # Statistiques facon cloc par fichier (_loc_stats), totaux de la selection et des lignes affichees.
+        self.loc_stats: dict[Path, list[int] | None] | None = None
+        self._loc_cancel = threading.Event()
+        self._loc_tallies: dict[str, _LocTally] = {}
+        self._loc_panel: dict | None = None
+        # Activite git des fichiers (_git_hotness) : colonne "Activite", ordre d'export, selection des plus actifs.
+        self.hotness: _GitHotness | None = None
+        self._hot_cancel = threading.Event()
+        self._hot_top = HOT_TOP_DEFAULT
+        self.export_options = _ExportOptions()
+        self.large_goto_var = tk.StringVar()
+        self.large_search_var = tk.StringVar()
+        self._startup_probe = os.getenv("CODEVIEWER_STARTUP_PROBE", "")
+        self._startup_marks: dict[str, float] = {"import_done": _T_IMPORT_DONE, "init_start": time.time()}
         self._build_fonts()
+        # Là je ne pose que la palette de base : les styles detailles arrivent apres le premier affichage.
+        self._apply_base_theme()
         self._menubar()
         self._status()
         self._paned()
-        self._apply_theme()
         self.title(APP_NAME)
         self.geometry(self.cfg.win_geom)
         self.minsize(920, 560)
@@ -1093,6 +6418,7 @@ class ConcatApp(tk.Tk):
             "<Control-d>": self._clear,
             "<F5>": self._apply,
             "<Control-f>": lambda: (self.entry_filter.focus_set(), "break"),
+            "<Control-F>": self._open_grep_dialog,
             "<Control-r>": self._refresh,
             "<Control-plus>": lambda: self._font_step(1),
             "<Control-minus>": lambda: self._font_step(-1),
@@ -1101,9 +6427,42 @@ class ConcatApp(tk.Tk):
         for seq, cb in shortcuts.items():
             self.bind_all(seq, lambda _e, f=cb: f())
         self.bind_all("<F9>", lambda _e: self._toggle_theme(toggle=True))
+        self.bind("<<WorkerQueue>>", self._process)
+        if self._startup_probe:
+            self.bind("<Map>", self._on_startup_map, add="+")
+        self._startup_marks["init_done"] = time.time()
+        # Tout ce qui depend de la config (theme complet, .gitignore, scan) attend que la fenetre soit visible.
+        self.after_idle(self._finish_startup)
+
+    def _finish_startup(self):
+        self._apply_theme()
         if self.project_dir:
-            self._scan_async(self.project_dir)
-        self.after(100, self._process)
+            self._load_gitignore(self.project_dir)
+            self._update_toolbar_note()
+            if self.cfg.restore_last:
+                self._restore_snapshot_async(self.project_dir)
+            else:
+                self._scan_async(self.project_dir)
+        # Là je vide ce qui a pu etre depose avant le demarrage de la boucle Tk.
+        self._loop_running = True
+        self._process()
+        self._startup_marks["ready"] = time.time()
+        if self._startup_probe:
+            self.after_idle(self._write_startup_probe)
+
+    def _on_startup_map(self, event: tk.Event):
+        if event.widget is self and "window_shown" not in self._startup_marks:
+            self._startup_marks["window_shown"] = time.time()
+
+    def _write_startup_probe(self):
+        # Mode mesure (bench/startup.py) : j'ecris les jalons puis je ferme sans toucher a la config.
+        marks = dict(self._startup_marks)
+        marks.setdefault("window_shown", marks.get("ready", time.time()))
+        try:
+            Path(self._startup_probe).write_text(json.dumps(marks, indent=2), encoding="utf-8")
+        except Exception as exc:
+            LOGGER.exception("Echec ecriture sonde de demarrage", exc_info=exc)
+        self.destroy()
 
     def _build_fonts(self):
         if sys.platform.startswith("win"):
@@ -1121,6 +6480,17 @@ class ConcatApp(tk.Tk):
         self.heading_font.configure(size=max(13, base + 1))
         self.small_font.configure(size=max(10, base - 2))
 
+    def _apply_base_theme(self) -> None:
+        palette = PALETTES["dark" if self.theme_var.get() else "light"].copy()
+        self.colors = palette
+        style = ttk.Style(self)
+        try:
+            style.theme_use("clam")
+        except tk.TclError:
+            pass
+        style.configure(".", background=palette["bg"], foreground=palette["fg"], fieldbackground=palette["bg"])
+        self.configure(background=palette["bg"])
+
     def _apply_theme(self) -> None:
         palette_key = "dark" if self.theme_var.get() else "light"
         palette = PALETTES[palette_key].copy()
@@ -1341,8 +6711,10 @@ class ConcatApp(tk.Tk):
             self.tree.tag_configure("odd", background=palette["row_odd"], foreground=palette["file_fg"])
             self.tree.tag_configure("even", background=palette["row_even"], foreground=palette["file_fg"])
             self.tree.tag_configure("hover", background=palette["row_hover"], foreground=palette["file_fg"])
+            self.tree.tag_configure("capped", background=palette["row_even"], foreground=palette["fg_dim"])
         if hasattr(self, "txt"):
             self.txt.configure(background=palette["code_bg"], foreground=palette["code_fg"], insertbackground=palette["code_fg"])
+            self.txt.tag_configure("match", background=palette["sel_bg"], foreground=palette["sel_fg"])
         if hasattr(self, "entry_filter"):
             self._update_filter_placeholder_style()
         if hasattr(self, "progress"):
@@ -1394,8 +6766,12 @@ class ConcatApp(tk.Tk):
         file_menu.add_command(label="Actualiser", accelerator="Ctrl+R", command=self._refresh)
         file_menu.add_separator()
         file_menu.add_command(label="Exporter...", accelerator="Ctrl+S", command=self._export_sel)
+        file_menu.add_command(label="Exporter par module...", command=lambda: self._export_sel(split=True))
         file_menu.add_command(label="Extraire variables d'environnement...", command=self._extract_env)
         file_menu.add_command(label="Copier le code", accelerator="Ctrl+C", command=self._copy_sel)
+        file_menu.add_command(label="Options d'export...", command=self._open_export_options_dialog)
+        file_menu.add_separator()
+        file_menu.add_checkbutton(label="Restaurer le dernier projet au lancement", variable=self.restore_last_var, command=self._toggle_restore_last)
         file_menu.add_separator()
         file_menu.add_command(label="Quitter", command=self._close)
         menu.add_cascade(label="Fichier", menu=file_menu)
@@ -1404,13 +6780,21 @@ class ConcatApp(tk.Tk):
         edit_menu.add_command(label="Selectionner tout", accelerator="Ctrl+A", command=self._sel_all)
         edit_menu.add_command(label="Deselectionner", accelerator="Ctrl+D", command=self._clear)
         edit_menu.add_command(label="Inverser la selection", command=self._invert)
+        edit_menu.add_command(label="Selectionner les dependances", command=lambda: self._select_imports(False))
+        edit_menu.add_command(label="Selectionner les dependants", command=lambda: self._select_imports(True))
+        edit_menu.add_command(label="Selectionner les fichiers les plus actifs...", command=self._select_hottest)
         edit_menu.add_separator()
         edit_menu.add_command(label="Filtrer", accelerator="Ctrl+F", command=lambda: self.entry_filter.focus_set())
+        edit_menu.add_command(label="Rechercher dans le contenu...", accelerator="Ctrl+Maj+F", command=self._open_grep_dialog)
+        edit_menu.add_checkbutton(label="Indexer le contenu (recherche rapide)", variable=self.content_index_var, command=self._toggle_content_index)
         menu.add_cascade(label="Edition", menu=edit_menu)
 
         view_menu = tk.Menu(menu, tearoff=False)
         view_menu.add_checkbutton(label="Theme sombre", onvalue=True, offvalue=False, variable=self.theme_var, command=self._toggle_theme)
         view_menu.add_checkbutton(label="Retour a la ligne", variable=self.wrap_var, command=self._toggle_wrap)
+        view_menu.add_checkbutton(label="Masquer les doublons", variable=self.hide_duplicates_var, command=self._toggle_hide_duplicates)
+        view_menu.add_command(label="Plafond par dossier...", command=self._open_dir_cap_dialog)
+        view_menu.add_command(label="Statistiques de code...", command=self._open_loc_panel)
         view_menu.add_separator()
         view_menu.add_command(label="Police +", accelerator="Ctrl++", command=lambda: self._font_step(1))
         view_menu.add_command(label="Police -", accelerator="Ctrl+-", command=lambda: self._font_step(-1))
@@ -1510,6 +6894,10 @@ class ConcatApp(tk.Tk):
         self.entry_filter = ttk.Entry(filter_bar, textvariable=self.filter_var, style="Filter.TEntry")
         self.entry_filter.grid(row=0, column=1, sticky="ew", padx=(12, 12))
         self.entry_filter.bind("<KeyRelease>", self._on_filter_keystroke)
+        tip(
+            self.entry_filter,
+            "Chemin, glob (*.php) ou ~flou ; termes : ext:php,twig size<200k -path:tests/ name: reason:none tracked:yes modified<7d",
+        )
         self._update_filter_placeholder_style()
 
         filter_actions = ttk.Frame(filter_bar, style="ToolbarSection.TFrame")
@@ -1578,6 +6966,7 @@ class ConcatApp(tk.Tk):
             ("Exclu", "none", "Exclure completement vendor"),
             ("Symfony", "symfony", "Limiter a vendor/symfony"),
             ("Tout", "all", "Inclure l'ensemble du vendor"),
+            ("API", "api", "Exclure vendor et node_modules, exporter l'API publique des dependances importees (.d.ts, .pyi, signatures)"),
         ]:
             rb = ttk.Radiobutton(
                 vendor_frame,
@@ -1631,6 +7020,8 @@ class ConcatApp(tk.Tk):
             suffix_parts.append("vendor symfony")
         elif vendor_mode == "all":
             suffix_parts.append("vendor complet")
+        elif vendor_mode == "api":
+            suffix_parts.append("API des dependances")
         suffix = f" - {' | '.join(suffix_parts)}" if suffix_parts else ""
         prefix = "CodeViewer"
         if self.project_dir:
@@ -1645,7 +7036,7 @@ class ConcatApp(tk.Tk):
         total = self._last_total
         if hasattr(self, "tree"):
             try:
-                total = len(self.tree.get_children())
+                total = len(self._file_rows())
             except Exception:
                 total = self._last_total
         selection = 0
@@ -1672,6 +7063,7 @@ class ConcatApp(tk.Tk):
             "none": "vendor exclu",
             "symfony": "vendor symfony",
             "all": "vendor complet",
+            "api": "vendor API",
         }.get(vendor_mode, "vendor exclu")
         tags.append(vendor_tag)
         if self.safe_export_exclude_sensitive_var.get():
@@ -1687,24 +7079,7 @@ class ConcatApp(tk.Tk):
             return
 
         # .gitignore
-        gitignore = root / ".gitignore"
-        if gitignore.exists():
-            try:
-                raw_lines = gitignore.read_text(encoding="utf-8", errors="ignore").splitlines()
-            except Exception:
-                raw_lines = []
-            rules: list[tuple[str, bool]] = []
-            for raw in raw_lines:
-                line = raw.strip()
-                if not line or line.startswith("#"):
-                    continue
-                negate = line.startswith("!")
-                if negate:
-                    line = line[1:].strip()
-                if not line:
-                    continue
-                rules.append((line, negate))
-            self.gitignore_rules = rules
+        self.gitignore_rules = _load_gitignore_rules(root)
 
         # .gitattributes
         try:
@@ -1712,55 +7087,6 @@ class ConcatApp(tk.Tk):
         except Exception:
             self.gitattributes_rules = []
 
-    @staticmethod
-    def _gitignore_matches(pattern: str, rel_path: str, is_dir: bool) -> bool:
-        dir_only = pattern.endswith("/")
-        if dir_only:
-            pattern = pattern.rstrip("/")
-        anchored = pattern.startswith("/")
-        if anchored:
-            pattern_cmp = pattern.lstrip("/")
-        else:
-            pattern_cmp = pattern
-        candidates = [rel_path]
-        if not anchored and "/" in rel_path:
-            parts = rel_path.split("/")
-            candidates.extend("/".join(parts[i:]) for i in range(1, len(parts)))
-        if dir_only:
-            if any(c == pattern_cmp or c.startswith(pattern_cmp + "/") for c in candidates):
-                return True
-            return False
-        for c in candidates:
-            if fnmatch.fnmatch(c, pattern_cmp):
-                return True
-        if not anchored:
-            name = rel_path.rsplit("/", 1)[-1]
-            if fnmatch.fnmatch(name, pattern_cmp):
-                return True
-        return False
-
-    def _is_gitignored(self, path: Path) -> bool:
-        if not self.gitignore_rules or not self.project_dir:
-            return False
-        try:
-            rel = path.relative_to(self.project_dir).as_posix()
-        except Exception:
-            rel = path.as_posix()
-        ignored = False
-        is_dir = path.is_dir()
-        for pattern, negate in self.gitignore_rules:
-            if self._gitignore_matches(pattern, rel, is_dir):
-                ignored = not negate
-        return ignored
-
-    def _gitattributes_is_excluded(self, rel_path: str) -> bool:
-        # Exclut si marqué généré/vendored/documentation/export-ignore
-        for pat, flags in getattr(self, "gitattributes_rules", []):
-            if self._gitignore_matches(pat, rel_path, False):
-                if any(f in flags for f in ("linguist-generated", "linguist-vendored", "linguist-documentation", "export-ignore")):
-                    return True
-        return False
-
     def _toggle_ai_filter(self):
         state = self.ai_filter_var.get()
         self.cfg.ai_filter = state
@@ -1783,11 +7109,11 @@ class ConcatApp(tk.Tk):
 
     def _toggle_vendor_mode(self):
         val = self.vendor_mode_var.get()
-        if val not in {"none", "symfony", "all"}:
+        if val not in VENDOR_MODES:
             self.vendor_mode_var.set("none")
             val = "none"
         self.cfg.vendor_mode = _normalize_vendor_mode(val)
-        self.cfg.include_vendor = self.cfg.vendor_mode != "none"
+        self.cfg.include_vendor = self.cfg.vendor_mode in ("symfony", "all")
         if self.project_dir:
             self._scan_async(self.project_dir)
         else:
@@ -1868,10 +7194,11 @@ class ConcatApp(tk.Tk):
         paned.add(left, weight=3)
         paned.add(right, weight=2)
 
-        cols = ("name", "size", "rel")
-        headings = {"name": "Nom", "size": "Taille", "rel": "Chemin relatif"}
-        anchors = {"name": "w", "size": "e", "rel": "w"}
-        widths = self.cfg.col_widths or {"name": 320, "size": 120, "rel": 540}
+        cols = ("name", "size", "hot", "rel")
+        headings = {"name": "Nom", "size": "Taille", "hot": "Activite", "rel": "Chemin relatif"}
+        anchors = {"name": "w", "size": "e", "hot": "e", "rel": "w"}
+        # Largeurs enregistrees avant l'ajout d'une colonne : la valeur par defaut complete.
+        widths = {"name": 320, "size": 120, "hot": 90, "rel": 540, **(self.cfg.col_widths or {})}
 
         left.grid_columnconfigure(0, weight=1)
         tree_header = ttk.Frame(left, style="Card.TFrame")
@@ -1881,7 +7208,7 @@ class ConcatApp(tk.Tk):
         self.tree = ttk.Treeview(left, columns=cols, show="headings", selectmode="extended", style="Neon.Treeview")
         for col in cols:
             self.tree.heading(col, text=headings[col], command=lambda c=col: self._sort(c))
-            self.tree.column(col, width=widths.get(col, 200), anchor=anchors[col], stretch=(col != "size"))
+            self.tree.column(col, width=widths.get(col, 200), anchor=anchors[col], stretch=(col not in ("size", "hot")))
 
         vsb = ttk.Scrollbar(left, orient="vertical", command=self.tree.yview)
         hsb = ttk.Scrollbar(left, orient="horizontal", command=self.tree.xview)
@@ -1904,6 +7231,8 @@ class ConcatApp(tk.Tk):
         self.menu.add_command(label="Copier le chemin", command=lambda: self._ctx("copy"))
         self.menu.add_separator()
         self.menu.add_command(label="Basculer selection", command=lambda: self._ctx("toggle"))
+        self.menu.add_command(label="Selectionner les dependances", command=lambda: self._ctx("deps"))
+        self.menu.add_command(label="Selectionner les dependants", command=lambda: self._ctx("dependents"))
 
         preview = ttk.Frame(right, style="Card.TFrame")
         preview.pack(fill="both", expand=True)
@@ -1933,8 +7262,23 @@ class ConcatApp(tk.Tk):
         self.preview_mtime_badge = ttk.Label(self.preview_meta, text="Modifie --", style="PreviewBadge.TLabel")
         self.preview_mtime_badge.pack(side="left", padx=(12, 0))
 
+        # Barre de navigation de la visionneuse gros fichiers (affichee a la demande)
+        self.large_bar = ttk.Frame(preview, style="PreviewHeader.TFrame", padding=(0, 0, 0, 8))
+        ttk.Label(self.large_bar, text="Ligne", style="PreviewPath.TLabel").pack(side="left")
+        entry_goto = ttk.Entry(self.large_bar, textvariable=self.large_goto_var, width=10)
+        entry_goto.pack(side="left", padx=(6, 6))
+        entry_goto.bind("<Return>", lambda _e: self._large_goto())
+        ttk.Button(self.large_bar, text="Aller", command=self._large_goto, style="Toolbar.TButton").pack(side="left", padx=(0, 12))
+        entry_search = ttk.Entry(self.large_bar, textvariable=self.large_search_var, width=24)
+        entry_search.pack(side="left", padx=(0, 6))
+        entry_search.bind("<Return>", lambda _e: self._large_search_next())
+        ttk.Button(self.large_bar, text="Suivant", command=self._large_search_next, style="Toolbar.TButton").pack(side="left")
+        self.lbl_large_status = ttk.Label(self.large_bar, text="", style="PreviewPath.TLabel")
+        self.lbl_large_status.pack(side="left", padx=(12, 0))
+
         text_frame = ttk.Frame(preview, style="Card.TFrame")
         text_frame.pack(fill="both", expand=True)
+        self.txt_frame = text_frame
         self.txt = tk.Text(
             text_frame,
             wrap="word" if self.wrap_var.get() else "none",
@@ -1945,6 +7289,10 @@ class ConcatApp(tk.Tk):
         txt_vsb = ttk.Scrollbar(text_frame, orient="vertical", command=self.txt.yview)
         txt_hsb = ttk.Scrollbar(text_frame, orient="horizontal", command=self.txt.xview)
         self.txt.configure(yscrollcommand=txt_vsb.set, xscrollcommand=txt_hsb.set)
+        self.txt_vsb = txt_vsb
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.txt.bind(seq, self._on_preview_wheel)
+        self.txt.bind("<Configure>", lambda _e: self._large_render() if self._large_view else None)
         self.txt.grid(row=0, column=0, sticky="nsew")
         txt_vsb.grid(row=0, column=1, sticky="ns")
         txt_hsb.grid(row=1, column=0, sticky="ew")
@@ -1986,6 +7334,15 @@ class ConcatApp(tk.Tk):
             messagebox.showerror("Erreur", "Le dossier n'existe plus.")
             return
         self.project_dir = path.resolve()
+        self._imports_cancel.set()
+        self.import_graph = None
+        self._dups_cancel.set()
+        self.duplicates = None
+        self._loc_cancel.set()
+        self.loc_stats = None
+        self._loc_tallies = {}
+        self._hot_cancel.set()
+        self.hotness = None
         parts = [p for p in self.cfg.recent_dirs if Path(p).exists()]
         str_proj = str(self.project_dir)
         if str_proj in parts:
@@ -2005,80 +7362,443 @@ class ConcatApp(tk.Tk):
         self._update_toolbar_stats()
         self._scan_async(self.project_dir)
 
-    def _scan_async(self, root: Path):
+    def _scan_async(self, root: Path, revalidate: bool = False):
         if not root:
             return
         if self._scan_thread and self._scan_thread.is_alive():
             return
 
-        ai_mode = bool(self.ai_filter_var.get()) if hasattr(self, "ai_filter_var") else False
-        tracked_only = bool(self.tracked_only_var.get()) if hasattr(self, "tracked_only_var") else False
-        vendor_mode = _normalize_vendor_mode(self.vendor_mode_var.get() if hasattr(self, "vendor_mode_var") else "none")
-        if hasattr(self, "vendor_mode_var") and self.vendor_mode_var.get() != vendor_mode:
-            self.vendor_mode_var.set(vendor_mode)
+        ai_mode = bool(self.ai_filter_var.get()) if hasattr(self, "ai_filter_var") else False
+        tracked_only = bool(self.tracked_only_var.get()) if hasattr(self, "tracked_only_var") else False
+        vendor_mode = _normalize_vendor_mode(self.vendor_mode_var.get() if hasattr(self, "vendor_mode_var") else "none")
+        if hasattr(self, "vendor_mode_var") and self.vendor_mode_var.get() != vendor_mode:
+            self.vendor_mode_var.set(vendor_mode)
+        cap = self._dir_cap()
+
+        self.cancel_event.clear()
+        self.btn_cancel.config(state="normal")
+        self.progress.configure(mode="indeterminate")
+        self.progress.start(10)
+        if revalidate:
+            # Là je garde la liste restauree affichee pendant que le scan verifie le disque.
+            self.lbl_msg.config(text="Revalidation en arriere-plan...")
+        else:
+            self.lbl_msg.config(text="Scan en cours...")
+            self.tree.delete(*self.tree.get_children())
+            self._clear_hover()
+            self._last_total = 0
+            self._update_toolbar_stats()
+
+        try:
+            file_fg = self.colors.get("file_fg", self.colors.get("fg", ""))
+            dim_fg = self.colors.get("fg_dim", file_fg)
+            odd_bg = self.colors.get("row_odd", self.colors.get("bg_alt", ""))
+            even_bg = self.colors.get("row_even", self.colors.get("bg_alt", ""))
+        except Exception:
+            file_fg = dim_fg = ""
+            odd_bg = even_bg = ""
+        self.tree.tag_configure("odd", background=odd_bg, foreground=file_fg)
+        self.tree.tag_configure("even", background=even_bg, foreground=file_fg)
+        self.tree.tag_configure("capped", background=even_bg, foreground=dim_fg)
+        self._size_cache.clear()
+
+        def worker():
+            try:
+                if self.cancel_event.is_set():
+                    self.queue.put(("cancelled", "scan"))
+                    return
+                use_git_base = tracked_only or ai_mode
+                tracked = _git_tracked(root) if use_git_base else set()
+                meta: dict[Path, _FileMeta] = {}
+                capped: dict[Path, tuple[int, int]] = {}
+                if tracked:
+                    files = []
+                    for p in tracked:
+                        m = _stat_meta(p)
+                        if m is None:
+                            continue
+                        if not _is_allowed_file(p):
+                            continue
+                        try:
+                            rel_parts = p.relative_to(root).parts
+                        except Exception:
+                            rel_parts = p.parts
+                        if not _vendor_allows_file(rel_parts, vendor_mode):
+                            continue
+                        files.append(p)
+                        meta[p] = m
+                    files = _apply_dir_cap(files, meta, cap, capped)
+                    def _rel_key(path: Path) -> str:
+                        try:
+                            return path.relative_to(root).as_posix().casefold()
+                        except Exception:
+                            return str(path).casefold()
+                    files.sort(key=_rel_key)
+                else:
+                    files = _discover(root, vendor_mode, meta, cap, capped)
+
+                if ai_mode:
+                    sniffed = _ai_sniff(root, files, self.cancel_event)
+                    if sniffed is None:
+                        self.queue.put(("cancelled", "scan"))
+                        return
+                    for fp, reason in sniffed.items():
+                        if fp in meta:
+                            meta[fp].sniff = reason
+
+                attrs = _load_gitattributes(root)
+                index = _PathIndex(root, files, self.cancel_event)
+                if self.cancel_event.is_set():
+                    self.queue.put(("cancelled", "scan"))
+                    return
+                self.queue.put(("scan_done", root, vendor_mode, ai_mode, tracked_only, files, tracked, attrs, meta, index, revalidate, capped))
+            except Exception as exc:
+                LOGGER.exception("Echec scan", exc_info=exc)
+                self.queue.put(("error", str(exc)))
+
+        self._scan_thread = threading.Thread(target=worker, daemon=True)
+        self._scan_thread.start()
+
+    def _dir_cap(self) -> _DirCap:
+        cfg = self.cfg
+        return _DirCap(cfg.dir_cap_files, cfg.dir_cap_bytes, cfg.dir_cap_keep, cfg.dir_cap_sample)
+
+    def _scan_modes(self) -> tuple[str, bool, bool]:
+        vendor_mode = _normalize_vendor_mode(self.vendor_mode_var.get())
+        return vendor_mode, bool(self.ai_filter_var.get()), bool(self.tracked_only_var.get())
+
+    def _restore_snapshot_async(self, root: Path):
+        vendor_mode, ai_mode, tracked_only = self._scan_modes()
+        dir_cap = self._dir_cap().key()
+        self.lbl_msg.config(text="Restauration du dernier scan...")
+
+        def worker():
+            try:
+                snapshot = _load_scan_snapshot(root, vendor_mode, ai_mode, tracked_only, dir_cap)
+                index = _PathIndex(root, snapshot[0]) if snapshot is not None else None
+            except Exception as exc:
+                LOGGER.exception("Echec lecture instantane", exc_info=exc)
+                snapshot = index = None
+            self.queue.put(("snapshot_loaded", root, snapshot, index))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _save_snapshot_async(self, sync: bool = False):
+        if not self.project_dir or not self.files_all:
+            return
+        vendor_mode, ai_mode, tracked_only = self._scan_modes()
+        args = (
+            self.project_dir,
+            vendor_mode,
+            ai_mode,
+            tracked_only,
+            list(self.files_all),
+            dict(self.file_meta),
+            set(self.git_tracked),
+            self._selected_paths(),
+            dict(self.capped_dirs),
+            self._dir_cap().key(),
+        )
+        if sync:
+            _save_scan_snapshot(*args)
+        else:
+            threading.Thread(target=_save_scan_snapshot, args=args, daemon=True).start()
+
+    def _toggle_restore_last(self):
+        self.cfg.restore_last = bool(self.restore_last_var.get())
+        if self.cfg.restore_last:
+            self._save_snapshot_async()
+
+    def _toggle_content_index(self):
+        self.cfg.content_index = bool(self.content_index_var.get())
+        if self.cfg.content_index:
+            self._index_content_async()
+        else:
+            self._content_cancel.set()
+            self.content_index = None
+
+    def _index_content_async(self):
+        if not self.project_dir or not self.files_all:
+            return
+        # Une seule mise a jour a la fois : la precedente s'arrete au lot suivant.
+        self._content_cancel.set()
+        cancel = self._content_cancel = threading.Event()
+        root, files, meta = self.project_dir, list(self.files_all), dict(self.file_meta)
+
+        def worker():
+            index = _ContentIndex(root)
+            try:
+                stats = index.update(files, meta, cancel)
+            except Exception as exc:
+                LOGGER.exception("Echec index de contenu", exc_info=exc)
+                return
+            if not cancel.is_set():
+                self.queue.put(("content_indexed", root, index, stats))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _build_import_graph_async(self):
+        if not self.project_dir or not self.files_all:
+            return
+        self._imports_cancel.set()
+        cancel = self._imports_cancel = threading.Event()
+        root, files, meta = self.project_dir, list(self.files_all), dict(self.file_meta)
+
+        def worker():
+            try:
+                graph = _build_import_graph(root, files, meta, cancel)
+            except Exception as exc:
+                LOGGER.exception("Echec graphe des imports", exc_info=exc)
+                return
+            if graph is not None and not cancel.is_set():
+                self.queue.put(("import_graph", root, graph))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _git_hotness_async(self):
+        if not self.project_dir or not _has_git(self.project_dir):
+            return
+        self._hot_cancel.set()
+        cancel = self._hot_cancel = threading.Event()
+        root = self.project_dir
+
+        def worker():
+            try:
+                hotness = _git_hotness(root, cancel=cancel)
+            except Exception as exc:
+                LOGGER.exception("Echec activite git", exc_info=exc)
+                return
+            if hotness is not None and not cancel.is_set():
+                self.queue.put(("hotness", root, hotness))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _loc_stats_async(self):
+        if not self.project_dir or not self.files_all:
+            return
+        self._loc_cancel.set()
+        cancel = self._loc_cancel = threading.Event()
+        root, files = self.project_dir, list(self.files_all)
+
+        def worker():
+            try:
+                stats = _loc_stats(root, files, cancel)
+            except Exception as exc:
+                LOGGER.exception("Echec statistiques de code", exc_info=exc)
+                return
+            if stats is not None and not cancel.is_set():
+                self.queue.put(("loc_stats", root, stats))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _update_loc_tallies(self) -> _LocTally | None:
+        """Met a jour (par difference) les totaux de la selection et, panneau ouvert, des lignes affichees."""
+        if self.loc_stats is None or not self.project_dir:
+            return None
+        scopes = {"selection": [iid for iid in self.tree.selection() if not iid.startswith(CAPPED_IID_PREFIX)]}
+        if self._loc_panel is not None:
+            scopes["visible"] = self._file_rows()
+        for scope, iids in scopes.items():
+            tally = self._loc_tallies.get(scope)
+            if tally is None or tally.root != self.project_dir:
+                tally = self._loc_tallies[scope] = _LocTally(self.project_dir)
+            tally.update(iids, self.loc_stats)
+        return self._loc_tallies["selection"]
+
+    def _open_loc_panel(self):
+        if self._loc_panel is not None:
+            self._loc_panel["win"].lift()
+            return
+        win = tk.Toplevel(self)
+        win.title("Statistiques de code")
+        win.transient(self)
+        frame = ttk.Frame(win, padding=12)
+        frame.pack(fill="both", expand=True)
+        scope_var = tk.StringVar(value="selection")
+        top = ttk.Frame(frame)
+        top.pack(fill="x")
+        for label, value in (("Selection", "selection"), ("Fichiers affiches", "visible")):
+            ttk.Radiobutton(top, text=label, value=value, variable=scope_var, command=self._refresh_loc_panel).pack(side="left", padx=(0, 8))
+        total_label = ttk.Label(frame, text="")
+        total_label.pack(fill="x", pady=(8, 8))
+        tabs = ttk.Notebook(frame)
+        tabs.pack(fill="both", expand=True)
+        trees: dict[str, ttk.Treeview] = {}
+        for by, title in (("ext", "Par extension"), ("dir", "Par dossier")):
+            tab = ttk.Frame(tabs)
+            tabs.add(tab, text=title)
+            cols = ("key", *LOC_FIELDS)
+            tree = ttk.Treeview(tab, columns=cols, show="headings", height=14)
+            tree.heading("key", text="Extension" if by == "ext" else "Dossier")
+            tree.column("key", width=220, anchor="w")
+            for col in LOC_FIELDS:
+                tree.heading(col, text=col.capitalize())
+                tree.column(col, width=90, anchor="e", stretch=False)
+            vsb = ttk.Scrollbar(tab, orient="vertical", command=tree.yview)
+            tree.configure(yscroll=vsb.set)
+            tree.pack(side="left", fill="both", expand=True)
+            vsb.pack(side="left", fill="y")
+            trees[by] = tree
+
+        def closed():
+            self._loc_panel = None
+            self._loc_tallies.pop("visible", None)
+            win.destroy()
+
+        win.protocol("WM_DELETE_WINDOW", closed)
+        self._loc_panel = {"win": win, "scope": scope_var, "total": total_label, "trees": trees}
+        if self.loc_stats is None and self.project_dir:
+            self._loc_stats_async()
+        self._update_loc_tallies()
+        self._refresh_loc_panel()
+
+    def _refresh_loc_panel(self):
+        panel = self._loc_panel
+        if panel is None:
+            return
+        tally = self._loc_tallies.get(panel["scope"].get())
+        for tree in panel["trees"].values():
+            tree.delete(*tree.get_children())
+        if tally is None:
+            panel["total"].config(text="Statistiques en cours de calcul..." if self.project_dir else "Aucun projet ouvert.")
+            return
+        files, code, comments, blank, tokens = tally.total
+        panel["total"].config(
+            text=f"{files} fichier(s) : {code} lignes de code, {comments} de commentaires, {blank} vides - ~{tokens} tokens estimes"
+        )
+        for by, tree in panel["trees"].items():
+            for key, row in tally.rows(by):
+                tree.insert("", "end", values=(key, *row))
+
+    def _toggle_hide_duplicates(self):
+        self.cfg.hide_duplicates = bool(self.hide_duplicates_var.get())
+        if self.cfg.hide_duplicates and self.duplicates is None:
+            self._find_duplicates_async()
+        self._apply()
+
+    def _open_dir_cap_dialog(self):
+        cap = self._dir_cap()
+        dlg = tk.Toplevel(self)
+        dlg.title("Plafond par dossier")
+        dlg.transient(self)
+        dlg.grab_set()
+        frame = ttk.Frame(dlg, padding=12)
+        frame.pack(fill="both", expand=True)
+        files_var = tk.IntVar(value=cap.max_files)
+        mb_var = tk.IntVar(value=cap.max_bytes >> 20)
+        keep_var = tk.IntVar(value=cap.keep)
+        sample_var = tk.StringVar(value=cap.sample)
+        ttk.Label(frame, text="Dossiers plafonnes au scan (fichiers directs, 0 : sans limite)").grid(row=0, column=0, columnspan=2, sticky="w")
+        ttk.Label(frame, text="Au-dela de (fichiers)").grid(row=1, column=0, sticky="w")
+        ttk.Spinbox(frame, from_=0, to=1_000_000, increment=50, textvariable=files_var, width=8).grid(row=1, column=1, sticky="w")
+        ttk.Label(frame, text="ou au-dela de (Mo)").grid(row=2, column=0, sticky="w")
+        ttk.Spinbox(frame, from_=0, to=1 << 20, increment=10, textvariable=mb_var, width=8).grid(row=2, column=1, sticky="w")
+        ttk.Label(frame, text="Fichiers gardes").grid(row=3, column=0, sticky="w")
+        ttk.Spinbox(frame, from_=1, to=10_000, increment=5, textvariable=keep_var, width=8).grid(row=3, column=1, sticky="w")
+        ttk.Label(frame, text="Echantillon").grid(row=4, column=0, columnspan=2, sticky="w", pady=(8, 0))
+        ttk.Radiobutton(frame, text="Les plus recents", value="newest", variable=sample_var).grid(row=5, column=0, columnspan=2, sticky="w")
+        ttk.Radiobutton(frame, text="Les plus gros", value="largest", variable=sample_var).grid(row=6, column=0, columnspan=2, sticky="w")
+        ttk.Radiobutton(frame, text="Repartis dans l'ordre des noms", value="stratified", variable=sample_var).grid(row=7, column=0, columnspan=2, sticky="w")
+
+        def int_of(var: tk.IntVar, default: int) -> int:
+            try:
+                return var.get()
+            except tk.TclError:
+                return default
 
-        self.cancel_event.clear()
-        self.btn_cancel.config(state="normal")
-        self.progress.configure(mode="indeterminate")
-        self.progress.start(10)
-        self.lbl_msg.config(text="Scan en cours...")
-        self.tree.delete(*self.tree.get_children())
-        self._clear_hover()
-        self._last_total = 0
-        self._update_toolbar_stats()
+        def apply():
+            new = _DirCap(
+                int_of(files_var, cap.max_files), int_of(mb_var, cap.max_bytes >> 20) << 20, int_of(keep_var, cap.keep), sample_var.get()
+            )
+            dlg.destroy()
+            self.cfg.dir_cap_files, self.cfg.dir_cap_bytes = new.max_files, new.max_bytes
+            self.cfg.dir_cap_keep, self.cfg.dir_cap_sample = new.keep, new.sample
+            if new.key() != cap.key() and self.project_dir:
+                self._scan_async(self.project_dir)
 
-        try:
-            file_fg = self.colors.get("file_fg", self.colors.get("fg", ""))
-            odd_bg = self.colors.get("row_odd", self.colors.get("bg_alt", ""))
-            even_bg = self.colors.get("row_even", self.colors.get("bg_alt", ""))
-        except Exception:
-            file_fg = ""
-            odd_bg = even_bg = ""
-        self.tree.tag_configure("odd", background=odd_bg, foreground=file_fg)
-        self.tree.tag_configure("even", background=even_bg, foreground=file_fg)
-        self._size_cache.clear()
+        btns = ttk.Frame(frame)
+        btns.grid(row=8, column=0, columnspan=2, pady=(12, 0), sticky="e")
+        ttk.Button(btns, text="Appliquer", command=apply, style="Accent.TButton").pack(side="left", padx=4)
+        ttk.Button(btns, text="Fermer", command=dlg.destroy).pack(side="left", padx=4)
+        dlg.wait_window(dlg)
+
+    def _find_duplicates_async(self):
+        if not self.project_dir or not self.files_all:
+            return
+        self._dups_cancel.set()
+        cancel = self._dups_cancel = threading.Event()
+        root, files = self.project_dir, list(self.files_all)
 
         def worker():
             try:
-                if self.cancel_event.is_set():
-                    self.queue.put(("cancelled", "scan"))
-                    return
-                use_git_base = tracked_only or ai_mode
-                tracked = _git_tracked(root) if use_git_base else set()
-                if tracked:
-                    files = []
-                    for p in tracked:
-                        if not p.exists() or not p.is_file():
-                            continue
-                        if not _is_allowed_file(p):
-                            continue
-                        try:
-                            rel_parts = p.relative_to(root).parts
-                        except Exception:
-                            rel_parts = p.parts
-                        if not _vendor_allows_file(rel_parts, vendor_mode):
-                            continue
-                        files.append(p)
-                    def _rel_key(path: Path) -> str:
-                        try:
-                            return path.relative_to(root).as_posix().casefold()
-                        except Exception:
-                            return str(path).casefold()
-                    files.sort(key=_rel_key)
-                else:
-                    files = _discover(root, vendor_mode)
-
-                attrs = _load_gitattributes(root)
-                if self.cancel_event.is_set():
-                    self.queue.put(("cancelled", "scan"))
+                fingerprints = _fingerprints(root, files, cancel)
+                if fingerprints is None:
                     return
-                self.queue.put(("scan_done", root, vendor_mode, ai_mode, tracked_only, files, tracked, attrs))
+                # La copie la moins profonde sert de reference (les copies vendorisees sont plus bas).
+                ordered = sorted(files, key=lambda fp: (len(fp.parts), fp.as_posix().casefold()))
+                duplicates = _duplicate_map(ordered, fingerprints)
             except Exception as exc:
-                LOGGER.exception("Echec scan", exc_info=exc)
-                self.queue.put(("error", str(exc)))
+                LOGGER.exception("Echec detection des doublons", exc_info=exc)
+                return
+            if not cancel.is_set():
+                self.queue.put(("duplicates", root, duplicates))
 
-        self._scan_thread = threading.Thread(target=worker, daemon=True)
-        self._scan_thread.start()
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _open_grep_dialog(self):
+        if not self.project_dir:
+            return
+        last_query, last_regex, last_case, last_visible = self._grep_last
+        dlg = tk.Toplevel(self)
+        dlg.title("Rechercher dans le contenu")
+        dlg.transient(self)
+        dlg.grab_set()
+        frame = ttk.Frame(dlg, padding=12)
+        frame.pack(fill="both", expand=True)
+        query_var = tk.StringVar(value=last_query)
+        regex_var = tk.BooleanVar(value=last_regex)
+        case_var = tk.BooleanVar(value=last_case)
+        visible_var = tk.BooleanVar(value=last_visible)
+        ttk.Label(frame, text="Texte a rechercher").grid(row=0, column=0, sticky="w")
+        entry = ttk.Entry(frame, textvariable=query_var, width=48)
+        entry.grid(row=1, column=0, sticky="ew", pady=(4, 8))
+        ttk.Checkbutton(frame, text="Expression reguliere", variable=regex_var).grid(row=2, column=0, sticky="w")
+        ttk.Checkbutton(frame, text="Respecter la casse", variable=case_var).grid(row=3, column=0, sticky="w")
+        ttk.Checkbutton(frame, text="Seulement les fichiers affiches", variable=visible_var).grid(row=4, column=0, sticky="w")
+
+        def submit(*_e):
+            query = query_var.get()
+            if not query:
+                return
+            self._grep_last = (query, regex_var.get(), case_var.get(), visible_var.get())
+            dlg.destroy()
+            self._grep(*self._grep_last)
+
+        btns = ttk.Frame(frame)
+        btns.grid(row=5, column=0, pady=(12, 0), sticky="e")
+        ttk.Button(btns, text="Rechercher et selectionner", command=submit, style="Accent.TButton").pack(side="left", padx=4)
+        ttk.Button(btns, text="Fermer", command=dlg.destroy).pack(side="left", padx=4)
+        entry.bind("<Return>", submit)
+        entry.focus_set()
+        entry.select_range(0, "end")
+        dlg.wait_window(dlg)
+
+    def _grep(self, query: str, regex: bool, case_sensitive: bool, visible_only: bool):
+        try:
+            _grep_pattern(query, regex, case_sensitive)
+        except re.error as exc:
+            messagebox.showerror("Recherche", f"Expression reguliere invalide : {exc}")
+            return
+        if visible_only:
+            files = [Path(iid) for iid in self._file_rows()]
+        else:
+            files = list(self.files_all)
+        index = self.content_index if self.content_index is not None and self.content_index.root == self.project_dir else None
+        self.cancel_event.clear()
+        self.btn_cancel.config(state="normal")
+        self.progress.configure(mode="determinate", maximum=max(len(files), 1), value=0)
+        self.lbl_msg.config(text=f"Recherche de \"{_shorten(query, 40)}\"...")
+        self._run_worker(_grep_worker, self.project_dir, files, dict(self.file_meta), query, regex, case_sensitive, index)
 
     def _refresh(self):
         if not self.project_dir:
@@ -2089,7 +7809,7 @@ class ConcatApp(tk.Tk):
         self._apply()
 
     def _sort(self, col: str):
-        if col not in {"name", "size", "rel"}:
+        if col not in {"name", "size", "hot", "rel"}:
             return
         if self.sort_col == col:
             self.sort_reverse = not self.sort_reverse
@@ -2099,8 +7819,8 @@ class ConcatApp(tk.Tk):
         self._apply()
 
     def _update_headings(self):
-        titles = {"name": "Nom", "size": "Taille", "rel": "Chemin relatif"}
-        for col in ("name", "size", "rel"):
+        titles = {"name": "Nom", "size": "Taille", "hot": "Activite", "rel": "Chemin relatif"}
+        for col in ("name", "size", "hot", "rel"):
             title = titles[col]
             if col == self.sort_col:
                 arrow = " v" if self.sort_reverse else " ^"
@@ -2131,76 +7851,81 @@ class ConcatApp(tk.Tk):
         ai_mode = self.ai_filter_var.get()
         respect_gitignore = self.respect_gitignore_var.get()
         self.cfg.respect_gitignore = respect_gitignore
-        ai_skipped = 0
-        ai_reason_counts: Counter[str] = Counter()
-        items: list[tuple[Path, Path, str, int]] = []
-        for fp in self.files_all:
-            try:
-                suffix = _ext_key(fp)
-            except Exception:
-                suffix = fp.suffix.lower()
-            if suffix not in active_exts:
-                continue
-            try:
-                rel = fp.relative_to(self.project_dir)
-                rel_posix = rel.as_posix()
-            except Exception:
-                rel = fp.name
-                rel_posix = str(fp)
-            if pattern and pattern not in rel_posix.lower():
-                continue
-            try:
-                size_bytes = fp.stat().st_size
-            except Exception:
-                size_bytes = None
-            if (ai_mode or respect_gitignore) and self._is_gitignored(fp):
-                if ai_mode:
-                    ai_skipped += 1
-                    ai_reason_counts["gitignore"] += 1
-                continue
-            if ai_mode:
-                # Exclusion .gitignore déjà couverte par _is_gitignored ; gitattributes et taille ici.
-                if self.gitattributes_rules and self._gitattributes_is_excluded(rel_posix):
-                    ai_skipped += 1
-                    ai_reason_counts["gitattributes"] += 1
-                    continue
-                try:
-                    if size_bytes is not None and size_bytes > AI_MAX_BYTES:
-                        ai_skipped += 1
-                        ai_reason_counts["size"] += 1
-                        continue
-                except Exception:
-                    pass
-                reason = _ai_filter_reason(fp, self.project_dir)
-                if reason is not None:
-                    ai_skipped += 1
-                    ai_reason_counts[reason] += 1
-                    continue
-            size_value = size_bytes if size_bytes is not None else 0
-            items.append((fp, rel, rel_posix, size_value))
-
-        if self.sort_by_dir_var.get():
-            items.sort(key=lambda it: (str(Path(it[2]).parent).lower(), it[0].name.lower()))
-        else:
-            if self.sort_col == "size":
+        try:
+            items, ai_reason_counts = _filter_files(
+                self.project_dir,
+                self.files_all,
+                self.file_meta,
+                pattern,
+                active_exts,
+                ai_mode,
+                respect_gitignore,
+                self.gitignore_rules,
+                self.gitattributes_rules,
+                self.path_index,
+                self.git_tracked,
+            )
+        except ValueError as exc:
+            # Requete en cours de saisie ou invalide : la liste affichee reste en l'etat.
+            self.lbl_msg.config(text=f"Filtre invalide : {exc}")
+            return
+        ai_skipped = sum(ai_reason_counts.values())
+        dup_note = ""
+        if self.hide_duplicates_var.get():
+            if self.duplicates is None:
+                dup_note = " Recherche des doublons en cours..."
+            elif self.duplicates:
+                # Un doublon n'est masque que si sa copie de reference reste affichee.
+                shown = {it[0] for it in items}
+                kept = [it for it in items if it[0] not in self.duplicates or self.duplicates[it[0]][0] not in shown]
+                if len(kept) != len(items):
+                    dup_note = f" {len(items) - len(kept)} doublon(s) masque(s)."
+                    items = kept
+
+        hot_of = self.hotness.rel_score if self.hotness is not None else (lambda _rel: 0.0)
+        # Requete floue : l'ordre de pertinence de l'index prime sur la colonne de tri.
+        if not (pattern and _compile_query(pattern).ranked):
+            if self.sort_by_dir_var.get():
+                items.sort(key=lambda it: (str(Path(it[2]).parent).lower(), it[0].name.lower()))
+            elif self.sort_col == "size":
                 items.sort(key=lambda it: it[3])
             elif self.sort_col == "rel":
                 items.sort(key=lambda it: it[2].lower())
+            elif self.sort_col == "hot":
+                # Les plus actifs en tete ; a activite egale, par chemin.
+                items.sort(key=lambda it: (-hot_of(it[2]), it[2].lower()))
             else:
                 items.sort(key=lambda it: it[0].name.lower())
-        if self.sort_reverse:
-            items.reverse()
+            if self.sort_reverse:
+                items.reverse()
 
         selection = set(self.tree.selection())
         self.tree.delete(*self.tree.get_children())
         self._clear_hover()
         self._size_cache = {}
+        # Dossier plafonne : une ligne "N autres fichiers" apres son dernier fichier affiche.
+        last_shown: dict[Path, int] = {}
+        if self.capped_dirs:
+            for idx, it in enumerate(items):
+                if it[0].parent in self.capped_dirs:
+                    last_shown[it[0].parent] = idx
+        capped_after = {idx: d for d, idx in last_shown.items()}
         for idx, (fp, _rel, rel_posix, size_bytes) in enumerate(items):
             iid = str(fp)
             self._size_cache[iid] = size_bytes
             display_size = _human_bytes(size_bytes)
             tags = ("odd",) if idx % 2 == 0 else ("even",)
-            self.tree.insert("", "end", iid=iid, values=(fp.name, display_size, rel_posix), tags=tags)
+            hot = hot_of(rel_posix)
+            self.tree.insert("", "end", iid=iid, values=(fp.name, display_size, f"{hot:.1f}" if hot else "", rel_posix), tags=tags)
+            if idx in capped_after:
+                d = capped_after[idx]
+                hidden, hidden_bytes = self.capped_dirs[d]
+                rel_dir = rel_posix.rpartition("/")[0]
+                self.tree.insert(
+                    "", "end", iid=f"{CAPPED_IID_PREFIX}{d}",
+                    values=(f"... {hidden} autres fichiers", _human_bytes(hidden_bytes), "", f"{rel_dir}/" if rel_dir else "./"),
+                    tags=("capped",),
+                )
         if selection:
             keep = [iid for iid in selection if iid in self.tree.get_children("")]
             if keep:
@@ -2218,14 +7943,14 @@ class ConcatApp(tk.Tk):
                 reasons_text = f" Motifs : {formatted}."
             if ai_skipped:
                 self.lbl_msg.config(
-                    text=f"{self._last_total} fichier(s) affiches. Filtre IA actif : {ai_skipped} ignores.{reasons_text}"
+                    text=f"{self._last_total} fichier(s) affiches. Filtre IA actif : {ai_skipped} ignores.{reasons_text}{dup_note}"
                 )
             else:
                 self.lbl_msg.config(
-                    text=f"{self._last_total} fichier(s) affiches. Filtre IA actif.{reasons_text}"
+                    text=f"{self._last_total} fichier(s) affiches. Filtre IA actif.{reasons_text}{dup_note}"
                 )
         else:
-            self.lbl_msg.config(text=f"{self._last_total} fichier(s) affiches.")
+            self.lbl_msg.config(text=f"{self._last_total} fichier(s) affiches.{dup_note}")
         self._update_toolbar_stats()
 
     def _update_action_states(self):
@@ -2269,12 +7994,27 @@ class ConcatApp(tk.Tk):
         self._clear_hover()
 
     def _on_tree_select(self, _event=None):
+        capped = [iid for iid in self.tree.selection() if iid.startswith(CAPPED_IID_PREFIX)]
+        if capped:
+            # Une ligne "N autres fichiers" ne se selectionne pas : elle renseigne sur le dossier.
+            self.tree.selection_remove(capped)
+            d = Path(capped[-1][len(CAPPED_IID_PREFIX):])
+            hidden, hidden_bytes = self.capped_dirs.get(d, (0, 0))
+            self.lbl_msg.config(text=f"{hidden} fichier(s) ({_human_bytes(hidden_bytes)}) de ce dossier masques par le plafond par dossier.")
         self._counter()
         self._show_preview()
 
+    def _file_rows(self) -> list[str]:
+        """Lignes de fichiers de la liste (sans les lignes des dossiers plafonnes)."""
+        return [iid for iid in self.tree.get_children() if not iid.startswith(CAPPED_IID_PREFIX)]
+
+    def _selected_paths(self) -> list[Path]:
+        return [Path(iid) for iid in self.tree.selection() if not iid.startswith(CAPPED_IID_PREFIX)]
+
     def _show_preview(self):
         sel = self.tree.selection()
         if not sel:
+            self._close_large_view()
             self.preview_path = None
             self.lbl_preview.config(text="Aucun fichier selectionne")
             self.txt.configure(state="normal")
@@ -2301,6 +8041,12 @@ class ConcatApp(tk.Tk):
         except Exception:
             if size_bytes is None:
                 size_bytes = 0
+        if size_bytes and size_bytes >= LARGE_VIEW_MIN:
+            self._open_large_view(path)
+            self._update_preview_buttons()
+            self._update_preview_meta(size_bytes, mtime)
+            return
+        self._close_large_view()
         try:
             content = _read_preview(path)
         except Exception as exc:
@@ -2312,6 +8058,140 @@ class ConcatApp(tk.Tk):
         self._update_preview_buttons()
         self._update_preview_meta(size_bytes, mtime)
 
+    def _open_large_view(self, path: Path):
+        if self._large_view and self._large_view.path == path:
+            return
+        self._close_large_view()
+        try:
+            view = _MappedFile(path)
+        except Exception as exc:
+            self.txt.configure(state="normal")
+            self.txt.delete("1.0", "end")
+            self.txt.insert("1.0", f"Erreur de lecture: {exc}")
+            self.txt.configure(state="disabled")
+            return
+        self._large_view = view
+        self._large_top = 0
+        self._large_hit = None
+        self._large_left = 0
+        self.large_bar.pack(fill="x", before=self.txt_frame)
+        # Là je prends la main sur le defilement : le widget ne contient que la fenetre visible.
+        self.txt_vsb.configure(command=self._large_yview)
+        self.txt.configure(yscrollcommand="")
+        self.lbl_large_status.config(text="Indexation des lignes...")
+
+        def progress(lines: int, done: bool):
+            self.queue.put(("large_index", view, lines, done))
+
+        threading.Thread(target=view.build_index, kwargs={"progress": progress}, daemon=True).start()
+        self._large_render()
+
+    def _close_large_view(self):
+        view = self._large_view
+        if view is None:
+            return
+        self._large_view = None
+        self._large_hit = None
+        view.close()
+        self.large_bar.pack_forget()
+        self.txt_vsb.configure(command=self.txt.yview)
+        self.txt.configure(yscrollcommand=self.txt_vsb.set)
+
+    def _large_rows(self) -> int:
+        try:
+            line_px = self.mono.metrics("linespace") + 6
+            return max(1, self.txt.winfo_height() // max(1, line_px))
+        except Exception:
+            return 40
+
+    def _large_render(self):
+        view = self._large_view
+        if not view:
+            return
+        rows = self._large_rows()
+        lines = view.lines(self._large_top, rows, left=self._large_left)
+        self.txt.configure(state="normal")
+        self.txt.delete("1.0", "end")
+        self.txt.insert("1.0", "\n".join(lines))
+        if self._large_hit:
+            line, col, length = self._large_hit
+            row = line - self._large_top
+            if 0 <= row < len(lines):
+                c0, c1 = view.columns(line, self._large_left, col, col + length)
+                self.txt.tag_add("match", f"{row + 1}.{c0}", f"{row + 1}.{c1}")
+        self.txt.configure(state="disabled")
+        total = view.line_count
+        first = min(1.0, self._large_top / total)
+        last = min(1.0, (self._large_top + rows) / total)
+        self.txt_vsb.set(first, last)
+        suffix = "" if view.index_done else "+ (indexation...)"
+        if self._large_left:
+            suffix += f", a partir de l'octet {self._large_left + 1}"
+        self.lbl_large_status.config(
+            text=f"Lignes {self._large_top + 1}-{self._large_top + len(lines)} / {total}{suffix}"
+        )
+
+    def _large_set_top(self, top: int):
+        view = self._large_view
+        if not view:
+            return
+        rows = self._large_rows()
+        upper = max(0, view.line_count - rows) if view.index_done else view.line_count + rows
+        self._large_top = max(0, min(int(top), upper))
+        self._large_render()
+
+    def _large_yview(self, *args):
+        if not self._large_view or not args:
+            return
+        if args[0] == "moveto":
+            self._large_set_top(float(args[1]) * self._large_view.line_count)
+        elif args[0] == "scroll":
+            step = self._large_rows() if len(args) > 2 and args[2] == "pages" else 1
+            self._large_set_top(self._large_top + int(args[1]) * step)
+
+    def _on_preview_wheel(self, event: tk.Event):
+        if not self._large_view:
+            return None
+        if getattr(event, "num", None) == 4:
+            delta = -3
+        elif getattr(event, "num", None) == 5:
+            delta = 3
+        else:
+            delta = -3 if event.delta > 0 else 3
+        self._large_set_top(self._large_top + delta)
+        return "break"
+
+    def _large_goto(self):
+        if not self._large_view:
+            return
+        try:
+            line = int(self.large_goto_var.get().strip())
+        except ValueError:
+            self.lbl_large_status.config(text="Numero de ligne invalide.")
+            return
+        self._large_hit = None
+        self._large_left = 0
+        self._large_set_top(line - 1)
+
+    def _large_search_next(self):
+        view = self._large_view
+        needle = self.large_search_var.get()
+        if not view or not needle:
+            return
+        # Reprise juste apres l'occurrence courante : une autre occurrence de la meme ligne est trouvee.
+        start, col = (self._large_hit[0], self._large_hit[1] + 1) if self._large_hit else (self._large_top, 0)
+        self.lbl_large_status.config(text="Recherche...")
+
+        def worker():
+            try:
+                found = view.search(needle, start, col)
+            except Exception as exc:
+                found = None
+                LOGGER.exception("Echec recherche apercu", exc_info=exc)
+            self.queue.put(("large_search", view, needle, found))
+
+        threading.Thread(target=worker, daemon=True).start()
+
     def _update_preview_buttons(self):
         state = "normal" if self.preview_path and self.preview_path.exists() else "disabled"
         self.btn_copy_preview.config(state=state)
@@ -2374,7 +8254,9 @@ class ConcatApp(tk.Tk):
     def _popup(self, event: tk.Event):
         row = self.tree.identify_row(event.y)
         if row:
-            self.tree.selection_set(row)
+            # Clic droit dans une selection multiple : on la garde (actions sur les dependances).
+            if row not in self.tree.selection():
+                self.tree.selection_set(row)
             try:
                 self.menu.tk_popup(event.x_root, event.y_root)
             finally:
@@ -2389,6 +8271,56 @@ class ConcatApp(tk.Tk):
             self._copy_path_selected()
         elif action == "toggle":
             self._invert()
+        elif action == "deps":
+            self._select_imports(False)
+        elif action == "dependents":
+            self._select_imports(True)
+
+    def _select_imports(self, reverse: bool):
+        """Etend la selection a la fermeture des imports (dependances, ou dependants si reverse)."""
+        seeds = self._selected_paths()
+        if not seeds:
+            return
+        if self.import_graph is None:
+            self.lbl_msg.config(text="Graphe des imports en cours de construction, reessayez dans un instant.")
+            return
+        closure = self.import_graph.closure(seeds, reverse=reverse)
+        shown = [str(fp) for fp in closure if self.tree.exists(str(fp))]
+        self.tree.selection_set(shown)
+        what = "dependant(s)" if reverse else "dependance(s)"
+        text = f"{len(closure) - len(seeds)} {what} ajoute(s) a la selection."
+        hidden = len(closure) - len(shown)
+        if hidden:
+            text += f" {hidden} masque(s) par le filtre, non selectionne(s)."
+        self.lbl_msg.config(text=text)
+        self._counter()
+
+    def _select_hottest(self):
+        """Selectionne les N fichiers affiches les plus actifs d'apres l'historique git."""
+        if not self.project_dir:
+            return
+        if self.hotness is None:
+            if _has_git(self.project_dir):
+                self.lbl_msg.config(text="Historique git en cours de lecture, reessayez dans un instant.")
+            else:
+                self.lbl_msg.config(text="Pas de depot git : activite des fichiers indisponible.")
+            return
+        n = simpledialog.askinteger(
+            "Fichiers les plus actifs", "Nombre de fichiers a selectionner :",
+            initialvalue=self._hot_top, minvalue=1, maxvalue=100_000, parent=self,
+        )
+        if not n:
+            return
+        self._hot_top = n
+        top = self.hotness.top(map(Path, self._file_rows()), n)
+        self.tree.selection_set([str(fp) for fp in top])
+        if top:
+            self.tree.see(str(top[0]))
+        text = f"{len(top)} fichier(s) les plus actifs selectionne(s)"
+        if len(top) < n:
+            text += " (les autres fichiers affiches n'ont pas ete modifies dans la fenetre d'historique)"
+        self.lbl_msg.config(text=text + ".")
+        self._counter()
 
     def _open_file(self, _event: tk.Event):
         self._open_selected()
@@ -2419,7 +8351,7 @@ class ConcatApp(tk.Tk):
             messagebox.showerror("Erreur", "Impossible d'afficher le fichier.")
 
     def _sel_all(self):
-        self.tree.selection_set(self.tree.get_children())
+        self.tree.selection_set(self._file_rows())
         self._counter()
 
     def _clear(self):
@@ -2428,7 +8360,7 @@ class ConcatApp(tk.Tk):
 
     def _invert(self):
         current = set(self.tree.selection())
-        all_items = set(self.tree.get_children())
+        all_items = set(self._file_rows())
         new_sel = all_items - current
         self.tree.selection_set(list(new_sel))
         self._counter()
@@ -2597,16 +8529,17 @@ class ConcatApp(tk.Tk):
         except Exception as exc:
             messagebox.showerror("Erreur", f"Impossible de lancer le terminal: {exc}")
 
-    def _run_worker(self, target, *args):
-        threading.Thread(target=target, args=(*args, self.queue, self.cancel_event), daemon=True).start()
+    def _run_worker(self, target, *args, **kwargs):
+        threading.Thread(target=target, args=(*args, self.queue, self.cancel_event), kwargs=kwargs, daemon=True).start()
 
     def _copy_sel(self):
         if not self.project_dir:
             return
-        sel = [Path(iid) for iid in self.tree.selection()]
+        sel = self._selected_paths()
         if not sel:
             messagebox.showinfo("Copie", "Selectionnez au moins un fichier.")
             return
+        sel = self._export_targets(sel)
         sensitive = [fp for fp in sel if _is_sensitive_file(fp)]
         note = ""
         if self.safe_export_exclude_sensitive_var.get():
@@ -2622,19 +8555,24 @@ class ConcatApp(tk.Tk):
         self.cancel_event.clear()
         self.btn_cancel.config(state="normal")
         self.progress.configure(mode="determinate", maximum=len(sel), value=0)
-        self.lbl_msg.config(text=f"Copie en cours...{note}")
+        self.lbl_msg.config(text=f"Copie en cours...{note}{self._export_mode_note()}")
         self.btn_copy.config(state="disabled")
         self.btn_export.config(state="disabled")
-        self._run_worker(_copy_structured, self.project_dir, sel)
+        self._run_worker(_copy_structured, self.project_dir, sel, options=self.export_options)
 
-    def _export_sel(self):
+    def _export_sel(self, split: bool = False):
+        """Exporte la selection dans un fichier, ou avec split un export par module (_export_split) dans un dossier."""
         if not self.project_dir:
             return
-        sel = [Path(iid) for iid in self.tree.selection()]
+        sel = self._selected_paths()
         if not sel:
             messagebox.showinfo("Export", "Selectionnez au moins un fichier.")
             return
-        out = filedialog.asksaveasfilename(parent=self, defaultextension=".txt", initialfile=DEFAULT_OUT)
+        sel = self._export_targets(sel)
+        if split:
+            out = filedialog.askdirectory(parent=self, title="Dossier des exports par module", mustexist=False)
+        else:
+            out = filedialog.asksaveasfilename(parent=self, defaultextension=".txt", initialfile=DEFAULT_OUT)
         if not out:
             return
         sensitive = [fp for fp in sel if _is_sensitive_file(fp)]
@@ -2653,10 +8591,162 @@ class ConcatApp(tk.Tk):
         self.cancel_event.clear()
         self.btn_cancel.config(state="normal")
         self.progress.configure(mode="determinate", maximum=len(sel), value=0)
-        self.lbl_msg.config(text=f"Export en cours...{note}")
+        self.lbl_msg.config(text=f"Export en cours...{note}{self._export_mode_note()}")
         self.btn_copy.config(state="disabled")
         self.btn_export.config(state="disabled")
-        self._run_worker(_export, self.project_dir, sel, out_path)
+        self._run_worker(_export_split if split else _export, self.project_dir, sel, out_path, options=self.export_options)
+
+    def _export_targets(self, sel: list[Path]) -> list[Path]:
+        """Prepare les options d'export ; en mode mixte, ajoute a la selection les autres fichiers affiches."""
+        self.export_options.graph = self.import_graph
+        self.export_options.hotness = self.hotness
+        self.export_options.keep_full = frozenset(sel)
+        self.export_options.capped = dict(self.capped_dirs)
+        self.export_options.dependency_api = self.vendor_mode_var.get() == "api"
+        if self.export_options.mode != "mixed":
+            return sel
+        chosen = set(sel)
+        return sel + [fp for fp in map(Path, self._file_rows()) if fp not in chosen]
+
+    def _export_mode_note(self) -> str:
+        mode = self.export_options.describe()
+        return f" [{mode}]" if mode else ""
+
+    def _open_export_options_dialog(self):
+        opts = self.export_options
+        dlg = tk.Toplevel(self)
+        dlg.title("Options d'export")
+        dlg.transient(self)
+        dlg.grab_set()
+        frame = ttk.Frame(dlg, padding=12)
+        frame.pack(fill="both", expand=True)
+        mode_var = tk.StringVar(value=opts.mode)
+        query_var = tk.StringVar(value=opts.query or self._grep_last[0])
+        regex_var = tk.BooleanVar(value=opts.regex)
+        case_var = tk.BooleanVar(value=opts.case_sensitive)
+        context_var = tk.IntVar(value=opts.context)
+        order_var = tk.StringVar(value=opts.order)
+        comments_var = tk.BooleanVar(value=opts.strip_comments)
+        docstrings_var = tk.BooleanVar(value=opts.strip_docstrings)
+        blank_var = tk.BooleanVar(value=opts.collapse_blank)
+        indent_var = tk.BooleanVar(value=opts.normalize_indent)
+        shared_var = tk.BooleanVar(value=opts.shared_blocks)
+        dups_var = tk.BooleanVar(value=opts.collapse_duplicates)
+        trunc_kb_var = tk.IntVar(value=opts.truncate_bytes >> 10)
+        trunc_lines_var = tk.IntVar(value=opts.truncate_lines)
+        head_var = tk.IntVar(value=opts.head_lines)
+        tail_var = tk.IntVar(value=opts.tail_lines)
+        summarize_var = tk.BooleanVar(value=opts.summarize_data)
+        notebooks_var = tk.BooleanVar(value=opts.notebooks)
+        blobs_var = tk.BooleanVar(value=opts.strip_blobs)
+        i18n_var = tk.BooleanVar(value=opts.i18n)
+        locale_var = tk.StringVar(value=opts.i18n_locale)
+        ttk.Label(frame, text="Contenu des fichiers").grid(row=0, column=0, columnspan=2, sticky="w")
+        ttk.Radiobutton(frame, text="Fichiers complets", value="full", variable=mode_var).grid(row=1, column=0, columnspan=2, sticky="w")
+        ttk.Radiobutton(frame, text="Extraits autour des correspondances", value="excerpt", variable=mode_var).grid(row=2, column=0, columnspan=2, sticky="w")
+        ttk.Radiobutton(frame, text="Squelette (signatures et docstrings, corps elides)", value="skeleton", variable=mode_var).grid(row=3, column=0, columnspan=2, sticky="w")
+        ttk.Radiobutton(
+            frame, text="Mixte : selection complete, squelette des autres fichiers affiches", value="mixed", variable=mode_var
+        ).grid(row=4, column=0, columnspan=2, sticky="w")
+        ttk.Label(frame, text="Recherche").grid(row=5, column=0, sticky="w", pady=(8, 0))
+        ttk.Entry(frame, textvariable=query_var, width=40).grid(row=5, column=1, sticky="ew", pady=(8, 0))
+        ttk.Checkbutton(frame, text="Expression reguliere", variable=regex_var).grid(row=6, column=1, sticky="w")
+        ttk.Checkbutton(frame, text="Respecter la casse", variable=case_var).grid(row=7, column=1, sticky="w")
+        ttk.Label(frame, text="Lignes de contexte").grid(row=8, column=0, sticky="w")
+        ttk.Spinbox(frame, from_=0, to=200, textvariable=context_var, width=6).grid(row=8, column=1, sticky="w")
+        ttk.Label(frame, text="Ordre des fichiers").grid(row=9, column=0, columnspan=2, sticky="w", pady=(8, 0))
+        ttk.Radiobutton(frame, text="Par chemin", value="path", variable=order_var).grid(row=10, column=0, columnspan=2, sticky="w")
+        ttk.Radiobutton(frame, text="Dependances d'abord (imports)", value="deps", variable=order_var).grid(row=11, column=0, columnspan=2, sticky="w")
+        ttk.Radiobutton(
+            frame, text="Fichiers les plus actifs d'abord (historique git)", value="hot", variable=order_var
+        ).grid(row=12, column=0, columnspan=2, sticky="w")
+        ttk.Label(frame, text="Allegement (hors mode extraits)").grid(row=13, column=0, columnspan=2, sticky="w", pady=(8, 0))
+        ttk.Checkbutton(frame, text="Retirer les commentaires", variable=comments_var).grid(row=14, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(frame, text="Retirer les docstrings Python", variable=docstrings_var).grid(row=15, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(frame, text="Fusionner les lignes vides, espaces de fin", variable=blank_var).grid(row=16, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(frame, text="Indentation en tabulations", variable=indent_var).grid(row=17, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(
+            frame, text="Factoriser les en-tetes et pieds communs (licences, bandeaux)", variable=shared_var
+        ).grid(row=18, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(
+            frame, text="Regrouper les doublons (renvoi si identique, diff si proche)", variable=dups_var
+        ).grid(row=19, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(
+            frame, text="Notebooks Jupyter en script (code et markdown, sorties resumees)", variable=notebooks_var
+        ).grid(row=20, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(
+            frame, text="Remplacer les blobs (base64, hex, data:, SVG, JSON embarque) par leur empreinte", variable=blobs_var
+        ).grid(row=21, column=0, columnspan=2, sticky="w")
+        ttk.Checkbutton(
+            frame, text="Traductions : une langue complete, ecarts de cles pour les autres", variable=i18n_var
+        ).grid(row=22, column=0, columnspan=2, sticky="w")
+        ttk.Label(frame, text="Langue de reference").grid(row=23, column=0, sticky="w")
+        ttk.Entry(frame, textvariable=locale_var, width=8).grid(row=23, column=1, sticky="w")
+        ttk.Label(frame, text="Gros fichiers (hors mode extraits, 0 : jamais tronques)").grid(row=24, column=0, columnspan=2, sticky="w", pady=(8, 0))
+        ttk.Checkbutton(
+            frame, text=f"Resumer les JSON, XML et SQL de plus de {SUMMARY_MIN_BYTES >> 10} Ko (schema, premiers elements)", variable=summarize_var
+        ).grid(row=25, column=0, columnspan=2, sticky="w")
+        ttk.Label(frame, text="Tronquer au-dela de (Ko)").grid(row=26, column=0, sticky="w")
+        ttk.Spinbox(frame, from_=0, to=1 << 20, increment=64, textvariable=trunc_kb_var, width=8).grid(row=26, column=1, sticky="w")
+        ttk.Label(frame, text="ou au-dela de (lignes)").grid(row=27, column=0, sticky="w")
+        ttk.Spinbox(frame, from_=0, to=10_000_000, increment=500, textvariable=trunc_lines_var, width=8).grid(row=27, column=1, sticky="w")
+        ttk.Label(frame, text="Lignes gardees en tete").grid(row=28, column=0, sticky="w")
+        ttk.Spinbox(frame, from_=0, to=100_000, increment=50, textvariable=head_var, width=8).grid(row=28, column=1, sticky="w")
+        ttk.Label(frame, text="Lignes gardees en queue").grid(row=29, column=0, sticky="w")
+        ttk.Spinbox(frame, from_=0, to=100_000, increment=50, textvariable=tail_var, width=8).grid(row=29, column=1, sticky="w")
+
+        def int_of(var: tk.IntVar, default: int) -> int:
+            try:
+                return var.get()
+            except tk.TclError:
+                return default
+
+        def apply():
+            context = int_of(context_var, opts.context)
+            candidate = _ExportOptions(
+                mode_var.get(),
+                query_var.get(),
+                regex_var.get(),
+                case_var.get(),
+                context,
+                order_var.get(),
+                self.import_graph,
+                comments_var.get(),
+                docstrings_var.get(),
+                blank_var.get(),
+                indent_var.get(),
+                shared_var.get(),
+                dups_var.get(),
+                int_of(trunc_kb_var, opts.truncate_bytes >> 10) << 10,
+                int_of(trunc_lines_var, opts.truncate_lines),
+                int_of(head_var, opts.head_lines),
+                int_of(tail_var, opts.tail_lines),
+                summarize_var.get(),
+                notebooks_var.get(),
+                blobs_var.get(),
+                i18n_var.get(),
+                locale_var.get(),
+            )
+            candidate.hotness = self.hotness
+            if candidate.mode == "excerpt":
+                if not candidate.query:
+                    messagebox.showwarning("Options d'export", "Indiquez le texte a rechercher pour le mode extraits.", parent=dlg)
+                    return
+                try:
+                    _grep_pattern(candidate.query, candidate.regex, candidate.case_sensitive)
+                except re.error as exc:
+                    messagebox.showerror("Options d'export", f"Expression reguliere invalide : {exc}", parent=dlg)
+                    return
+            self.export_options = candidate
+            mode = candidate.describe()
+            self.lbl_msg.config(text=f"Export : {mode}." if mode else "Export : fichiers complets.")
+            dlg.destroy()
+
+        btns = ttk.Frame(frame)
+        btns.grid(row=30, column=0, columnspan=2, pady=(12, 0), sticky="e")
+        ttk.Button(btns, text="Appliquer", command=apply, style="Accent.TButton").pack(side="left", padx=4)
+        ttk.Button(btns, text="Fermer", command=dlg.destroy).pack(side="left", padx=4)
+        dlg.wait_window(dlg)
 
     def _extract_env(self):
         if not self.project_dir:
@@ -2670,157 +8760,339 @@ class ConcatApp(tk.Tk):
         files = self.files_all or []
         self._run_worker(_env_extract_worker, self.project_dir, files)
 
-    def _process(self):
+    def _wake(self):
+        # Appele depuis les threads de travail : un seul evenement par lot, jusqu'a ce que _process vide la file.
+        with self._wake_lock:
+            if self._wake_pending or not self._loop_running:
+                return
+            self._wake_pending = True
         try:
-            while True:
-                kind, *payload = self.queue.get_nowait()
-                if kind == "scan_done":
-                    root, vendor_mode_state, ai_mode_state, tracked_flag_state, files, git_tracked_set, gitattributes_rules = payload
-                    if self.cancel_event.is_set():
-                        self._scan_thread = None
-                        self.progress.stop()
-                        self.progress.configure(mode="determinate", value=0)
-                        self.lbl_msg.config(text="Scan annule.")
-                        self.btn_cancel.config(state="disabled")
-                        self.cancel_event.clear()
-                        continue
-                    if self.project_dir and Path(root) != self.project_dir:
-                        self._scan_thread = None
-                        continue
-
-                    current_vendor_state = _normalize_vendor_mode(self.vendor_mode_var.get()) if hasattr(self, "vendor_mode_var") else "none"
-                    current_ai_mode = bool(self.ai_filter_var.get()) if hasattr(self, "ai_filter_var") else False
-                    current_tracked_flag = bool(self.tracked_only_var.get()) if hasattr(self, "tracked_only_var") else False
-                    if current_vendor_state != vendor_mode_state or current_ai_mode != ai_mode_state or current_tracked_flag != tracked_flag_state:
-                        self._scan_thread = None
-                        if self.project_dir:
-                            self._scan_async(self.project_dir)
-                        continue
+            self.event_generate("<<WorkerQueue>>", when="tail")
+        except (RuntimeError, tk.TclError):
+            with self._wake_lock:
+                self._wake_pending = False
 
-                    self.files_all = files
-                    self.git_tracked = set(git_tracked_set) if git_tracked_set else set()
-                    self.gitattributes_rules = gitattributes_rules or []
-
-                    self._scan_thread = None
-                    self.progress.stop()
-                    self.progress.configure(mode="determinate", value=0)
-                    self.lbl_msg.config(text=f"{len(files)} fichier(s) detectes.")
-                    self.btn_cancel.config(state="disabled")
-                    self.cancel_event.clear()
-                    self._apply()
-                elif kind == "done_env":
-                    vars_to_paths, text = payload
-                    self.progress.stop()
-                    self.progress.configure(mode="determinate", value=0)
-                    self.btn_cancel.config(state="disabled")
-                    self.cancel_event.clear()
-
-                    total = len(vars_to_paths)
-                    if total == 0:
-                        messagebox.showinfo("Extraction ENV", "Aucune variable d'environnement detectee.")
-                        self.lbl_msg.config(text="Aucune variable detectee.")
-                        continue
+    def _schedule_process(self, delay: int):
+        if self._process_after_id is not None:
+            return
+        self._process_after_id = self.after(delay, self._process)
 
-                    out = filedialog.asksaveasfilename(
-                        parent=self,
-                        defaultextension=".example",
-                        initialfile=".env.example",
-                        title="Enregistrer le modele .env",
-                    )
-                    if out:
-                        try:
-                            Path(out).write_text(text, encoding="utf-8", newline="\n")
-                            messagebox.showinfo("Succes", f"{total} variable(s) detectee(s).\nFichier ecrit : {out}")
-                            self.lbl_msg.config(text="Modele .env ecrit.")
-                        except Exception as exc:
-                            LOGGER.exception("Echec ecriture .env", exc_info=exc)
-                            messagebox.showerror("Erreur", f"Impossible d'ecrire le fichier : {exc}")
-                            self.lbl_msg.config(text="Echec ecriture .env")
-                    else:
-                        self.clipboard_clear()
-                        self.clipboard_append(text)
-                        messagebox.showinfo(
-                            "Copie",
-                            f"{total} variable(s) detectee(s).\nModele copie dans le presse-papiers.",
-                        )
-                        self.lbl_msg.config(text="Modele .env copie.")
-                elif kind == "progress":
-                    i, total = payload
-                    self.progress.configure(mode="determinate", maximum=total, value=i)
-                elif kind == "clip_ready":
-                    total, full_text = payload
-                    self.progress.stop()
-                    self.progress.configure(mode="determinate", value=0)
-                    self.clipboard_clear()
-                    self.clipboard_append(full_text)
-                    self.lbl_msg.config(text=f"Copie terminee ({total} fichier(s)).")
-                    self.btn_cancel.config(state="disabled")
-                    self.cancel_event.clear()
-                    messagebox.showinfo("Succes", "Texte copie dans le presse-papiers.")
-                    self._counter()
-                elif kind == "too_large_for_clipboard":
-                    total, full_text = payload
-                    self.progress.stop()
-                    self.progress.configure(mode="determinate", value=0)
-                    self.btn_cancel.config(state="disabled")
-                    self.cancel_event.clear()
-                    self.lbl_msg.config(text="Selection volumineuse.")
-                    if messagebox.askyesno(
-                        "Trop volumineux",
-                        "La selection est trop volumineuse pour le presse-papiers.\nSouhaitez-vous exporter dans un fichier ?",
-                    ):
-                        out = filedialog.asksaveasfilename(parent=self, defaultextension=".txt", initialfile=DEFAULT_OUT)
-                        if out:
-                            try:
-                                Path(out).write_text(full_text, encoding="utf-8", newline="\n")
-                                messagebox.showinfo("Succes", f"Selection exportee vers {out}")
-                            except Exception as exc:
-                                LOGGER.exception("Echec ecriture export volumineux", exc_info=exc)
-                                messagebox.showerror("Erreur", f"Impossible d'ecrire le fichier : {exc}")
-                    self._counter()
-                elif kind == "done_export":
-                    total, out_path = payload
-                    self.progress.stop()
-                    self.progress.configure(mode="determinate", value=0)
-                    self.lbl_msg.config(text="Export termine.")
-                    self.btn_cancel.config(state="disabled")
-                    self.cancel_event.clear()
-                    messagebox.showinfo("Succes", f"{total} fichier(s) exporte(s) dans\n{out_path}")
-                    self._counter()
-                elif kind == "cancelled":
-                    op, = payload
-                    self.progress.stop()
-                    self.progress.configure(mode="determinate", value=0)
-                    self.btn_cancel.config(state="disabled")
-                    self.cancel_event.clear()
-                    msg = {
-                        "scan": "Scan annule.",
-                        "copy": "Copie annulee.",
-                        "export": "Export annule.",
-                        "env": "Extraction ENV annulee.",
-                    }.get(op, f"Operation {op} annulee.")
-                    self.lbl_msg.config(text=msg)
-                elif kind == "error":
-                    msg, = payload
-                    self.progress.stop()
-                    self.progress.configure(mode="determinate", value=0)
-                    self.lbl_msg.config(text="Erreur")
-                    self.btn_cancel.config(state="disabled")
-                    self.cancel_event.clear()
-                    messagebox.showerror("Erreur", msg)
-        except queue.Empty:
-            pass
+    def _process(self, *_e):
+        self._process_after_id = None
+        # Une boite de dialogue ouverte par un message relance la boucle Tk : pas de traitement imbrique,
+        # le lot en cours reprend a sa fermeture.
+        if self._processing:
+            return
+        self._processing = True
+        deadline = time.monotonic() + QUEUE_TICK_BUDGET
+        handled = 0
+        pending_progress = None
+        try:
+            while handled < QUEUE_TICK_MAX and time.monotonic() < deadline:
+                try:
+                    msg = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                handled += 1
+                # Là je ne garde que la derniere progression du lot : inutile de redessiner chaque etape.
+                if msg[0] == "progress":
+                    pending_progress = msg
+                    continue
+                if pending_progress is not None:
+                    self._dispatch(*pending_progress)
+                    pending_progress = None
+                self._dispatch(*msg)
+            if pending_progress is not None:
+                self._dispatch(*pending_progress)
         finally:
-            self.after(100, self._process)
+            self._processing = False
+            with self._wake_lock:
+                # File vide : le prochain depot reposte l'evenement ; sinon la relance ci-dessous suffit.
+                more = not self.queue.empty()
+                self._wake_pending = more
+            if more:
+                # Budget du tick epuise : je rends la main a Tk et je reprends juste apres.
+                self._schedule_process(1)
+            elif not self._tk_threaded:
+                self._schedule_process(100)
+
+    def _dispatch(self, kind: str, *payload):
+        if kind == "scan_done":
+            root, vendor_mode_state, ai_mode_state, tracked_flag_state, files, git_tracked_set, gitattributes_rules, meta, index, revalidate, capped = payload
+            if self.cancel_event.is_set():
+                self._scan_thread = None
+                self.progress.stop()
+                self.progress.configure(mode="determinate", value=0)
+                self.lbl_msg.config(text="Scan annule.")
+                self.btn_cancel.config(state="disabled")
+                self.cancel_event.clear()
+                return
+            if self.project_dir and Path(root) != self.project_dir:
+                self._scan_thread = None
+                return
+
+            current_vendor_state = _normalize_vendor_mode(self.vendor_mode_var.get()) if hasattr(self, "vendor_mode_var") else "none"
+            current_ai_mode = bool(self.ai_filter_var.get()) if hasattr(self, "ai_filter_var") else False
+            current_tracked_flag = bool(self.tracked_only_var.get()) if hasattr(self, "tracked_only_var") else False
+            if current_vendor_state != vendor_mode_state or current_ai_mode != ai_mode_state or current_tracked_flag != tracked_flag_state:
+                self._scan_thread = None
+                if self.project_dir:
+                    self._scan_async(self.project_dir)
+                return
+
+            unchanged = False
+            added = removed = 0
+            if revalidate:
+                old_meta = self.file_meta
+                added = sum(1 for fp in files if fp not in old_meta)
+                removed = len(old_meta) - (len(files) - added)
+                unchanged = (
+                    not added and not removed and capped == self.capped_dirs and all(m.same_as(old_meta.get(fp)) for fp, m in meta.items())
+                )
+            self.files_all = files
+            self.file_meta = meta
+            self.capped_dirs = capped
+            self.path_index = index
+            self.git_tracked = set(git_tracked_set) if git_tracked_set else set()
+            self.gitattributes_rules = gitattributes_rules or []
+
+            self._scan_thread = None
+            self.progress.stop()
+            self.progress.configure(mode="determinate", value=0)
+            self.lbl_msg.config(text=f"{len(files)} fichier(s) detectes.")
+            self.btn_cancel.config(state="disabled")
+            self.cancel_event.clear()
+            if unchanged:
+                self.lbl_msg.config(text=f"{len(files)} fichier(s) - cache a jour.")
+            else:
+                self._apply()
+                if revalidate:
+                    self.lbl_msg.config(text=f"{self._last_total} fichier(s) affiches - revalidation : +{added} / -{removed}.")
+            if self.cfg.restore_last:
+                self._save_snapshot_async()
+            if self.cfg.content_index:
+                self._index_content_async()
+            if not unchanged or self.import_graph is None:
+                self._build_import_graph_async()
+            if not unchanged or self.loc_stats is None:
+                self._loc_stats_async()
+            # Sans fichier modifie, HEAD a pu avancer (commit) : le cache par HEAD rend l'appel peu couteux.
+            self._git_hotness_async()
+            if self.cfg.hide_duplicates and (not unchanged or self.duplicates is None):
+                self._find_duplicates_async()
+        elif kind == "snapshot_loaded":
+            root, snapshot, index = payload
+            if not self.project_dir or Path(root) != self.project_dir:
+                return
+            if snapshot is None:
+                self._scan_async(self.project_dir)
+                return
+            files, meta, tracked, selection, capped = snapshot
+            self.files_all = files
+            self.file_meta = meta
+            self.capped_dirs = capped
+            self.path_index = index
+            self.git_tracked = tracked
+            self._apply()
+            keep = [str(fp) for fp in selection if self.tree.exists(str(fp))]
+            if keep:
+                self.tree.selection_set(keep)
+                self.tree.see(keep[0])
+            self._scan_async(self.project_dir, revalidate=True)
+        elif kind == "done_env":
+            vars_to_paths, text = payload
+            self.progress.stop()
+            self.progress.configure(mode="determinate", value=0)
+            self.btn_cancel.config(state="disabled")
+            self.cancel_event.clear()
+
+            total = len(vars_to_paths)
+            if total == 0:
+                messagebox.showinfo("Extraction ENV", "Aucune variable d'environnement detectee.")
+                self.lbl_msg.config(text="Aucune variable detectee.")
+                return
+
+            out = filedialog.asksaveasfilename(
+                parent=self,
+                defaultextension=".example",
+                initialfile=".env.example",
+                title="Enregistrer le modele .env",
+            )
+            if out:
+                try:
+                    Path(out).write_text(text, encoding="utf-8", newline="\n")
+                    messagebox.showinfo("Succes", f"{total} variable(s) detectee(s).\nFichier ecrit : {out}")
+                    self.lbl_msg.config(text="Modele .env ecrit.")
+                except Exception as exc:
+                    LOGGER.exception("Echec ecriture .env", exc_info=exc)
+                    messagebox.showerror("Erreur", f"Impossible d'ecrire le fichier : {exc}")
+                    self.lbl_msg.config(text="Echec ecriture .env")
+            else:
+                self.clipboard_clear()
+                self.clipboard_append(text)
+                messagebox.showinfo(
+                    "Copie",
+                    f"{total} variable(s) detectee(s).\nModele copie dans le presse-papiers.",
+                )
+                self.lbl_msg.config(text="Modele .env copie.")
+        elif kind == "large_index":
+            view, _lines, _done = payload
+            if view is self._large_view:
+                self._large_render()
+        elif kind == "large_search":
+            view, needle, found = payload
+            if view is not self._large_view:
+                return
+            if found is None:
+                self._large_hit = None
+                self.lbl_large_status.config(text=f"Aucune occurrence de \"{_shorten(needle, 32)}\".")
+                return
+            line, col, length = found
+            self._large_hit = found
+            # Occurrence au-dela des colonnes affichees : la fenetre se decale vers elle.
+            self._large_left = 0 if col + length <= LARGE_VIEW_COLS else max(0, col - LARGE_VIEW_COLS // 4)
+            self._large_set_top(line - self._large_rows() // 3)
+        elif kind == "content_indexed":
+            root, index, (updated, removed) = payload
+            if not self.project_dir or Path(root) != self.project_dir:
+                return
+            self.content_index = index
+            if updated or removed:
+                self.lbl_msg.config(text=f"Index de contenu a jour : {updated} fichier(s) reindexe(s), {removed} retire(s).")
+        elif kind == "duplicates":
+            root, duplicates = payload
+            if not self.project_dir or Path(root) != self.project_dir:
+                return
+            self.duplicates = duplicates
+            if self.hide_duplicates_var.get():
+                self._apply()
+        elif kind == "loc_stats":
+            root, stats = payload
+            if not self.project_dir or Path(root) != self.project_dir:
+                return
+            self.loc_stats = stats
+            self._loc_tallies = {}
+            self._counter()
+        elif kind == "import_graph":
+            root, graph = payload
+            if not self.project_dir or Path(root) != self.project_dir:
+                return
+            self.import_graph = graph
+        elif kind == "hotness":
+            root, hotness = payload
+            if not self.project_dir or Path(root) != self.project_dir:
+                return
+            if self.hotness is not None and self.hotness.head == hotness.head:
+                return
+            self.hotness = hotness
+            self._apply()
+        elif kind == "grep_done":
+            query, found, read, elapsed = payload
+            self.progress.stop()
+            self.progress.configure(mode="determinate", value=0)
+            self.btn_cancel.config(state="disabled")
+            self.cancel_event.clear()
+            shown = [str(fp) for fp, _count in found if self.tree.exists(str(fp))]
+            self.tree.selection_set(shown)
+            if shown:
+                self.tree.see(shown[0])
+            occurrences = sum(count for _fp, count in found)
+            text = (
+                f"{len(found)} fichier(s) contiennent \"{_shorten(query, 40)}\" "
+                f"({occurrences} occurrence(s), {read} fichier(s) lus en {elapsed:.2f}s)."
+            )
+            hidden = len(found) - len(shown)
+            if hidden:
+                text += f" {hidden} masque(s) par le filtre, non selectionne(s)."
+            self.lbl_msg.config(text=text)
+            self._counter()
+        elif kind == "progress":
+            i, total = payload
+            self.progress.configure(mode="determinate", maximum=total, value=i)
+        elif kind == "clip_ready":
+            total, full_text = payload
+            self.progress.stop()
+            self.progress.configure(mode="determinate", value=0)
+            self.clipboard_clear()
+            self.clipboard_append(full_text)
+            self.lbl_msg.config(text=f"Copie terminee ({total} fichier(s)).")
+            self.btn_cancel.config(state="disabled")
+            self.cancel_event.clear()
+            messagebox.showinfo("Succes", "Texte copie dans le presse-papiers.")
+            self._counter()
+        elif kind == "too_large_for_clipboard":
+            total, full_text = payload
+            self.progress.stop()
+            self.progress.configure(mode="determinate", value=0)
+            self.btn_cancel.config(state="disabled")
+            self.cancel_event.clear()
+            self.lbl_msg.config(text="Selection volumineuse.")
+            if messagebox.askyesno(
+                "Trop volumineux",
+                "La selection est trop volumineuse pour le presse-papiers.\nSouhaitez-vous exporter dans un fichier ?",
+            ):
+                out = filedialog.asksaveasfilename(parent=self, defaultextension=".txt", initialfile=DEFAULT_OUT)
+                if out:
+                    try:
+                        Path(out).write_text(full_text, encoding="utf-8", newline="\n")
+                        messagebox.showinfo("Succes", f"Selection exportee vers {out}")
+                    except Exception as exc:
+                        LOGGER.exception("Echec ecriture export volumineux", exc_info=exc)
+                        messagebox.showerror("Erreur", f"Impossible d'ecrire le fichier : {exc}")
+            self._counter()
+        elif kind == "done_export":
+            total, out_path = payload
+            self.progress.stop()
+            self.progress.configure(mode="determinate", value=0)
+            self.lbl_msg.config(text="Export termine.")
+            self.btn_cancel.config(state="disabled")
+            self.cancel_event.clear()
+            messagebox.showinfo("Succes", f"{total} fichier(s) exporte(s) dans\n{out_path}")
+            self._counter()
+        elif kind == "done_split":
+            total, modules, out_dir = payload
+            self.progress.stop()
+            self.progress.configure(mode="determinate", value=0)
+            self.lbl_msg.config(text=f"Export par module termine ({modules} export(s)).")
+            self.btn_cancel.config(state="disabled")
+            self.cancel_event.clear()
+            messagebox.showinfo("Succes", f"{total} fichier(s) exporte(s) en {modules} export(s) dans\n{out_dir}\n(sommaire : {SPLIT_INDEX_NAME})")
+            self._counter()
+        elif kind == "cancelled":
+            op, = payload
+            self.progress.stop()
+            self.progress.configure(mode="determinate", value=0)
+            self.btn_cancel.config(state="disabled")
+            self.cancel_event.clear()
+            msg = {
+                "scan": "Scan annule.",
+                "copy": "Copie annulee.",
+                "export": "Export annule.",
+                "env": "Extraction ENV annulee.",
+                "grep": "Recherche annulee.",
+            }.get(op, f"Operation {op} annulee.")
+            self.lbl_msg.config(text=msg)
+        elif kind == "error":
+            msg, = payload
+            self.progress.stop()
+            self.progress.configure(mode="determinate", value=0)
+            self.lbl_msg.config(text="Erreur")
+            self.btn_cancel.config(state="disabled")
+            self.cancel_event.clear()
+            messagebox.showerror("Erreur", msg)
 
     def _counter(self, *_e):
-        total = len(self.tree.get_children())
+        total = len(self._file_rows())
         selected = self.tree.selection()
         nb = len(selected)
         size_bytes = sum(self._size_cache.get(iid, 0) for iid in selected)
         self.lbl_count.config(text=f"Selection {nb} / {total}")
         volume_text = _human_bytes(size_bytes) if nb else "0 B"
+        tally = self._update_loc_tallies()
+        if tally is not None and nb:
+            volume_text += f" - ~{tally.total[4]} tokens"
         self.lbl_size.config(text=f"Volume {volume_text}")
+        self._refresh_loc_panel()
         self._update_action_states()
         self._update_preview_buttons()
         self._update_toolbar_stats()
@@ -2846,11 +9118,80 @@ class ConcatApp(tk.Tk):
         self.cfg.respect_gitignore = self.respect_gitignore_var.get()
         vendor_mode = _normalize_vendor_mode(self.vendor_mode_var.get())
         self.cfg.vendor_mode = vendor_mode
-        self.cfg.include_vendor = vendor_mode != "none"
+        self.cfg.include_vendor = vendor_mode in ("symfony", "all")
         self.cfg.safe_export_exclude_sensitive = self.safe_export_exclude_sensitive_var.get()
+        self.cfg.restore_last = self.restore_last_var.get()
+        self.cfg.content_index = self.content_index_var.get()
+        self.cfg.hide_duplicates = self.hide_duplicates_var.get()
         self.cfg.save()
+        if self.cfg.restore_last:
+            # Là je fige la selection courante avec la liste pour le prochain lancement.
+            self._save_snapshot_async(sync=True)
+        self._content_cancel.set()
+        self._imports_cancel.set()
+        self._dups_cancel.set()
+        self._loc_cancel.set()
+        self._hot_cancel.set()
+        self._close_large_view()
         self.destroy()
 
 
+CLI_COMMANDS = ("grep",)
+
+def _cli_main(argv: Sequence[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog=Path(sys.argv[0]).name, description=f"{APP_NAME} en ligne de commande.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    grep = sub.add_parser("grep", help="lister les fichiers du projet contenant un texte")
+    grep.add_argument("pattern")
+    grep.add_argument("root", nargs="?", default=".", help="dossier du projet (defaut : dossier courant)")
+    grep.add_argument("-E", "--regex", action="store_true", help="motif en expression reguliere")
+    grep.add_argument("-s", "--case-sensitive", action="store_true", help="respecter la casse")
+    grep.add_argument("-l", "--files-with-matches", action="store_true", help="n'afficher que les chemins")
+    grep.add_argument("--vendor", choices=("none", "symfony", "all"), default="none", help="inclusion de vendor/ (comme dans l'interface)")
+    grep.add_argument("--no-index", action="store_true", help="ni utiliser ni mettre a jour l'index de contenu")
+    args = parser.parse_args(argv)
+
+    root = Path(args.root).resolve()
+    if not root.is_dir():
+        parser.error(f"dossier introuvable : {root}")
+    try:
+        rx = _grep_pattern(args.pattern, args.regex, args.case_sensitive)
+    except re.error as exc:
+        parser.error(f"expression reguliere invalide : {exc}")
+    meta: dict[Path, _FileMeta] = {}
+    files = _discover(root, args.vendor, meta)
+    index = None
+    if not args.no_index:
+        index = _ContentIndex(root)
+        try:
+            index.update(files, meta)
+        except Exception as exc:
+            print(f"index de contenu indisponible : {exc}", file=sys.stderr)
+            index = None
+    found, _read = _grep_files(root, files, meta, args.pattern, args.regex, args.case_sensitive, index)
+    for fp, count in found:
+        rel = fp.relative_to(root).as_posix()
+        if args.files_with_matches:
+            print(rel)
+            continue
+        lines = [(n, line) for n, line in enumerate(_read_text(fp).splitlines(), 1) if rx.search(line)]
+        if not lines:
+            # Correspondance sur plusieurs lignes : seul le nombre d'occurrences est affiche.
+            print(f"{rel}: {count} occurrence(s)")
+        for n, line in lines:
+            print(f"{rel}:{n}:{line}")
+    return 0 if found else 1
+
+
+_T_IMPORT_DONE = time.time()
+
 if __name__ == "__main__":
+    import multiprocessing
+
+    # Indispensable pour l'executable PyInstaller : les processus de _parallel_map relancent l'exe.
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+        sys.exit(_cli_main(sys.argv[1:]))
     ConcatApp().mainloop()